@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Compare the per-sample cost of the calibration lookup before and after the lookup table.
+
+Usage: ./bench_calibration.py [--entries N [N ...]]
+"""
+
+import argparse
+import os
+import sys
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin"))
+
+import constants as cs  # noqa: E402
+import libcalibration as lc  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+
+def legacy_total(metered_volume: float, offset: float, calibration: dict) -> float:
+    """The original implementation of WizWTR._calc_new_total."""
+    new_volume: float = metered_volume + offset
+    for key, value in calibration.items():
+        if pd.Timestamp(key) < pd.Timestamp.now():
+            new_volume += value
+    return new_volume
+
+
+def make_calibration(entries: int) -> dict:
+    """Return `entries` calibration entries, one week apart, ending today."""
+    _now = time.time()
+    return {
+        time.strftime(cs.DT_FORMAT, time.localtime(_now - (entries - i) * 7 * 86400)): 0.001
+        for i in range(entries)
+    }
+
+
+def main(sizes: list) -> None:
+    table = []
+    for size in sizes:
+        calibration = make_calibration(size)
+        table_lc = lc.Calibration(cs.WIZ_WTR["offset"], calibration)
+        if not np.isclose(
+            legacy_total(1.0, cs.WIZ_WTR["offset"], calibration), table_lc.correct(1.0)
+        ):
+            print(f"WARNING: results differ for {size} entries")
+        _number = 200
+        t_old = min(
+            timeit.repeat(
+                lambda c=calibration: legacy_total(1.0, cs.WIZ_WTR["offset"], c),
+                number=_number,
+                repeat=3,
+            )
+        )
+        t_new = min(timeit.repeat(lambda t=table_lc: t.correct(1.0), number=_number, repeat=3))
+        _epochs = np.arange(time.time() - 10 * 366 * 86400, time.time(), 900.0)
+        t_vec = min(
+            timeit.repeat(lambda t=table_lc, e=_epochs: t.corrections(e), number=1, repeat=3)
+        )
+        table.append(
+            [size, t_old / _number * 1e6, t_new / _number * 1e6, t_vec / len(_epochs) * 1e9]
+        )
+    print(
+        tabulate(
+            table,
+            headers=[
+                "entries",
+                "legacy [us/sample]",
+                "table [us/sample]",
+                "vectorised [ns/sample]",
+            ],
+            floatfmt=".3f",
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the calibration lookup")
+    parser.add_argument(
+        "--entries",
+        type=int,
+        nargs="+",
+        default=[5, 50, 500],
+        help="numbers of calibration entries to test",
+    )
+    main(parser.parse_args().entries)
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Compare the NumPy and the pandas implementation of WizWTR.compact_data.
+
+Usage: ./bench_compact.py [--repeat N]
+"""
+
+import argparse
+import datetime as dt
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin"))
+
+import libwizwtr as wtr  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+SIZES: list[int] = [15, 1_000, 100_000]
+
+
+def make_samples(count: int, interval: int = 60) -> list:
+    """Create `count` samples, `interval` seconds apart, like WizWTR.get_telegram would.
+
+    Args:
+        count (int): number of samples
+        interval (int): seconds between samples
+
+    Returns:
+        list of dicts
+    """
+    # start just after a bucket edge and stop before the last one closes
+    _start = int(time.time()) - count * interval
+    _start -= _start % 900 - 5
+    samples = []
+    water = 891719
+    for i in range(count):
+        _epoch = _start + i * interval
+        water += i % 7 == 0
+        samples.append(
+            {
+                "sample_time": dt.datetime.fromtimestamp(_epoch).strftime(wtr.cs.DT_FORMAT),
+                "sample_epoch": _epoch,
+                "water": water,
+            }
+        )
+    return samples
+
+
+def measure(func, data, repeat: int) -> tuple[float, float]:
+    """Return the best time per call [ms] and the peak memory [kiB] of func(data)."""
+    _number = max(1, 1000 // len(data))
+    _time = min(timeit.repeat(lambda: func(data), number=_number, repeat=repeat)) / _number
+    tracemalloc.start()
+    func(data)
+    _peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _time * 1000, _peak / 1024
+
+
+def main(repeat: int) -> None:
+    table = []
+    for size in SIZES:
+        data = make_samples(size)
+        # only compare the compacted data; the pandas remainder lacks `sample_time`
+        if wtr.WizWTR.compact_data(data)[0] != wtr.WizWTR.compact_data_pandas(data)[0]:
+            print(f"WARNING: results differ for {size} samples")
+        t_np, m_np = measure(wtr.WizWTR.compact_data, data, repeat)
+        t_pd, m_pd = measure(wtr.WizWTR.compact_data_pandas, data, repeat)
+        table.append([size, t_pd, t_np, t_pd / t_np, m_pd, m_np])
+    print(
+        tabulate(
+            table,
+            headers=[
+                "samples",
+                "pandas [ms]",
+                "numpy [ms]",
+                "speedup",
+                "pandas [kiB]",
+                "numpy [kiB]",
+            ],
+            floatfmt=".2f",
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark WizWTR.compact_data")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repeats per measurement")
+    main(parser.parse_args().repeat)
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Measure lock contention between the daemon and concurrent trend runs.
+
+A synthetic database with `--days` of 15-minute samples is created. One
+process writes like the daemon does: insert a report and update the
+rollups, as fast as `--interval` allows. At the same time `--readers`
+processes query like `trend.py` does: the raw samples of the last 80 days
+and the rollups. This runs for both ways of accessing the database:
+
+    legacy  rollback journal, a new connection per query, Python's default
+            5 s timeout; `trend.py` used to sleep 30-60 s after each error
+    libdb   WAL, busy timeout, read-only connection shared by all queries
+
+Usage: ./bench_contention.py [--days N] [--seconds S] [--readers N] [--interval S]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sqlite3 as s3
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+
+BIN = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin")
+sys.path.insert(0, BIN)
+
+import constants as cs  # noqa: E402
+import libdb  # noqa: E402
+import librollup as rollup  # noqa: E402
+
+MODES: list[str] = ["legacy", "libdb"]
+METER: str = cs.WIZ_WTR["meter"]
+# the query of `trend.read_mains`
+READ_MAINS = (
+    "SELECT sample_epoch, water FROM mains"
+    " WHERE meter = ? AND sample_epoch >= ? AND sample_epoch <= ? ORDER BY sample_epoch;"
+)
+
+
+def create_database(database: str, days: int) -> int:
+    """Create a database holding `days` of 15-minute samples and its rollups.
+
+    Returns:
+        (int): epoch of the last sample
+    """
+    _end = int(time.time()) // 900 * 900
+    _start = _end - days * 86400
+    with open(f"{BIN}/sq3_wizwtr.sql", encoding="utf-8") as _sql, s3.connect(database) as con:
+        # skip the shebang
+        con.executescript(_sql.read().split("\n", 1)[1])
+        con.execute(
+            "WITH RECURSIVE seq(e) AS (SELECT ? UNION ALL SELECT e + 900 FROM seq WHERE e < ?) "
+            "INSERT OR REPLACE INTO mains (meter, sample_time, sample_epoch, water) "
+            "SELECT ?, datetime(e, 'unixepoch'), e, (e - ?) / 900 * 3 FROM seq;",
+            (_start, _end, METER, _start),
+        )
+        rollup.update(con)
+    return _end
+
+
+def connect(mode: str, database: str, readonly: bool) -> s3.Connection:
+    """Return the connection to use for the next query."""
+    if mode == "legacy":
+        return s3.connect(database)
+    return libdb.shared(database, readonly=readonly)
+
+
+def writer(mode: str, database: str, until: float, interval: float) -> dict:
+    """Store a report and update the rollups every `interval` seconds until `until`."""
+    with s3.connect(database) as con:
+        _epoch = con.execute("SELECT MAX(sample_epoch) FROM mains;").fetchone()[0]
+    latencies, errors = [], 0
+    while time.time() < until:
+        _epoch += 900
+        _start = time.perf_counter()
+        try:
+            con = connect(mode, database, readonly=False)
+            with con:
+                con.execute(
+                    "INSERT INTO mains (meter, sample_time, sample_epoch, water) "
+                    "VALUES (?, datetime(?, 'unixepoch'), ?, ?);",
+                    (METER, _epoch, _epoch, _epoch // 300),
+                )
+            with con:
+                rollup.update(con)
+            if mode == "legacy":
+                con.close()
+            latencies.append(time.perf_counter() - _start)
+        except s3.OperationalError:
+            errors += 1
+        time.sleep(interval)
+    return {"latencies": latencies, "errors": errors}
+
+
+def reader(mode: str, database: str, until: float) -> dict:
+    """Query like `trend.py` until `until`."""
+    latencies, errors = [], 0
+    while time.time() < until:
+        _now = int(time.time())
+        _start = time.perf_counter()
+        try:
+            for _query in [
+                lambda con, now=_now: con.execute(
+                    READ_MAINS, (METER, now - 80 * 86400, now)
+                ).fetchall(),
+                lambda con, now=_now: rollup.fetch(con, "D", now - 80 * 86400, now),
+                lambda con, now=_now: rollup.fetch(con, "ME", now - 3 * 366 * 86400, now),
+            ]:
+                con = connect(mode, database, readonly=True)
+                _query(con)
+                if mode == "legacy":
+                    con.close()
+            latencies.append(time.perf_counter() - _start)
+        except s3.OperationalError:
+            errors += 1
+    return {"latencies": latencies, "errors": errors}
+
+
+def summary(results: list[dict]) -> list:
+    """Return count, errors, median, p95 and maximum latency [ms] of the results."""
+    _ms = sorted(_l * 1000 for _r in results for _l in _r["latencies"])
+    _errors = sum(_r["errors"] for _r in results)
+    if len(_ms) < 2:
+        return [len(_ms), _errors, None, None, None]
+    _p95 = statistics.quantiles(_ms, n=20)[18]
+    return [len(_ms), _errors, statistics.median(_ms), _p95, _ms[-1]]
+
+
+def main(opt) -> None:
+    from tabulate import tabulate  # pylint: disable=C0415
+
+    table = []
+    for mode in MODES:
+        _tmp = tempfile.mkdtemp(prefix="wizwtr_bench_")
+        try:
+            database = f"{_tmp}/wizwtr.sqlite3"
+            create_database(database, opt.days)
+            if mode == "libdb":
+                # in WAL mode before the readers start
+                libdb.connect(database).close()
+            _until = str(time.time() + 1 + opt.seconds)
+            _args = [sys.executable, os.path.realpath(__file__), "--database", database]
+            _args += ["--mode", mode, "--until", _until, "--interval", str(opt.interval)]
+            children = [
+                subprocess.Popen([*_args, "--child", "writer"], stdout=subprocess.PIPE, text=True)
+            ] + [
+                subprocess.Popen([*_args, "--child", "reader"], stdout=subprocess.PIPE, text=True)
+                for _ in range(opt.readers)
+            ]
+            results = [json.loads(_child.communicate()[0]) for _child in children]
+        finally:
+            shutil.rmtree(_tmp)
+        table.append([mode, "writer", *summary(results[:1])])
+        table.append([mode, "readers", *summary(results[1:])])
+    print(f"{opt.days} days of data, {opt.readers} reader(s), {opt.seconds} s per mode")
+    print(
+        tabulate(
+            table,
+            headers=["mode", "", "operations", "errors", "median [ms]", "p95 [ms]", "max [ms]"],
+            floatfmt=".1f",
+        )
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark database lock contention")
+    parser.add_argument("--days", type=int, default=3 * 366, help="days of data")
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration per mode")
+    parser.add_argument("--readers", type=int, default=2, help="number of concurrent readers")
+    parser.add_argument(
+        "--interval", type=float, default=0.01, help="pause between the writes of the writer [s]"
+    )
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--until", type=float, help=argparse.SUPPRESS)
+    parser.add_argument("--child", choices=["writer", "reader"], help=argparse.SUPPRESS)
+    _opt = parser.parse_args()
+    if _opt.child == "writer":
+        print(json.dumps(writer(_opt.mode, _opt.database, _opt.until, _opt.interval)))
+    elif _opt.child == "reader":
+        print(json.dumps(reader(_opt.mode, _opt.database, _opt.until)))
+    else:
+        main(_opt)
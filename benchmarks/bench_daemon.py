@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Run the collector end to end against the simulated meter in virtual time.
+
+The (synchronous) collector loop of `wizwtr.py` is driven by a
+`libmeter.SimulatedClock`, so `--days` of operation run as fast as the CPU
+allows. Everything is written to a temporary database, spool and website.
+While it runs, the memory use and the size of the database are tracked.
+
+Usage: ./bench_daemon.py [--days N] [--meters N] [--failures P] [--adaptive]
+"""
+
+import argparse
+import logging
+import os
+import resource
+import shutil
+import signal
+import sqlite3 as s3
+import sys
+import tempfile
+import threading
+import time
+
+BIN = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin")
+sys.path.insert(0, BIN)
+
+import constants as cs  # noqa: E402
+import libmeter as lm  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+
+def rss_mib() -> float:
+    """Return the current resident set size [MiB]."""
+    with open("/proc/self/statm", encoding="utf-8") as _statm:
+        return int(_statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def main(opt) -> None:
+    _tmp = tempfile.mkdtemp(prefix="wizwtr_bench_")
+    database = f"{_tmp}/wizwtr.sqlite3"
+    with open(f"{BIN}/sq3_wizwtr.sql", encoding="utf-8") as _sql, s3.connect(database) as con:
+        # skip the shebang
+        con.executescript(_sql.read().split("\n", 1)[1])
+    # configure before `wizwtr` is imported; it creates the LEDs at import
+    cs.WIZ_WTR.update(
+        database=database,
+        spool=f"{_tmp}/spool.tsv",
+        metrics=f"{_tmp}/wizwtr.prom",
+        led_status=f"{_tmp}/status.json",
+    )
+    cs.WIZ_WTR["simulator"].update(failures=opt.failures, seed=1)
+    cs.WIZ_WTR["simulated_meters"] = [cs.WIZ_WTR["meter"]] + [
+        f"meter{_idx}" for _idx in range(1, opt.meters)
+    ]
+    cs.TREND["website"] = _tmp
+    sys.argv = ["wizwtr.py", "--start", "--simulate"] + (["--adaptive"] if opt.adaptive else [])
+    import libmetrics as mt  # pylint: disable=C0415
+    import wizwtr  # pylint: disable=C0415
+
+    # the simulated failures would flood the log
+    logging.getLogger().setLevel(logging.ERROR)
+    _end = time.time()
+    _start = _end - opt.days * 86400
+    wizwtr.CLOCK = lm.SimulatedClock(start=_start)
+    snapshots = []
+    done = threading.Event()
+
+    def _watch() -> None:
+        # take a snapshot every simulated month and stop the collector at the end
+        _next = _start
+        while not done.wait(0.05):
+            _now = wizwtr.CLOCK.time()
+            if _now >= _next:
+                snapshots.append(
+                    [
+                        time.strftime(cs.D_FORMAT, time.localtime(_now)),
+                        mt.METRICS.get("samples_total"),
+                        rss_mib(),
+                        os.path.getsize(database) / 2**20,
+                    ]
+                )
+                _next += 30 * 86400
+            if _now >= _end:
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+    watcher = threading.Thread(target=_watch, daemon=True)
+    _rss_start = rss_mib()
+    _t0 = time.perf_counter()
+    watcher.start()
+    try:
+        wizwtr.main()
+        _elapsed = time.perf_counter() - _t0
+        done.set()
+        with s3.connect(database) as con:
+            rows = con.execute("SELECT COUNT(*) FROM mains;").fetchone()[0]
+            events = con.execute("SELECT COUNT(*) FROM flow_events;").fetchone()[0]
+            con.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        _samples = mt.METRICS.get("samples_total")
+        _size = os.path.getsize(database)
+        print(
+            tabulate(
+                snapshots,
+                headers=["date", "samples", "RSS [MiB]", "database [MiB]"],
+                floatfmt=".1f",
+            )
+        )
+        print()
+        print(
+            f"simulated        {opt.days} days of {opt.meters} meter(s) "
+            f"in {_elapsed:.1f}s ({opt.days * 86400 / _elapsed:.0f}x real time)"
+        )
+        print(
+            f"samples          {_samples:.0f} ({_samples / _elapsed:.0f} samples/s), "
+            f"{mt.METRICS.get('failures_total', {'phase': 'fetch'}):.0f} failed"
+        )
+        print(f"stored           {rows} rows, {events} flow events")
+        print(f"database         {_size / 2**20:.1f} MiB ({_size / max(rows, 1):.0f} bytes/row)")
+        print(
+            f"RSS              {_rss_start:.1f} -> {rss_mib():.1f} MiB, "
+            f"peak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.1f} MiB"
+        )
+    finally:
+        done.set()
+        shutil.rmtree(_tmp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the collector against a simulated meter")
+    parser.add_argument("--days", type=int, default=365, help="simulated days")
+    parser.add_argument("--meters", type=int, default=1, help="number of simulated meters")
+    parser.add_argument(
+        "--failures",
+        type=float,
+        default=0.01,
+        help="probability that a request to the meter fails",
+    )
+    parser.add_argument("--adaptive", action="store_true", help="use adaptive sampling")
+    main(parser.parse_args())
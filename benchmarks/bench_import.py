@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Measure the start-up (import) time of the scripts with `python -X importtime`.
+
+Each script is imported in a fresh interpreter; its commandline is faked,
+because the scripts parse it at import. Reported are the wall-clock time of
+the whole process, the cumulative import time of the script and its slowest
+direct imports. With `--json` the results are also written to a file, so
+they can be tracked over time.
+
+Usage: ./bench_import.py [--repeat N] [--top N] [--json FILE]
+"""
+
+import argparse
+import json
+import os
+import subprocess  # nosec B404
+import sys
+import time
+
+BIN = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin")
+# module -> faked commandline
+SCRIPTS: dict[str, list[str]] = {
+    "constants": ["constants.py"],
+    "trend": ["trend.py", "--hours", "0"],
+    "wizwtr": ["wizwtr.py", "--debug"],
+}
+
+
+def parse_importtime(stderr: str, module: str) -> tuple[float, dict[str, float]]:
+    """Return the cumulative import time [ms] of the module and of its direct imports.
+
+    Args:
+        stderr (str): output of `python -X importtime`
+        module (str): the top-level module
+
+    Returns:
+        (float): cumulative import time of the module
+        (dict): direct import -> cumulative import time
+    """
+    children: dict[str, float] = {}
+    for _line in stderr.splitlines():
+        if not _line.startswith("import time:") or "self [us]" in _line:
+            continue
+        _, _cumulative, _name = _line.split("|")
+        _depth = (len(_name) - len(_name.lstrip())) // 2
+        _name = _name.strip()
+        if _depth == 0:
+            if _name == module:
+                return int(_cumulative) / 1000, children
+            # imported before the module (e.g. by `site`)
+            children = {}
+        elif _depth == 1:
+            children[_name] = int(_cumulative) / 1000
+    raise ValueError(f"{module} was not imported")
+
+
+def measure(module: str, argv: list[str]) -> dict:
+    """Import the module in a fresh interpreter and return the timings [ms]."""
+    _path = os.pathsep.join(filter(None, [BIN, os.environ.get("PYTHONPATH")]))
+    _env = dict(os.environ, PYTHONPATH=_path)
+    _code = f"import sys; sys.argv = {argv!r}; import {module}"
+    _start = time.perf_counter()
+    _child = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", _code],
+        env=_env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    _process = (time.perf_counter() - _start) * 1000
+    _import, _children = parse_importtime(_child.stderr, module)
+    return {"process": _process, "import": _import, "children": _children}
+
+
+def main(opt) -> None:
+    from tabulate import tabulate  # pylint: disable=C0415
+
+    results = {}
+    for module, argv in SCRIPTS.items():
+        # the best run; the first run also compiles the bytecode
+        runs = [measure(module, argv) for _ in range(opt.repeat + 1)][1:]
+        best = min(runs, key=lambda _run: _run["import"])
+        best["process"] = min(_run["process"] for _run in runs)
+        results[module] = best
+    print(
+        tabulate(
+            [[module, _r["process"], _r["import"]] for module, _r in results.items()],
+            headers=["script", "process [ms]", "import [ms]"],
+            floatfmt=".1f",
+        )
+    )
+    for module, _r in results.items():
+        _slowest = sorted(_r["children"].items(), key=lambda _item: -_item[1])[: opt.top]
+        print(f"\nslowest imports of {module}")
+        print(tabulate(_slowest, headers=["module", "cumulative [ms]"], floatfmt=".1f"))
+    if opt.json:
+        with open(opt.json, "w", encoding="utf-8") as _fp:
+            json.dump(results, _fp, indent=1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the import time of the scripts")
+    parser.add_argument("--repeat", type=int, default=5, help="number of imports per script")
+    parser.add_argument("--top", type=int, default=8, help="number of slowest imports to show")
+    parser.add_argument("--json", type=str, help="also write the results to this file")
+    main(parser.parse_args())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Compare the matplotlib and the SVG renderer of trend.plot_graph.
+
+Each renderer runs in a fresh process that draws the four trend graphs from
+synthetic data, so the import time and peak memory of the renderer are
+measured too.
+
+Usage: ./bench_render.py [--repeat N]
+"""
+
+import argparse
+import json
+import os
+import resource
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+
+BIN = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin")
+RENDERERS: dict = {"matplotlib": False, "svg": True}
+
+
+def child(svg: bool, repeat: int) -> None:
+    """Draw the graphs and print the measurements as JSON."""
+    _t0 = time.perf_counter()
+    sys.path.insert(0, BIN)
+    sys.argv = ["trend.py"]
+    import numpy as np  # pylint: disable=C0415
+    import pandas as pd  # pylint: disable=C0415
+    import trend  # pylint: disable=C0415
+
+    t_import = time.perf_counter() - _t0
+    rng = np.random.default_rng(1)
+    _out = tempfile.mkdtemp(prefix="wizwtr_bench_")
+    timings: dict = {}
+    for graph, (_, _, aggregation, title, show_data, locatorformat) in trend.GRAPHS.items():
+        _count = 10 if aggregation == "YE" else 80
+        _index = pd.date_range(end="2025-06-30", periods=_count, freq=aggregation)
+        data_dict = {"mains": pd.DataFrame({"water": rng.integers(0, 500, _count)}, index=_index)}
+        _best = float("inf")
+        for _ in range(repeat):
+            _start = time.perf_counter()
+            trend.plot_graph(
+                f"{_out}/{graph}",
+                data_dict,
+                title,
+                show_data=show_data,
+                locatorformat=locatorformat,
+                svg=svg,
+            )
+            _best = min(_best, time.perf_counter() - _start)
+        timings[graph] = _best * 1000
+    _max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(json.dumps({"import": t_import * 1000, "graphs": timings, "max_rss": _max_rss}))
+
+
+def main(repeat: int) -> None:
+    from tabulate import tabulate  # pylint: disable=C0415
+
+    results = {}
+    for name, svg in RENDERERS.items():
+        _args = [sys.executable, os.path.realpath(__file__), "--repeat", str(repeat)]
+        if svg:
+            _args.append("--svg")
+        _child = subprocess.run(  # nosec B603
+            [*_args, "--child"], check=True, capture_output=True, text=True
+        )
+        results[name] = json.loads(_child.stdout.strip().splitlines()[-1])
+    _mpl, _svg = results["matplotlib"], results["svg"]
+    table = [
+        [f"render {graph} [ms]", _mpl["graphs"][graph], _svg["graphs"][graph]]
+        for graph in _mpl["graphs"]
+    ]
+    table.append(["import trend [ms]", _mpl["import"], _svg["import"]])
+    table.append(["peak RSS [MiB]", _mpl["max_rss"], _svg["max_rss"]])
+    for _row in table:
+        _row.append(_row[1] / _row[2])
+    print(tabulate(table, headers=["", "matplotlib", "svg", "ratio"], floatfmt=".1f"))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trend graph renderers")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repeats per graph")
+    parser.add_argument("--svg", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    _opt = parser.parse_args()
+    if _opt.child:
+        child(_opt.svg, _opt.repeat)
+    else:
+        main(_opt.repeat)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Compare trend window queries on the text-keyed and the epoch-keyed schema.
+
+A synthetic database with 10 years of 15-minute data is created using the old
+(text-keyed) schema. A copy is converted by `migrate.py`. Then the queries as
+used by `trend.py` before and after are timed for several windows.
+
+Usage: ./bench_schema.py [--years N]
+"""
+
+import argparse
+import os
+import shutil
+import sqlite3 as s3
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin"))
+
+import migrate  # noqa: E402
+from tabulate import tabulate  # noqa: E402
+
+OLD_SCHEMA = """
+CREATE TABLE mains (
+  sample_time   datetime NOT NULL PRIMARY KEY,
+  sample_epoch  integer,
+  water         integer
+  );
+"""
+OLD_QUERY = (
+    "SELECT * FROM mains"
+    " WHERE sample_time >= datetime('now', '-{hours} hours')"
+    " AND sample_time <= datetime('now', '+2 hours');"
+)
+# the columns and the meter that `trend.read_mains` reads
+NEW_QUERY = (
+    "SELECT sample_epoch, water FROM mains"
+    " WHERE meter = 'mains'"
+    " AND sample_epoch >= CAST(strftime('%s', 'now', '-{hours} hours') AS INTEGER)"
+    " AND sample_epoch <= CAST(strftime('%s', 'now', '+2 hours') AS INTEGER);"
+)
+WINDOWS: dict = {"1 day": 24, "1 month": 31 * 24, "10 years": 3660 * 24}
+
+
+def create_database(database: str, years: int) -> int:
+    """Create a database with the old schema holding `years` of 15-minute samples.
+
+    Returns:
+        (int): number of samples
+    """
+    _end = int(time.time()) // 900 * 900
+    _start = _end - years * 366 * 86400
+    with s3.connect(database) as con:
+        con.executescript(OLD_SCHEMA)
+        con.execute(
+            "WITH RECURSIVE seq(e) AS (SELECT ? UNION ALL SELECT e + 900 FROM seq WHERE e < ?) "
+            "INSERT INTO mains (sample_time, sample_epoch, water) "
+            "SELECT datetime(e, 'unixepoch'), e, (e - ?) / 900 * 3 FROM seq;",
+            (_start, _end, _start),
+        )
+        return int(con.execute("SELECT COUNT(*) FROM mains;").fetchone()[0])
+
+
+def time_query(database: str, query: str, repeat: int) -> float:
+    """Return the best time [ms] to execute the query and fetch all rows."""
+    with s3.connect(database) as con:
+
+        def _run() -> None:
+            con.execute(query).fetchall()
+
+        return min(timeit.repeat(_run, number=1, repeat=repeat)) * 1000
+
+
+def main(years: int, repeat: int) -> None:
+    _tmp = tempfile.mkdtemp(prefix="wizwtr_bench_")
+    try:
+        old_db = os.path.join(_tmp, "old.sqlite3")
+        new_db = os.path.join(_tmp, "new.sqlite3")
+        print(f"Creating {create_database(old_db, years)} samples...")
+        shutil.copyfile(old_db, new_db)
+        _start = time.perf_counter()
+        migrate.migrate_database(new_db)
+        print(f"Migrated in {time.perf_counter() - _start:.1f}s")
+        table = []
+        for name, hours in WINDOWS.items():
+            t_old = time_query(old_db, OLD_QUERY.format(hours=hours), repeat)
+            t_new = time_query(new_db, NEW_QUERY.format(hours=hours), repeat)
+            table.append([name, t_old, t_new, t_old / t_new])
+        print(
+            tabulate(
+                table, headers=["window", "text [ms]", "epoch [ms]", "speedup"], floatfmt=".2f"
+            )
+        )
+    finally:
+        shutil.rmtree(_tmp)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the trend window queries")
+    parser.add_argument("--years", type=int, default=10, help="years of synthetic data")
+    parser.add_argument("--repeat", type=int, default=5, help="number of repeats per measurement")
+    _opt = parser.parse_args()
+    main(_opt.years, _opt.repeat)
@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Benchmark the collector, compaction, storage and trending paths.
+
+The data is synthetic and reproducible (fixed seed). The usage follows the
+household profile of the simulated meter (`libmeter`). Every case runs at a
+realistic size and at 10 times that size:
+
+    translate       WizWTR._translate_telegram for a day of telegrams
+    compact         WizWTR.compact_data of a day of samples
+    store           sql_db.queue()/insert() for each report of a day
+    rollup          librollup.update() after each report of a day
+    fetch_<graph>   trend.fetch_data for each graph, from a year of history
+    fetch_raw       trend.fetch_mains (80 days) without the cache of differences
+    plot_<graph>    trend.plot_graph (matplotlib) for each graph
+
+The size is the number of telegrams, samples, reports, samples in the
+database or bars of the graph respectively. The time reported is the best of
+`--repeat` runs. The peak is the memory allocated by Python and NumPy during
+one run (tracemalloc), so it excludes the buffers of matplotlib's renderer.
+
+Save the results with `--save FILE`, e.g. before upgrading the packages in
+`requirements.txt`. Then compare with `--compare FILE` on the same machine.
+The exit code is 1 if a case became slower by more than `--threshold`; cases
+of a few milliseconds need enough `--repeat` runs to be stable.
+
+Usage: ./bench_suite.py [--scale realistic|10x] [--only TEXT] [--repeat N]
+                        [--save FILE] [--compare FILE [--threshold R]]
+"""
+
+import argparse
+import importlib.metadata
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+BIN = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin")
+sys.path.insert(0, BIN)
+
+import constants as cs  # noqa: E402
+import libdb  # noqa: E402
+import libmeter as lm  # noqa: E402
+import librollup as rollup  # noqa: E402
+import libwizwtr as wtr  # noqa: E402
+import mausy5043_common.libsqlite3 as m3  # noqa: E402
+import numpy as np  # noqa: E402
+
+SCALES: dict[str, int] = {"realistic": 1, "10x": 10}
+# realistic sizes
+SAMPLES: int = 24 * 60  # a day of samples at one per minute
+REPORTS: int = 24 * 4  # a day of 15-minute reports
+HISTORY: int = 366  # days of data in the database
+SEED: int = 1
+
+
+def make_usage(days: int, missing: float = 0.01) -> tuple[np.ndarray, np.ndarray]:
+    """Return `days` of 15-minute samples upto now, as the daemon would store them.
+
+    In each 15 minutes the number of events is drawn at the rate of
+    libmeter.HOURLY_RATE; an event uses the mean volume of libmeter.EVENTS on
+    average. A fraction `missing` of the samples is dropped, so there are gaps.
+
+    Returns:
+        (np.ndarray): sample_epoch of each sample
+        (np.ndarray): water (meter reading) of each sample [L]
+    """
+    rng = np.random.default_rng(SEED)
+    _end = int(time.time()) // 900 * 900
+    epochs = np.arange(_end - days * 86400, _end + 1, 900, dtype=np.int64)
+    # `sample_epoch` is local time, so this is the local hour
+    _rates = np.array(lm.HOURLY_RATE)[(epochs // 3600) % 24] / 4
+    _weights = sum(_w for _, _, _w in lm.EVENTS.values())
+    _volume = sum(_f * _d / 60 * _w for _f, _d, _w in lm.EVENTS.values()) / _weights
+    _events = rng.poisson(_rates)
+    usage = np.where(_events > 0, rng.gamma(np.maximum(_events, 1), _volume), 0.0)
+    water = 891_719 + np.cumsum(np.round(usage)).astype(np.int64)
+    _keep = rng.random(len(epochs)) >= missing
+    _keep[[0, -1]] = True
+    return epochs[_keep], water[_keep]
+
+
+def make_telegrams(count: int) -> list:
+    """Return `count` telegrams like the HomeWizard API returns them."""
+    rng = np.random.default_rng(SEED)
+    _liters = 891_719 + np.cumsum(rng.integers(0, 3, count))
+    _flows = rng.choice([0.0, 0.0, 0.0, 6.5], count)
+    return [
+        types.SimpleNamespace(total_liter_m3=_l / 1000, active_liter_lpm=_f)
+        for _l, _f in zip(_liters.tolist(), _flows.tolist(), strict=True)
+    ]
+
+
+def make_samples(count: int, interval: int = 60) -> list:
+    """Return `count` samples, `interval` seconds apart, like WizWTR.get_telegram records them."""
+    _start = int(time.time()) - count * interval
+    _start -= _start % 900 - 5
+    rng = np.random.default_rng(SEED)
+    _liters = 891_719 + np.cumsum(rng.integers(0, 3, count))
+    return [
+        {
+            "meter": cs.WIZ_WTR["meter"],
+            "sample_time": time.strftime(cs.DT_FORMAT, time.localtime(_start + i * interval)),
+            "sample_epoch": _start + i * interval,
+            "water": int(_liters[i]),
+        }
+        for i in range(count)
+    ]
+
+
+def make_database(database: str, days: int = 0) -> None:
+    """Create a database with `days` of samples (see `make_usage`) and its rollups."""
+    with open(f"{BIN}/sq3_wizwtr.sql", encoding="utf-8") as _sql:
+        # skip the shebang
+        _script = _sql.read().split("\n", 1)[1]
+    con = libdb.connect(database)
+    try:
+        con.executescript(_script)
+        if days:
+            epochs, water = make_usage(days)
+            con.executemany(
+                f"INSERT OR REPLACE INTO {cs.WIZ_WTR['sql_table']}"  # nosec B608
+                f" (meter, sample_time, sample_epoch, water) VALUES (?, ?, ?, ?);",
+                [
+                    (cs.WIZ_WTR["meter"], time.strftime(cs.DT_FORMAT, time.gmtime(_e)), _e, _w)
+                    for _e, _w in zip(epochs.tolist(), water.tolist(), strict=True)
+                ],
+            )
+            con.commit()
+            rollup.update(con)
+    finally:
+        con.close()
+
+
+def reports(count: int) -> list:
+    """Return `count` 15-minute reports of one row each, upto now."""
+    epochs, water = make_usage(count // 96 + 1, missing=0.0)
+    return [
+        [
+            {
+                "meter": cs.WIZ_WTR["meter"],
+                "sample_time": time.strftime(cs.DT_FORMAT, time.gmtime(_e)),
+                "sample_epoch": _e,
+                "water": _w,
+            }
+        ]
+        for _e, _w in zip(epochs[-count:].tolist(), water[-count:].tolist(), strict=True)
+    ]
+
+
+# ------------------------------------------------------------------------------
+# Each case returns (size, run, reset); reset (or None) is called before each run.
+
+
+def case_translate(scale: int, _tmp: str) -> tuple:
+    API_wtr = wtr.WizWTR(meter=lm.SimulatedMeter(seed=SEED), clock=lm.SimulatedClock())
+    telegrams = make_telegrams(SAMPLES * scale)
+    return len(telegrams), lambda: [API_wtr._translate_telegram(_t) for _t in telegrams], None
+
+
+def case_compact(scale: int, _tmp: str) -> tuple:
+    samples = make_samples(SAMPLES * scale)
+    return len(samples), lambda: wtr.WizWTR.compact_data(samples), None
+
+
+def case_store(scale: int, tmp: str) -> tuple:
+    database = f"{tmp}/store.sqlite3"
+    _reports = reports(REPORTS * scale)
+
+    def _reset() -> None:
+        for _file in [database, f"{database}-wal", f"{database}-shm"]:
+            if os.path.exists(_file):
+                os.remove(_file)
+        make_database(database)
+
+    def _run() -> None:
+        sql_db = m3.SqlDatabase(
+            database=database,
+            table=cs.WIZ_WTR["sql_table"],
+            insert=cs.WIZ_WTR["sql_command"],
+        )
+        for _report in _reports:
+            for _row in _report:
+                sql_db.queue(_row)
+            sql_db.insert(method="replace")
+
+    return len(_reports), _run, _reset
+
+
+def case_rollup(scale: int, tmp: str) -> tuple:
+    database = f"{tmp}/rollup.sqlite3"
+    _reports = reports(REPORTS * scale)
+    _sql = (
+        f"INSERT OR REPLACE INTO {cs.WIZ_WTR['sql_table']}"  # nosec B608
+        f" (meter, sample_time, sample_epoch, water)"
+        f" VALUES (:meter, :sample_time, :sample_epoch, :water);"
+    )
+
+    def _reset() -> None:
+        for _file in [database, f"{database}-wal", f"{database}-shm"]:
+            if os.path.exists(_file):
+                os.remove(_file)
+        make_database(database)
+
+    def _run() -> None:
+        con = libdb.connect(database)
+        try:
+            for _report in _reports:
+                # the insert is not timed separately; it is the `store` case
+                with con:
+                    con.executemany(_sql, _report)
+                rollup.update(con)
+        finally:
+            con.close()
+
+    return len(_reports), _run, _reset
+
+
+def import_trend():
+    """Return the `trend` module; it parses the commandline at import."""
+    _argv, sys.argv = sys.argv, ["trend.py", "--hours", "0"]
+    try:
+        import trend  # pylint: disable=C0415
+    finally:
+        sys.argv = _argv
+    return trend
+
+
+def history(scale: int, tmp: str) -> str:
+    """Return the database with the history of the scale; it is created on first use."""
+    database = f"{tmp}/history_{scale}.sqlite3"
+    if not os.path.exists(database):
+        make_database(database, HISTORY * scale)
+    cs.TREND["database"] = database
+    cs.TREND["archive"] = f"{tmp}/archive"
+    cs.TREND["cache"] = f"{tmp}/trend_mains.npz"
+    return database
+
+
+def default_hours(graph: str) -> int:
+    """Return the number of hours `trend.py` shows by default for the graph."""
+    trend = import_trend()
+    _opt = trend.parser.parse_args([f"--{graph}", "0"])
+    trend.set_options(_opt)
+    return getattr(_opt, graph) * trend.GRAPHS[graph][1]
+
+
+def case_fetch(graph: str):
+    def _case(scale: int, tmp: str) -> tuple:
+        trend = import_trend()
+        history(scale, tmp)
+        _hours = default_hours(graph)
+        _aggregation = trend.GRAPHS[graph][2]
+        return HISTORY * scale * 96, lambda: trend.fetch_data(_hours, _aggregation), None
+
+    return _case
+
+
+def case_fetch_raw(scale: int, tmp: str) -> tuple:
+    trend = import_trend()
+    history(scale, tmp)
+
+    def _reset() -> None:
+        if os.path.exists(cs.TREND["cache"]):
+            os.remove(cs.TREND["cache"])
+
+    return HISTORY * scale * 96, lambda: trend.fetch_mains([(80 * 24, "D")]), _reset
+
+
+def case_plot(graph: str):
+    def _case(scale: int, tmp: str) -> tuple:
+        trend = import_trend()
+        history(scale, tmp)
+        _, _, _aggregation, title, show_data, locatorformat = trend.GRAPHS[graph]
+        data_dict = trend.fetch_data(default_hours(graph), _aggregation)
+        return (
+            len(next(iter(data_dict.values()))),
+            lambda: trend.plot_graph(
+                f"{tmp}/{graph}",
+                data_dict,
+                title,
+                show_data=show_data,
+                locatorformat=locatorformat,
+            ),
+            None,
+        )
+
+    return _case
+
+
+GRAPH_NAMES: list[str] = ["hours", "days", "months", "years"]
+CASES: dict = {
+    "translate": case_translate,
+    "compact": case_compact,
+    "store": case_store,
+    "rollup": case_rollup,
+    **{f"fetch_{_g}": case_fetch(_g) for _g in GRAPH_NAMES},
+    "fetch_raw": case_fetch_raw,
+    **{f"plot_{_g}": case_plot(_g) for _g in GRAPH_NAMES},
+}
+
+
+def measure(run, reset, repeat: int) -> tuple[float, float]:
+    """Return the best time [ms] of `repeat` runs and the peak memory [MiB] of one run."""
+    _best = float("inf")
+    for _ in range(repeat):
+        if reset:
+            reset()
+        _start = time.perf_counter()
+        run()
+        _best = min(_best, time.perf_counter() - _start)
+    if reset:
+        reset()
+    tracemalloc.start()
+    run()
+    _peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return _best * 1000, _peak / 2**20
+
+
+def environment() -> dict:
+    """Return the versions of everything that may change the results."""
+    versions = {"python": platform.python_version(), "machine": platform.machine()}
+    for _package in ["numpy", "pandas", "matplotlib"]:
+        try:
+            versions[_package] = importlib.metadata.version(_package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[_package] = None
+    return versions
+
+
+def main(opt) -> int:
+    from tabulate import tabulate  # pylint: disable=C0415
+
+    baseline = None
+    if opt.compare:
+        with open(opt.compare, encoding="utf-8") as _fp:
+            baseline = json.load(_fp)
+    results: dict = {}
+    _tmp = tempfile.mkdtemp(prefix="wizwtr_bench_")
+    try:
+        for scale_name in opt.scale:
+            for name, case in CASES.items():
+                if opt.only and opt.only not in name:
+                    continue
+                size, run, reset = case(SCALES[scale_name], _tmp)
+                _time, _peak = measure(run, reset, opt.repeat)
+                results[f"{name}/{scale_name}"] = {"size": size, "time": _time, "peak": _peak}
+                print(f"{name:<14} {scale_name:<10} {_time:>10.1f} ms", file=sys.stderr)
+    finally:
+        libdb.close()
+        shutil.rmtree(_tmp)
+
+    headers = ["case", "size", "time [ms]", "peak [MiB]"]
+    table = []
+    slower = []
+    for key, _r in results.items():
+        _row = [key, _r["size"], _r["time"], _r["peak"]]
+        if baseline is not None:
+            _base = baseline["results"].get(key)
+            if _base is None:
+                _row += [None, None, "new"]
+            else:
+                _ratio = _r["time"] / _base["time"]
+                _row += [_base["time"], _ratio, "SLOWER" if _ratio > opt.threshold else ""]
+                if _ratio > opt.threshold:
+                    slower.append(key)
+        table.append(_row)
+    if baseline is not None:
+        headers += ["baseline [ms]", "ratio", ""]
+        print("baseline: " + ", ".join(f"{_k} {_v}" for _k, _v in baseline["env"].items()))
+    print("current:  " + ", ".join(f"{_k} {_v}" for _k, _v in environment().items()))
+    print(tabulate(table, headers=headers, floatfmt=".2f"))
+    if opt.save:
+        with open(opt.save, "w", encoding="utf-8") as _fp:
+            json.dump({"env": environment(), "results": results}, _fp, indent=1)
+    if slower:
+        print(f"\n{len(slower)} case(s) slower than {opt.threshold:.2f}x the baseline")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the main code paths of wizwtr")
+    parser.add_argument(
+        "--scale",
+        choices=list(SCALES),
+        nargs="+",
+        default=list(SCALES),
+        help="data sizes to run (default: all)",
+    )
+    parser.add_argument("--only", type=str, help="run only the cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=5, help="number of runs per case")
+    parser.add_argument("--save", type=str, help="save the results as a baseline to this file")
+    parser.add_argument("--compare", type=str, help="compare with the baseline in this file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="ratio to the baseline time that counts as slower (default: 1.25)",
+    )
+    sys.exit(main(parser.parse_args()))
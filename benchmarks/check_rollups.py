@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Check that the rollups hold the same usage as the raw samples in `mains`.
+
+The (synchronous) collector loop of `wizwtr.py` runs against the simulated
+meter in virtual time, like `bench_daemon.py`, for `--days` into a temporary
+database. The daemon stores the unfinished last bucket of each report and
+replaces it at the next report, so this is what the rollups have to cope with.
+While the daemon is still writing, the usage per bucket from the rollups
+(`trend.fetch_rollup`) is compared with the usage computed from the raw
+samples (`trend.fetch_mains`) for each aggregation.
+
+With `--database` an existing database is checked instead, e.g. the live one.
+
+Usage: ./check_rollups.py [--days N] [--database FILE]
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import signal
+import sqlite3 as s3
+import sys
+import tempfile
+import threading
+import time
+
+BIN = os.path.join(os.path.dirname(os.path.realpath(__file__)), "..", "bin")
+sys.path.insert(0, BIN)
+
+import constants as cs  # noqa: E402
+import libdb  # noqa: E402
+import libmeter as lm  # noqa: E402
+import numpy as np  # noqa: E402
+
+# aggregation -> hours to compare
+PERIODS: dict[str, int] = {"h": 80, "D": 80 * 24, "ME": 3 * 366 * 24, "YE": 10 * 366 * 24}
+
+
+def consistent(con: s3.Connection) -> bool:
+    """Return whether the rollups are up to date with `mains`.
+
+    The daemon commits the samples before it updates the rollups, so a
+    reader may see the samples without their rollups for a moment.
+    """
+    _meter = cs.WIZ_WTR["meter"]
+    _latest = con.execute(
+        "SELECT sample_epoch, water FROM mains"
+        " WHERE meter = ? ORDER BY sample_epoch DESC LIMIT 1;",
+        (_meter,),
+    ).fetchone()
+    _state = dict(
+        con.execute(
+            "SELECT name, value FROM rollup_state WHERE name IN (?, ?);",
+            (f"hwm:{_meter}", f"hwm_water:{_meter}"),
+        ).fetchall()
+    )
+    if _latest is None:
+        return True
+    return _latest == (
+        _state.get(f"hwm:{_meter}"),
+        _state.get(f"hwm_water:{_meter}", _latest[1]),
+    )
+
+
+def compare() -> list:
+    """Return aggregation, buckets, usage (rollups, raw) and the mismatching buckets.
+
+    Everything is read from one snapshot of the database. The first bucket of
+    a period that starts after the first sample is skipped; it is only partly
+    covered by the raw samples.
+    """
+    _argv, sys.argv = sys.argv, ["trend.py", "--hours", "0"]
+    try:
+        import trend  # pylint: disable=C0415
+    finally:
+        sys.argv = _argv
+
+    # `trend` queries through this connection
+    con = libdb.shared(cs.TREND["database"], readonly=True)
+    for _ in range(100):
+        con.execute("BEGIN;")
+        if consistent(con):
+            break
+        con.rollback()
+        time.sleep(0.1)
+    else:
+        raise RuntimeError("the rollups did not catch up with mains")
+    table = []
+    try:
+        for aggregation, hours in PERIODS.items():
+            rolled = trend.fetch_rollup(hours, aggregation)
+            if rolled is None:
+                raise RuntimeError("the database has no rollups")
+            raw = trend.fetch_mains([(hours, aggregation)])[0]
+            _index = rolled.index.intersection(raw.index)
+            _window = con.execute(
+                "SELECT CAST(strftime('%s', 'now', ?) AS INTEGER) > MIN(sample_epoch)"
+                " FROM mains WHERE meter = ?;",
+                (f"-{hours + 1} hours", cs.WIZ_WTR["meter"]),
+            ).fetchone()[0]
+            if _window:
+                _index = _index[1:]
+            _rolled = rolled.loc[_index, "water"].to_numpy(dtype=np.float64)
+            _raw = raw.loc[_index, "water"].to_numpy(dtype=np.float64)
+            _wrong = ~np.isclose(_rolled, _raw)
+            _mismatches = int(np.count_nonzero(_wrong))
+            table.append([aggregation, len(_index), _rolled.sum(), _raw.sum(), _mismatches])
+            for _epoch, _r, _w in zip(
+                _index[_wrong][:5], _rolled[_wrong][:5], _raw[_wrong][:5], strict=True
+            ):
+                print(f"{aggregation} {_epoch}: rollups {_r:.0f} L, raw {_w:.0f} L")
+    finally:
+        con.rollback()
+    return table
+
+
+def simulate(days: int, tmp: str) -> list:
+    """Run the daemon for `days` in virtual time upto now and compare while it runs."""
+    database = f"{tmp}/wizwtr.sqlite3"
+    with open(f"{BIN}/sq3_wizwtr.sql", encoding="utf-8") as _sql, s3.connect(database) as con:
+        # skip the shebang
+        con.executescript(_sql.read().split("\n", 1)[1])
+    # configure before `wizwtr` is imported; it creates the LEDs at import
+    cs.WIZ_WTR.update(
+        database=database,
+        spool=f"{tmp}/spool.tsv",
+        metrics=f"{tmp}/wizwtr.prom",
+        led_status=f"{tmp}/status.json",
+    )
+    cs.WIZ_WTR["simulator"].update(failures=0.01, seed=1)
+    cs.TREND.update(
+        database=database,
+        website=tmp,
+        archive=f"{tmp}/archive",
+        cache=f"{tmp}/trend_mains.npz",
+    )
+    sys.argv = ["wizwtr.py", "--start", "--simulate"]
+    import wizwtr  # pylint: disable=C0415
+
+    logging.getLogger().setLevel(logging.ERROR)
+    _end = time.time()
+    wizwtr.CLOCK = lm.SimulatedClock(start=_end - days * 86400)
+    result: list = []
+
+    def _watch() -> None:
+        while wizwtr.CLOCK.time() < _end:
+            time.sleep(0.01)
+        # keep the daemon running, but not ahead of the real time by much
+        wizwtr.CLOCK.speed = 10.0
+        try:
+            result.append(compare())
+        finally:
+            os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=_watch, daemon=True).start()
+    wizwtr.main()
+    if not result:
+        raise RuntimeError("the rollups could not be compared")
+    return result[0]
+
+
+def main(opt) -> int:
+    from tabulate import tabulate  # pylint: disable=C0415
+
+    _tmp = tempfile.mkdtemp(prefix="wizwtr_check_")
+    try:
+        if opt.database:
+            cs.TREND.update(database=opt.database, cache=f"{_tmp}/trend_mains.npz")
+            table = compare()
+        else:
+            table = simulate(opt.days, _tmp)
+    finally:
+        shutil.rmtree(_tmp)
+    print(
+        tabulate(
+            table,
+            headers=["aggregation", "buckets", "rollups [L]", "raw [L]", "mismatches"],
+            floatfmt=".0f",
+        )
+    )
+    return 1 if any(_row[-1] for _row in table) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the rollups against the raw samples")
+    parser.add_argument("--days", type=int, default=14, help="simulated days of operation")
+    parser.add_argument("--database", type=str, help="check this database instead")
+    sys.exit(main(parser.parse_args()))
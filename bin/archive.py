@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Archive the closed months of `mains` as one columnar file per month.
+
+Each month is stored as a NumPy `.npy` file holding the `sample_epoch` and
+`water` columns, ordered by `sample_epoch`. The files are not compressed, so
+they can be memory-mapped. A month is partitioned on `sample_epoch`, which is
+the local time expressed as seconds since the epoch.
+
+The manifest (`manifest.json`) records the row count, last epoch and sum of
+the readings of each archived month. A month is only (re-)exported when these
+differ from the database, e.g. after importing historical readings. Closed
+months never change otherwise, so syncing the archive is cheap.
+
+The configured meter (WIZ_WTR["meter"]) is archived in the archive directory
+itself; any other meter in a sub-directory named after the meter.
+"""
+
+import argparse
+import calendar
+import json
+import os
+import sqlite3 as s3
+import time
+
+import constants as cs
+import libdb
+import librollup as rollup
+import numpy as np
+
+TABLE_MAINS: str = cs.WIZ_WTR["sql_table"]
+METER: str = cs.WIZ_WTR["meter"]
+MANIFEST: str = "manifest.json"
+# `water` is a float so missing readings (NULL) are kept as NaN
+DTYPE = np.dtype([("sample_epoch", "<i8"), ("water", "<f8")])
+
+
+def month_epochs(month: str) -> tuple[int, int]:
+    """Return the first epoch of the month and of the next month.
+
+    Args:
+        month (str): yyyy-mm
+
+    Returns:
+        (int, int): start and end (exclusive) of the month
+    """
+    _year, _month = (int(_v) for _v in month.split("-"))
+    _next = (_year + _month // 12, _month % 12 + 1)
+    return calendar.timegm((_year, _month, 1, 0, 0, 0)), calendar.timegm((*_next, 1, 0, 0, 0))
+
+
+def meter_dir(archive_dir: str, meter: str) -> str:
+    """Return the location of the archive of the meter.
+
+    Args:
+        archive_dir (str): location of the archive
+        meter (str): id of the meter
+    """
+    return archive_dir if meter == METER else f"{archive_dir}/{meter}"
+
+
+def load_manifest(archive_dir: str) -> dict:
+    """Return the manifest of the archive; an empty one if there is no archive.
+
+    Args:
+        archive_dir (str): location of the archive
+    """
+    try:
+        with open(f"{archive_dir}/{MANIFEST}", encoding="utf-8") as _fp:
+            return json.load(_fp)
+    except (OSError, ValueError):
+        return {"upto": 0, "months": {}}
+
+
+def _save_manifest(archive_dir: str, manifest: dict) -> None:
+    _file = f"{archive_dir}/{MANIFEST}"
+    with open(f"{_file}.tmp", "w", encoding="utf-8") as _fp:
+        json.dump(manifest, _fp, indent=1, sort_keys=True)
+    os.replace(f"{_file}.tmp", _file)
+
+
+def export(
+    con: s3.Connection, archive_dir: str, meter: str = METER, verbose: bool = False
+) -> list[str]:
+    """Export the closed months that are new or changed since the previous export.
+
+    Args:
+        con: connection to the database
+        archive_dir (str): location of the archive
+        meter (str): id of the meter to export
+        verbose (bool): report each exported month
+
+    Returns:
+        (list): the months that were exported.
+    """
+    archive_dir = meter_dir(archive_dir, meter)
+    os.makedirs(archive_dir, exist_ok=True)
+    manifest = load_manifest(archive_dir)
+    # the current month (local time) is still open
+    current = time.strftime("%Y-%m")
+    upto = month_epochs(current)[0]
+    stats = con.execute(
+        f"SELECT strftime('%Y-%m', sample_epoch, 'unixepoch') AS month,"  # nosec B608
+        f" COUNT(*), MAX(sample_epoch), SUM(water)"
+        f" FROM {TABLE_MAINS} WHERE meter = ? AND sample_epoch < ?"
+        f" GROUP BY month ORDER BY month;",
+        (meter, upto),
+    ).fetchall()
+    exported = []
+    for month, rows, last_epoch, water_sum in stats:
+        _entry = {"rows": rows, "last_epoch": last_epoch, "water_sum": water_sum}
+        if manifest["months"].get(month, {}).get("stats") == _entry:
+            continue
+        _start, _end = month_epochs(month)
+        data = np.array(
+            con.execute(
+                f"SELECT sample_epoch, water FROM {TABLE_MAINS}"  # nosec B608
+                f" WHERE meter = ? AND sample_epoch >= ? AND sample_epoch < ?"
+                f" ORDER BY sample_epoch;",
+                (meter, _start, _end),
+            ).fetchall(),
+            dtype=np.float64,
+        ).reshape(-1, 2)
+        _file = f"mains-{month}.npy"
+        _array = np.empty(len(data), dtype=DTYPE)
+        _array["sample_epoch"] = data[:, 0]
+        _array["water"] = data[:, 1]
+        with open(f"{archive_dir}/{_file}.tmp", "wb") as _fp:
+            np.save(_fp, _array)
+        os.replace(f"{archive_dir}/{_file}.tmp", f"{archive_dir}/{_file}")
+        manifest["months"][month] = {"file": _file, "stats": _entry}
+        # the manifest is updated after each month, so an interrupted export is not lost
+        _save_manifest(archive_dir, manifest)
+        exported.append(month)
+        if verbose:
+            print(f"Exported {meter} {month}: {rows} rows")
+    if manifest.get("upto") != upto:
+        manifest["upto"] = upto
+        _save_manifest(archive_dir, manifest)
+    return exported
+
+
+class Archive:
+    """Read access to the archived months."""
+
+    def __init__(self, archive_dir: str, meter: str = METER) -> None:
+        """Open the archive.
+
+        Args:
+            archive_dir (str): location of the archive
+            meter (str): id of the meter
+        """
+        archive_dir = meter_dir(archive_dir, meter)
+        self.archive_dir: str = archive_dir
+        manifest = load_manifest(archive_dir)
+        # all data before `upto` is in the archive
+        self.upto: int = int(manifest.get("upto", 0))
+        self.months: dict = manifest["months"]
+
+    def read(self, start_epoch: int, end_epoch: int) -> np.ndarray:
+        """Return the archived rows in the given period.
+
+        The month files are memory-mapped, so only the requested rows are read.
+
+        Args:
+            start_epoch (int): start of the period
+            end_epoch (int): end of the period (exclusive)
+
+        Returns:
+            (np.ndarray): (n, 2) float array of sample_epoch, water
+        """
+        end_epoch = min(end_epoch, self.upto)
+        parts = []
+        for month, _entry in sorted(self.months.items()):
+            _start, _end = month_epochs(month)
+            if _end <= start_epoch or _start >= end_epoch:
+                continue
+            _array = np.load(f"{self.archive_dir}/{_entry['file']}", mmap_mode="r")
+            _epochs = _array["sample_epoch"]
+            _slice = _array[
+                np.searchsorted(_epochs, start_epoch) : np.searchsorted(_epochs, end_epoch)
+            ]
+            parts.append(np.column_stack((_slice["sample_epoch"], _slice["water"])))
+        if not parts:
+            return np.empty((0, 2), dtype=np.float64)
+        return np.concatenate(parts)
+
+
+if __name__ == "__main__":
+    # fmt: off
+    parser = argparse.ArgumentParser(description="Archive the closed months of the database")
+    parser.add_argument("--database",
+                        type=str,
+                        default=cs.WIZ_WTR["database"],
+                        help="database to archive (default: the configured database)"
+                        )
+    parser.add_argument("--archive",
+                        type=str,
+                        default=cs.TREND["archive"],
+                        help="location of the archive (default: the configured archive)"
+                        )
+    OPTION = parser.parse_args()
+    # fmt: on
+    print(f"Archiving {OPTION.database} to {OPTION.archive}")
+    with libdb.connect(OPTION.database, readonly=True) as _con:
+        _count = 0
+        for _meter in rollup.meters(_con):
+            _count += len(export(_con, OPTION.archive, _meter, verbose=True))
+        print(f"{_count} month(s) exported")
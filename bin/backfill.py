@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Import historical meter readings into the database.
+
+Readings are read from a CSV file (with a header) or a JSON-lines file. Each
+reading must have a `water` value [L] and either a `sample_epoch` [s] or a
+local `sample_time` (yyyy-mm-dd hh:mm:ss). The readings are expected in
+chronological order. They are compacted into 15-minute data the same way as
+the daemon does, in chunks, and stored in bulk.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import sqlite3 as s3
+import time
+
+import constants as cs
+import libdb
+import librollup as rollup
+import libwizwtr as wtr
+import numpy as np
+
+# fmt: off
+parser = argparse.ArgumentParser(description="Import historical meter readings")
+parser.add_argument("file",
+                    type=str,
+                    help="CSV or JSON-lines file containing the readings"
+                    )
+parser.add_argument("--chunk", "-c",
+                    type=int,
+                    default=100_000,
+                    help="number of readings processed at once (default: 100000)"
+                    )
+parser.add_argument("--database",
+                    type=str,
+                    default=cs.WIZ_WTR["database"],
+                    help="database to import into (default: the configured database)"
+                    )
+parser.add_argument("--meter",
+                    type=str,
+                    default=cs.WIZ_WTR["meter"],
+                    help="id of the meter the readings belong to (default: the configured meter)"
+                    )
+parser.add_argument("--debug",
+                    action="store_true",
+                    help="start in debugging mode"
+                    )
+OPTION = parser.parse_args()
+# fmt: on
+
+DEBUG = False
+SQL_INSERT = (
+    f"INSERT OR REPLACE INTO {cs.WIZ_WTR['sql_table']} "
+    f"(meter, sample_time, sample_epoch, water) "
+    f"VALUES (:meter, :sample_time, :sample_epoch, :water);"
+)
+# fmt: off
+# in addition to those of `libdb`
+PRAGMAS: list[str] = [
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -65536;",  # 64 MiB
+]
+# fmt: on
+
+
+def read_readings(file_name: str):
+    """Yield (epoch, water) tuples from the file
+
+    Args:
+        file_name (str): CSV or JSON-lines file
+
+    Yields:
+        (int, int): epoch and meter reading [L]
+    """
+
+    def _epoch(reading: dict) -> int:
+        if reading.get("sample_epoch") not in (None, ""):
+            return int(float(reading["sample_epoch"]))
+        return int(time.mktime(time.strptime(reading["sample_time"], cs.DT_FORMAT)))
+
+    with open(file_name, encoding="utf-8", newline="") as _fp:
+        if file_name.endswith(".csv"):
+            readings = csv.DictReader(_fp)
+        else:
+            readings = (json.loads(_line) for _line in _fp if _line.strip())
+        for reading in readings:
+            yield _epoch(reading), int(float(reading["water"]))
+
+
+def import_readings(
+    con: s3.Connection, readings, chunk_size: int, meter: str = cs.WIZ_WTR["meter"]
+) -> tuple[int, int]:
+    """Compact the readings and store them in chunks
+
+    The readings of the last bucket of a chunk are carried over to the next
+    chunk, so buckets are never split.
+
+    Args:
+        con: connection to the database
+        readings: iterable of (epoch, water) tuples
+        chunk_size (int): number of readings processed at once
+        meter (str): id of the meter the readings belong to
+
+    Returns:
+        (int, int): number of readings read and number of rows stored
+    """
+    bucket_size = int(cs.WIZ_WTR["report_interval"])
+    carry = np.empty((0, 2), dtype=np.int64)
+    total_read = 0
+    total_stored = 0
+    t_start = time.perf_counter()
+    readings = iter(readings)
+    while True:
+        _chunk = np.array(list(itertools.islice(readings, chunk_size)), dtype=np.int64)
+        _chunk = _chunk.reshape(-1, 2)
+        total_read += len(_chunk)
+        data = np.concatenate((carry, _chunk))
+        if not len(data):
+            break
+        data = data[np.argsort(data[:, 0], kind="stable")]
+        if len(_chunk):
+            # hold back the last (possibly incomplete) bucket
+            _held = data[:, 0] // bucket_size == data[-1, 0] // bucket_size
+            carry = data[_held]
+            data = data[~_held]
+        else:
+            carry = carry[:0]
+        if len(data):
+            records = wtr.WizWTR.compact_arrays(data[:, 0], data[:, 1], meter)
+            with con:
+                con.executemany(SQL_INSERT, records)
+            total_stored += len(records)
+        _elapsed = time.perf_counter() - t_start
+        print(
+            f"{total_read:>12} readings  {total_stored:>10} rows  "
+            f"{total_read / max(_elapsed, 1e-9):>12.0f} readings/s"
+        )
+    return total_read, total_stored
+
+
+def main(opt) -> None:
+    """
+    This is the main loop
+    """
+    t_start = time.perf_counter()
+    con = libdb.connect(opt.database)
+    for pragma in PRAGMAS:
+        con.execute(pragma)
+    try:
+        total_read, total_stored = import_readings(
+            con, read_readings(opt.file), opt.chunk, opt.meter
+        )
+        print("Rebuilding rollups...")
+        rollup.rebuild(con)
+    finally:
+        # leave the data in the database file so it can be synced
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        con.close()
+    _elapsed = time.perf_counter() - t_start
+    print(
+        f"Imported {total_read} readings as {total_stored} rows in {_elapsed:.1f}s "
+        f"({total_read / max(_elapsed, 1e-9):.0f} readings/s)"
+    )
+
+
+if __name__ == "__main__":
+    if OPTION.debug:
+        print(OPTION)
+        DEBUG = True
+        print("DEBUG-mode started")
+    main(OPTION)
@@ -1,71 +1,200 @@
 #!/usr/bin/env python3
 
-import os
-import sys
+"""Settings of wizwtr.
+
+Importing this module is cheap: the locations that must be searched for (the
+database, the website, ...) are only resolved when they are first used, and
+then remembered. The location of the database is also kept in a small cache
+file, so later runs only have to check that it is still there. A search
+location (e.g. a network mount) that does not answer within a few seconds is
+skipped instead of hanging the caller. Run this module to search again.
+"""
 
-import pytz
-from sh import CommandNotFound, git  # type: ignore[import-untyped]
+import contextlib
+import functools
+import json
+import os
+import threading
 
 _MYHOME: str = os.environ["HOME"]
 _DATABASE_FILENAME: str = "wizwtr.sqlite3"
-_DATABASE: str = f"/srv/rmt/_databases/wizwtr/{_DATABASE_FILENAME}"
 _HERE_list: list[str] = os.path.realpath(__file__).split("/")
 # ['', 'home', 'pi', 'kimnaty', 'bin', 'constants.py']
 _HERE: str = "/".join(_HERE_list[0:-2])
-_WEBSITE: str = "/run/wizwtr/site/img"
-
-if not os.path.isfile(_DATABASE):
-    _DATABASE = f"/srv/databases/{_DATABASE_FILENAME}"
-if not os.path.isfile(_DATABASE):
-    _DATABASE = f"/srv/data/{_DATABASE_FILENAME}"
-if not os.path.isfile(_DATABASE):
-    _DATABASE = f"/mnt/data/{_DATABASE_FILENAME}"
-if not os.path.isfile(_DATABASE):
-    _DATABASE = f".local/{_DATABASE_FILENAME}"
-    print(f"Searching for {_DATABASE}")
-if not os.path.isfile(_DATABASE):
+# the database is searched for in these locations, in this order
+_DATABASES: list[str] = [
+    f"/srv/rmt/_databases/wizwtr/{_DATABASE_FILENAME}",
+    f"/srv/databases/{_DATABASE_FILENAME}",
+    f"/srv/data/{_DATABASE_FILENAME}",
+    f"/mnt/data/{_DATABASE_FILENAME}",
+]
+# ... and then in these (announced) fall-back locations
+_DATABASES_FALLBACK: list[str] = [
+    f".local/{_DATABASE_FILENAME}",
     # mkdir ~/.sqlite3/wizwtr
     # ln -s ~/Dropbox/raspi/_databases/wizwtr/wizwtr.swlite3 ~/.sqlite3/wizwtr/wizwtr.sqlite3
-    _DATABASE = f"{_MYHOME}/.sqlite3/wizwtr/{_DATABASE_FILENAME}"
-    print(f"Searching for {_DATABASE}")
-if not os.path.isfile(_DATABASE):
-    _DATABASE = f"{_DATABASE_FILENAME}"
-    print(f"Searching for {_DATABASE}")
-if not os.path.isfile(_DATABASE):
-    print("Database is missing.")
-    sys.exit(1)
-
-if not os.path.isdir(_WEBSITE):
-    print("Graphics will be diverted to /tmp")
-    _WEBSITE = "/tmp"  # nosec B108
+    f"{_MYHOME}/.sqlite3/wizwtr/{_DATABASE_FILENAME}",
+    f"{_DATABASE_FILENAME}",
+]
+# location of the database found by the previous search
+_SETTINGS_CACHE: str = f"{_MYHOME}/.cache/wizwtr/settings.json"
+# a search location that does not answer within this time [s] is skipped
+_PROBE_TIMEOUT: float = 3.0
+
+
+def _exists(path: str, probe=os.path.isfile) -> bool:
+    """Return whether the path exists; a path that does not answer in time counts as missing.
+
+    A stalled (network) mount blocks the probe in the kernel, so the probe is
+    done in a thread that is abandoned when it takes too long.
+    """
+    found: list[bool] = []
+    _prober = threading.Thread(target=lambda: found.append(probe(path)), daemon=True)
+    _prober.start()
+    _prober.join(_PROBE_TIMEOUT)
+    if _prober.is_alive():
+        print(f"{path} does not respond; skipped")
+    return bool(found) and found[0]
+
+
+@functools.cache
+def _database() -> str:
+    """Return the location of the database."""
+    try:
+        with open(_SETTINGS_CACHE, encoding="utf-8") as _fp:
+            _cached = json.load(_fp)
+        if _cached["candidates"] == _DATABASES and _exists(_cached["database"]):
+            return str(_cached["database"])
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    for _path in _DATABASES:
+        if _exists(_path):
+            _remember(_path)
+            return _path
+    # the fall-back locations are relative to the working directory or personal,
+    # so they are not remembered
+    for _path in _DATABASES_FALLBACK:
+        print(f"Searching for {_path}")
+        if _exists(_path):
+            return _path
+    raise FileNotFoundError("Database is missing.")
+
+
+def _remember(database: str) -> None:
+    """Store the location of the database in the cache file; failures are ignored."""
+    try:
+        os.makedirs(os.path.dirname(_SETTINGS_CACHE), exist_ok=True)
+        with open(f"{_SETTINGS_CACHE}.tmp", "w", encoding="utf-8") as _fp:
+            json.dump({"database": database, "candidates": _DATABASES}, _fp)
+        os.replace(f"{_SETTINGS_CACHE}.tmp", _SETTINGS_CACHE)
+    except OSError:
+        pass
+
+
+@functools.cache
+def _website() -> str:
+    if not _exists("/run/wizwtr/site/img", os.path.isdir):
+        print("Graphics will be diverted to /tmp")
+        return "/tmp"  # nosec B108
+    return "/run/wizwtr/site/img"
+
+
+@functools.cache
+def _socket() -> str:
+    if not _exists("/run/wizwtr", os.path.isdir):
+        return "/tmp/wizwtr.trend.sock"  # nosec B108
+    return "/run/wizwtr/trend.sock"
+
+
+@functools.cache
+def _rundir() -> str:
+    if not _exists("/run/wizwtr", os.path.isdir):
+        return "/tmp"  # nosec B108
+    return "/run/wizwtr"
+
+
+class _Lazy:
+    """A setting that is resolved when it is first used."""
+
+    def __init__(self, resolve) -> None:
+        self.resolve = resolve
+
+    def __repr__(self) -> str:
+        return "<not resolved yet>"
+
+
+class Settings(dict):
+    """Dict of settings; lazy settings are resolved on first access and then kept."""
+
+    def __getitem__(self, key):
+        value = super().__getitem__(key)
+        if isinstance(value, _Lazy):
+            value = value.resolve()
+            self[key] = value
+        return value
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        return self[key] if isinstance(value, _Lazy) else value
+
+    def values(self):
+        return [self[_key] for _key in self]
+
+    def items(self):
+        return [(_key, self[_key]) for _key in self]
+
+
+def __getattr__(name: str):
+    # pytz is only imported when the time zone is used
+    if name == "TIMEZONE":
+        import pytz  # pylint: disable=C0415
+
+        return pytz.timezone("Europe/Amsterdam")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 D_FORMAT = "%Y-%m-%d"
 DT_FORMAT = "%Y-%m-%d %H:%M:%S"
-TIMEZONE = pytz.timezone("Europe/Amsterdam")
 FLOAT_FMT = "+.0f"
 
 # fmt: off
-TREND: dict = {
-    "database": _DATABASE,
-    "website": _WEBSITE,
-    "hour_graph": f"{_WEBSITE}/wtr_pasthours",
-    "day_graph": f"{_WEBSITE}/wtr_pastdays",
-    "month_graph": f"{_WEBSITE}/wtr_pastmonths",
-    "year_graph": f"{_WEBSITE}/wtr_pastyears",
-}
-
-WIZ_WTR: dict = {
-    "database": _DATABASE,
+TREND: dict = Settings({
+    "database": _Lazy(_database),
+    "website": _Lazy(_website),
+    "hour_graph": _Lazy(lambda: f"{_website()}/wtr_pasthours"),
+    "day_graph": _Lazy(lambda: f"{_website()}/wtr_pastdays"),
+    "month_graph": _Lazy(lambda: f"{_website()}/wtr_pastmonths"),
+    "year_graph": _Lazy(lambda: f"{_website()}/wtr_pastyears"),
+    "event_graph": _Lazy(lambda: f"{_website()}/wtr_events"),
+    # trend server (see `trend.py --serve` and `trendclient.py`)
+    "socket": _Lazy(_socket),
+    # closed months of `mains` (see `archive.py`)
+    "archive": _Lazy(lambda: f"{os.path.dirname(os.path.abspath(_database()))}/archive"),
+    # first-order differences cached between runs
+    "cache": f"{_MYHOME}/.cache/wizwtr/trend_mains.npz",
+})
+
+WIZ_WTR: dict = Settings({
+    "database": _Lazy(_database),
     "sql_table": "mains",
     "sql_command": "INSERT INTO mains ("
-                   "sample_time, sample_epoch, "
+                   "meter, sample_time, sample_epoch, "
                    "water"
                    ");"
-                   "VALUES (?, ?, ?)",
+                   "VALUES (?, ?, ?, ?)",
+    # id of the meter configured by `serial` and `token` in the config file;
+    # the trends, the archive and the API show this meter unless told otherwise.
+    "meter": "mains",
     "report_interval": 900,
     "samplespercycle": 15,
     "delay": 0,
+    # sampling intervals [s] while water is flowing and (at most) while idle (see `--adaptive`)
+    "adaptive": {"active": 10, "idle": 300},
+    # samples held in memory awaiting compaction (2 days worth)
+    "buffer_size": 2 * 96 * 15,
+    "buffer_overflow": "drop_oldest",
     "template": {
+        "meter": "mains",
         "sample_time": "yyyy-mm-dd hh:mm:ss",
         "sample_epoch": 0,
         "water": 0,  # L
@@ -80,8 +209,26 @@ WIZ_WTR: dict = {
         "2025-04-13 19:01:00": -0.058,
         "2025-04-27 18:55:00": +0.005,
     },
+    # `serial` and `token` of the meter; more meters are listed under `meters` (see `libmeter`)
     "config": f"{_MYHOME}/.config/homewizard/wtr.json",
-    }
+    # simulated meters (see `wizwtr.py --simulate` and `libmeter.SimulatedMeter`)
+    "simulator": {"latency": 0.2, "jitter": 0.1, "failures": 0.01, "seed": None},
+    "simulated_meters": ["mains"],
+    # compacted data is spooled locally before it is stored in the database
+    "spool": f"{_MYHOME}/.local/state/wizwtr/spool.tsv",
+    "spool_batch": 1000,
+    # seconds to wait for a lock on the database before giving up (see `libdb`)
+    "busy_timeout": 30.0,
+    # number of days the flow events are kept; 0 disables storing them
+    "flow_retention": 90,
+    # instrumentation (Prometheus text format) and profiling (`--profile`) output
+    "metrics": _Lazy(lambda: f"{_rundir()}/wizwtr.prom"),
+    "profile": _Lazy(lambda: f"{_rundir()}/wizwtr.pstats"),
+    # (host, port) of the JSON API (see `--api`)
+    "api": ("127.0.0.1", 8087),
+    # state of the status LEDs for the web page; None to disable
+    "led_status": _Lazy(lambda: f"{_website()}/status.json"),
+    })
 # fmt: on
 
 
@@ -93,6 +240,9 @@ def get_app_version() -> str:
     """
     # git log -n1 --format="%h"
     # git --no-pager log -1 --format="%ai"
+    # `sh` takes long to import, so it is only imported when it is needed
+    from sh import CommandNotFound, git  # type: ignore[import-untyped] # pylint: disable=C0415
+
     git_args = ["-C", f"{_HERE}", "--no-pager", "log", "-1", "--format='%h'"]
     try:
         _exit_h = git(git_args).strip("\n").strip("'")
@@ -105,7 +255,10 @@ def get_app_version() -> str:
 
 
 if __name__ == "__main__":
+    # search again
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(_SETTINGS_CACHE)
     print(f"home              = {_MYHOME}")
-    print(f"database location = {_DATABASE}")
+    print(f"database location = {_database()}")
     print("")
     print(f"wizwtr (me)      = {get_app_version()}")
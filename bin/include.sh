@@ -32,7 +32,8 @@ declare -a wizwtr_timers=("wizwtr.trend.day.timer"
     "wizwtr.trend.year.timer")
   # "wizwtr.update.timer" (incl. the .service) is not installed
 # list of services provided
-declare -a wizwtr_services=("wizwtr.service")
+declare -a wizwtr_services=("wizwtr.service"
+    "wizwtr.trend.service")
 # Install python3 and develop packages
 # Support for matplotlib & numpy needs to be installed seperately
 # Support for serial port
@@ -44,7 +45,8 @@ declare -a wizwtr_apt_packages=("build-essential" "python3" "python3-dev" "pytho
 declare -a wizwtr_graphs=('wtr_pastdays_mains.png'
     'wtr_pasthours_mains.png'
     'wtr_pastmonths_mains.png'
-    'wtr_pastyears_mains.png')
+    'wtr_pastyears_mains.png'
+    'wtr_events_mains.png')
 
 # start the application
 start_wizwtr() {
@@ -69,6 +71,8 @@ stop_wizwtr() {
     action_services stop
     # sync the database into the cloud
     if command -v rclone &> /dev/null; then
+        # move the latest commits from the WAL file into the database file
+        sqlite3 "${db_full_path}" "PRAGMA wal_checkpoint(TRUNCATE);"
         rclone copyto -v \
                "${database_local_root}/${app_name}/${database_filename}" \
                "${database_remote_root}/${app_name}/${database_filename}"
@@ -87,6 +91,8 @@ update_wizwtr() {
     echo "pip update..."
     python -m pip install --upgrade pip -r "${APPDIR}/requirements.txt" \
         |  grep -v "Requirement already satisfied"
+    echo "database migration..."
+    "${APPDIR}/bin/migrate.py"
 }
 
 # create graphs
@@ -94,12 +100,31 @@ graph_wizwtr() {
     echo "*** $app_name running on $host_name >>>>>>: graph $1"
     ROOT_DIR=$1
 
-    echo "Creating graphs [1]"
-    . "${ROOT_DIR}/bin/pastday.sh"
-    echo "Creating graphs [2]"
-    . "${ROOT_DIR}/bin/pastmonth.sh"
-    echo "Creating graphs [3]"
-    . "${ROOT_DIR}/bin/pastyear.sh"
+    echo "Creating graphs"
+    # fetch the data once and render all graphs in parallel
+    pushd "${ROOT_DIR}/bin" >/dev/null || return 1
+    ./trendclient.py --all || ./trend.py --all
+    popd >/dev/null || return 1
+}
+
+# import historical readings into the database
+import_wizwtr() {
+    echo "*** $app_name running on $host_name >>>>>>: import $2"
+    ROOT_DIR=$1
+    READINGS=$(realpath "$2")
+
+    # stop the daemon to avoid competing for the database
+    action_services stop
+    "${ROOT_DIR}/bin/backfill.py" "${READINGS}"
+    action_services start
+}
+
+# archive the closed months of the database
+archive_wizwtr() {
+    echo "*** $app_name running on $host_name >>>>>>: archive"
+    ROOT_DIR=$1
+
+    "${ROOT_DIR}/bin/archive.py"
 }
 
 # stop, update the repo and start the application
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Local HTTP/JSON API serving the live and historic water usage.
+
+Endpoints:
+    /api/live                 the latest sample: total [L] and flow [L/min]
+    /api/series/<agg>?hours=N usage per bucket from the rollups; <agg> is h, D, ME or YE
+    /api/events?limit=N       the largest flow events of today
+
+All endpoints take `meter=<id>` to select a meter other than WIZ_WTR["meter"].
+
+Every response carries an ETag and a Last-Modified header; conditional
+requests (If-None-Match, If-Modified-Since) are answered with 304 Not
+Modified when nothing changed.
+
+Run this module directly to serve a database with a fake meter, e.g. to
+develop the web page:
+    ./libapi.py --database wizwtr.sqlite3 --port 8087
+"""
+
+import argparse
+import collections
+import contextlib
+import email.utils
+import hashlib
+import http.server
+import json
+import logging
+import random
+import sqlite3 as s3
+import threading
+import time
+import urllib.parse
+
+import constants as cs
+import libdb
+import libflow as lf
+import librollup as rollup
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# default number of hours per aggregation; the same periods as the trend graphs
+DEFAULT_HOURS: dict[str, int] = {"h": 80, "D": 80 * 24, "ME": 84 * 31 * 24, "YE": 10 * 366 * 24}
+# number of resources for which the validators are remembered
+MAX_VALIDATORS: int = 16
+
+
+class ApiHandler(http.server.BaseHTTPRequestHandler):
+    """Handle a request of the API."""
+
+    server: "ApiHTTPServer"
+
+    def do_GET(self) -> None:  # noqa: N802
+        _url = urllib.parse.urlsplit(self.path)
+        _query = urllib.parse.parse_qs(_url.query)
+        _parts = _url.path.strip("/").split("/")
+        _meter = _query.get("meter", [cs.WIZ_WTR["meter"]])[0]
+        try:
+            if _parts == ["api", "live"]:
+                body = self.server.api.live(_meter)
+                key: tuple = ("live", _meter)
+            elif len(_parts) == 3 and _parts[:2] == ["api", "series"]:
+                _hours = _query.get("hours")
+                body = self.server.api.series(
+                    _parts[2], None if _hours is None else int(_hours[0]), meter=_meter
+                )
+                key = ("series", body["aggregation"], body["hours"], _meter)
+            elif _parts == ["api", "events"]:
+                _limit = int(_query.get("limit", [10])[0])
+                body = self.server.api.events(_limit, meter=_meter)
+                key = ("events", _limit, _meter)
+            else:
+                self.send_error(404)
+                return
+        except (KeyError, ValueError) as her:
+            self.send_error(400, explain=str(her))
+            return
+        except s3.Error as her:
+            LOGGER.error(f"API request {self.path} failed: {her}")
+            self.send_error(503, explain="database not available")
+            return
+        self._respond(key, body)
+
+    def _respond(self, key: tuple, body: dict) -> None:
+        _content = json.dumps(body, separators=(",", ":")).encode("utf-8")
+        etag, last_modified = self.server.api.validators(key, _content)
+        _headers = {
+            "ETag": etag,
+            "Last-Modified": email.utils.formatdate(last_modified, usegmt=True),
+            "Cache-Control": "no-cache",
+            "Access-Control-Allow-Origin": "*",
+        }
+        if self._not_modified(etag, last_modified):
+            self.send_response(304)
+            for _name, _value in _headers.items():
+                self.send_header(_name, _value)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_content)))
+        for _name, _value in _headers.items():
+            self.send_header(_name, _value)
+        self.end_headers()
+        self.wfile.write(_content)
+
+    def _not_modified(self, etag: str, last_modified: float) -> bool:
+        _none_match = self.headers.get("If-None-Match")
+        if _none_match is not None:
+            return etag in [_tag.strip() for _tag in _none_match.split(",")] or _none_match == "*"
+        _since = self.headers.get("If-Modified-Since")
+        if _since is None:
+            return False
+        try:
+            return int(last_modified) <= email.utils.parsedate_to_datetime(_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+
+    def log_message(self, format, *args) -> None:  # pylint: disable=W0622
+        LOGGER.debug(f"{self.address_string()} {format % args}")
+
+
+class ApiHTTPServer(http.server.ThreadingHTTPServer):
+    """HTTP server that knows its API."""
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], api: "Api") -> None:
+        self.api: Api = api
+        super().__init__(address, ApiHandler)
+
+
+class Api:
+    """Data behind the API."""
+
+    def __init__(self, live, database: str) -> None:
+        """Initialise the API.
+
+        Args:
+            live: callable returning the latest sample of the given meter id as a dict or None
+                  (see WizWTR.live); it raises KeyError for an unknown meter
+            database (str): database holding the history
+        """
+        self._live = live
+        self.database: str = database
+        # key -> (etag, moment the content last changed); least recently used first
+        self._validators: collections.OrderedDict[tuple, tuple[str, float]] = (
+            collections.OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def validators(self, key: tuple, content: bytes) -> tuple[str, float]:
+        """Return the ETag of the content and the moment it last changed.
+
+        Only the MAX_VALIDATORS most recently requested resources are remembered.
+
+        Args:
+            key (tuple): the requested resource: the endpoint and its (normalised) parameters
+            content (bytes): the response body
+        """
+        etag = f'"{hashlib.sha1(content).hexdigest()}"'  # nosec B324
+        with self._lock:
+            _known = self._validators.get(key)
+            if _known is None or _known[0] != etag:
+                _known = (etag, time.time())
+            self._validators[key] = _known
+            self._validators.move_to_end(key)
+            if len(self._validators) > MAX_VALIDATORS:
+                self._validators.popitem(last=False)
+        return _known
+
+    def _connect(self) -> s3.Connection:
+        # every request is handled by a new thread, so the connection is not shared
+        return libdb.connect(self.database, readonly=True)
+
+    def live(self, meter: str = cs.WIZ_WTR["meter"]) -> dict:
+        """Return the latest sample of the meter."""
+        return {"meter": meter, "live": self._live(meter)}
+
+    def series(
+        self, aggregation: str, hours: int | None = None, meter: str = cs.WIZ_WTR["meter"]
+    ) -> dict:
+        """Return the usage per bucket of the last `hours` hours.
+
+        `bucket_epoch` is the local time of the start of the bucket expressed as
+        seconds since the epoch, like `sample_epoch` in the database.
+
+        Args:
+            aggregation (str): one of the keys of librollup.ROLLUPS
+            hours (int): hours of data; None for the default of the aggregation
+            meter (str): id of the meter
+        """
+        if aggregation not in rollup.ROLLUPS:
+            raise KeyError(f"unknown aggregation {aggregation!r}")
+        if hours is None:
+            hours = DEFAULT_HOURS[aggregation]
+        elif hours <= 0:
+            raise ValueError(f"hours must be positive, not {hours}")
+        con = self._connect()
+        try:
+            # `bucket_epoch` is local time, so the window is too
+            _start, _end = con.execute(
+                "SELECT CAST(strftime('%s', 'now', 'localtime', ?) AS INTEGER),"
+                " CAST(strftime('%s', 'now', 'localtime', '+1 hours') AS INTEGER);",
+                (f"-{hours + 1} hours",),
+            ).fetchone()
+            rows = rollup.fetch(con, aggregation, _start, _end, meter)
+        finally:
+            con.close()
+        return {"meter": meter, "aggregation": aggregation, "hours": hours, "series": rows}
+
+    def events(self, limit: int = 10, meter: str = cs.WIZ_WTR["meter"]) -> dict:
+        """Return the largest flow events of the meter of today."""
+        _today = time.localtime()
+        _start = int(time.mktime((*_today[:3], 0, 0, 0, 0, 0, -1)))
+        _end = int(time.mktime((*_today[:2], _today[2] + 1, 0, 0, 0, 0, 0, -1)))
+        con = self._connect()
+        try:
+            rows = lf.top_events(con, _start, _end, limit, meter)
+        finally:
+            con.close()
+        _fields = ["start_epoch", "start_time", "duration", "liters", "peak_lpm"]
+        events = [dict(zip(_fields, _row, strict=True)) for _row in rows]
+        return {"meter": meter, "events": events}
+
+
+class ApiServer:
+    """Serve the API from a background thread."""
+
+    def __init__(self, live, database: str, address: tuple[str, int]) -> None:
+        """Create the server.
+
+        Args:
+            live: callable returning the latest sample of the given meter id as a dict or None
+            database (str): database holding the history
+            address (tuple): (host, port) to listen on
+        """
+        self.httpd = ApiHTTPServer(address, Api(live, database))
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="api", daemon=True)
+
+    def start(self) -> None:
+        """Start serving."""
+        self._thread.start()
+        LOGGER.info(f"API listening on {self.httpd.server_address}")
+
+    def stop(self) -> None:
+        """Stop serving."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class FakeMeter:
+    """Stand-in for WizWTR.live that produces a plausible, increasing meter reading."""
+
+    def __init__(self) -> None:
+        self.water: float = 900_000.0
+        self.epoch: float = time.time()
+
+    def live(self, meter: str = cs.WIZ_WTR["meter"]) -> dict:
+        """Return a new sample of any meter; water flows about a quarter of the time."""
+        _now = time.time()
+        flow = random.choice([0.0, 0.0, 0.0, 6.5])  # nosec B311
+        self.water += flow * (_now - self.epoch) / 60
+        self.epoch = _now
+        return {
+            "meter": meter,
+            "sample_epoch": int(_now),
+            "sample_time": time.strftime(cs.DT_FORMAT, time.localtime(_now)),
+            "water": int(self.water),
+            "flow": flow,
+        }
+
+
+if __name__ == "__main__":
+    # fmt: off
+    parser = argparse.ArgumentParser(description="Serve the API with a fake meter")
+    parser.add_argument("--database",
+                        type=str,
+                        default=cs.WIZ_WTR["database"],
+                        help="database to serve (default: the configured database)"
+                        )
+    parser.add_argument("--port",
+                        type=int,
+                        default=cs.WIZ_WTR["api"][1],
+                        help="port to listen on"
+                        )
+    OPTION = parser.parse_args()
+    # fmt: on
+    logging.basicConfig(level=logging.DEBUG)
+    _server = ApiHTTPServer(("127.0.0.1", OPTION.port), Api(FakeMeter().live, OPTION.database))
+    print(f"Serving {OPTION.database} on http://127.0.0.1:{OPTION.port}/api/live")
+    with contextlib.suppress(KeyboardInterrupt):
+        _server.serve_forever()
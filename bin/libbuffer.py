@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Fixed-capacity buffer for the samples that have not been compacted yet."""
+
+import logging
+import time
+
+import numpy as np
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# what to do when a sample is appended to a full buffer
+OVERFLOW_POLICIES: tuple[str, ...] = (
+    "drop_oldest",  # overwrite the oldest sample
+    "drop_newest",  # discard the new sample
+    "raise",  # raise a BufferError
+)
+
+
+class SampleBuffer:
+    """Ring buffer of (epoch, liters) samples stored in typed arrays.
+
+    The samples are expected to be appended in chronological order. The
+    `sample_time` text is only created when the samples are emitted as records.
+    """
+
+    def __init__(self, capacity: int, overflow: str = "drop_oldest", dt_format: str = "") -> None:
+        """Initialise the buffer.
+
+        Args:
+            capacity (int): maximum number of samples held
+            overflow (str): policy for appending to a full buffer; see OVERFLOW_POLICIES
+            dt_format (str): format of the `sample_time` in the emitted records
+        """
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, not {capacity}")
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.capacity: int = capacity
+        self.overflow: str = overflow
+        self.dt_format: str = dt_format or "%Y-%m-%d %H:%M:%S"
+        self.dropped: int = 0  # number of samples lost to overflow
+        self._epoch = np.zeros(capacity, dtype=np.int64)
+        self._water = np.zeros(capacity, dtype=np.int64)
+        self._head: int = 0  # index of the oldest sample
+        self._count: int = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __repr__(self) -> str:
+        return repr(self.records())
+
+    def append(self, epoch: int, water: int) -> bool:
+        """Add a sample to the buffer.
+
+        Args:
+            epoch (int): time of the sample in seconds since the epoch
+            water (int): meter reading in liters
+
+        Returns:
+            (bool): False if a sample was dropped because the buffer was full.
+        """
+        stored = True
+        if self._count == self.capacity:
+            if self.overflow == "raise":
+                raise BufferError(f"Sample buffer is full ({self.capacity} samples)")
+            self.dropped += 1
+            stored = False
+            if self.overflow == "drop_newest":
+                LOGGER.warning("Sample buffer is full. Discarding newest sample.")
+                return stored
+            LOGGER.warning("Sample buffer is full. Discarding oldest sample.")
+            self._head = (self._head + 1) % self.capacity
+            self._count -= 1
+        _idx = (self._head + self._count) % self.capacity
+        self._epoch[_idx] = epoch
+        self._water[_idx] = water
+        self._count += 1
+        return stored
+
+    def _ordered(self, array: np.ndarray) -> np.ndarray:
+        _end = self._head + self._count
+        if _end <= self.capacity:
+            return array[self._head : _end].copy()
+        return np.concatenate((array[self._head :], array[: _end - self.capacity]))
+
+    def epochs(self) -> np.ndarray:
+        """Return the epochs of the buffered samples, oldest first."""
+        return self._ordered(self._epoch)
+
+    def water(self) -> np.ndarray:
+        """Return the meter readings of the buffered samples, oldest first."""
+        return self._ordered(self._water)
+
+    def discard_upto(self, epoch: int) -> int:
+        """Remove the samples at or before `epoch` from the buffer.
+
+        Args:
+            epoch (int): time of the last sample to remove
+
+        Returns:
+            (int): number of samples removed.
+        """
+        _removed = int(np.searchsorted(self.epochs(), epoch, side="right"))
+        self._head = (self._head + _removed) % self.capacity
+        self._count -= _removed
+        return _removed
+
+    def clear(self) -> None:
+        """Remove all samples from the buffer."""
+        self._head = 0
+        self._count = 0
+
+    def records(self) -> list:
+        """Return the buffered samples in the format used by WizWTR.compact_data.
+
+        Returns:
+            list of dicts
+        """
+        return [
+            {
+                "sample_time": time.strftime(self.dt_format, time.localtime(_epoch)),
+                "sample_epoch": _epoch,
+                "water": _water,
+            }
+            for _epoch, _water in zip(self.epochs().tolist(), self.water().tolist(), strict=True)
+        ]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Calibration of the meter readings.
+
+The calibration entries in `constants.WIZ_WTR["calibration"]` are converted
+once into a sorted table of epochs and cumulative corrections, so that the
+correction at any moment is found with a binary search.
+"""
+
+import bisect
+import itertools
+import time
+
+import constants as cs
+import numpy as np
+
+
+class Calibration:
+    """Table of cumulative corrections [m3] of the meter reading."""
+
+    def __init__(self, offset: float = 0.0, calibration: dict | None = None) -> None:
+        """Build the table.
+
+        Args:
+            offset (float): correction that always applies [m3]
+            calibration (dict): local date-time text -> correction [m3] applied after that moment
+        """
+        self.offset: float = 0.0
+        self.epochs: list[float] = []
+        self.cumulative: list[float] = [0.0]
+        self.reload(offset, calibration or {})
+
+    @classmethod
+    def from_config(cls) -> "Calibration":
+        """Return the calibration table as configured in `constants`."""
+        return cls(cs.WIZ_WTR["offset"], cs.WIZ_WTR["calibration"])
+
+    @classmethod
+    def for_meter(cls, meter: str, settings: dict | None = None) -> "Calibration":
+        """Return the calibration table of the meter.
+
+        The configured meter (WIZ_WTR["meter"]) is calibrated as configured in
+        `constants`; any other meter by the `offset` and `calibration` in its settings.
+
+        Args:
+            meter (str): id of the meter
+            settings (dict): settings of the meter (see `libmeter.read_config`)
+        """
+        if meter == cs.WIZ_WTR["meter"]:
+            return cls.from_config()
+        settings = settings or {}
+        return cls(settings.get("offset", 0.0), settings.get("calibration"))
+
+    def reload(self, offset: float, calibration: dict) -> None:
+        """Rebuild the table.
+
+        Args:
+            offset (float): correction that always applies [m3]
+            calibration (dict): local date-time text -> correction [m3] applied after that moment
+        """
+        _entries = sorted(
+            (time.mktime(time.strptime(_key, cs.DT_FORMAT)), _value)
+            for _key, _value in calibration.items()
+        )
+        self.offset = offset
+        self.epochs = [_epoch for _epoch, _ in _entries]
+        self.cumulative = list(
+            itertools.accumulate((_value for _, _value in _entries), initial=0.0)
+        )
+
+    def correction(self, epoch: float | None = None) -> float:
+        """Return the total correction [m3] that applies at the given moment.
+
+        Args:
+            epoch (float): moment in seconds since the epoch; default: now
+
+        Returns:
+            (float): correction in m3
+        """
+        if epoch is None:
+            epoch = time.time()
+        return self.offset + self.cumulative[bisect.bisect_left(self.epochs, epoch)]
+
+    def corrections(self, epochs: np.ndarray) -> np.ndarray:
+        """Return the total corrections [m3] that apply at each of the given moments.
+
+        Args:
+            epochs (np.ndarray): moments in seconds since the epoch
+
+        Returns:
+            (np.ndarray): corrections in m3
+        """
+        _idx = np.searchsorted(np.asarray(self.epochs), epochs, side="left")
+        return self.offset + np.asarray(self.cumulative)[_idx]
+
+    def correct(self, metered_volume: float, epoch: float | None = None) -> float:
+        """Return the calibrated volume [m3] for a meter reading taken at the given moment."""
+        return metered_volume + self.correction(epoch)
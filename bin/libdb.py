@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Shared access to the database.
+
+All scripts open the database through this module, so they agree on how it
+is used:
+- the database is kept in WAL mode. Readers (the trends, the API) and the
+  writer (the daemon) do not block each other.
+- a busy timeout (WIZ_WTR["busy_timeout"]) lets SQLite wait for a lock
+  instead of failing at once.
+- readers open the database read-only.
+- a script uses one connection per thread for all its queries (`shared()`).
+
+In WAL mode the latest commits may only be in the `-wal` file until the last
+connection closes. Call `checkpoint()` (or `PRAGMA wal_checkpoint(TRUNCATE);`)
+before copying the database file.
+"""
+
+import logging
+import os
+import sqlite3 as s3
+import threading
+import urllib.parse
+
+import constants as cs
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+# fmt: off
+PRAGMAS: list[str] = [
+    "PRAGMA journal_mode = WAL;",
+    # safe in WAL mode; a power failure may only lose the last commits
+    "PRAGMA synchronous = NORMAL;",
+]
+# fmt: on
+# this thread's shared connections: (database, readonly) -> (connection, identity of the file)
+_LOCAL = threading.local()
+
+
+def connect(database: str, readonly: bool = False, timeout: float | None = None) -> s3.Connection:
+    """Open a new connection to the database.
+
+    Args:
+        database (str): path to the database file
+        readonly (bool): open the database read-only; it must exist
+        timeout (float): seconds to wait for a lock; default: WIZ_WTR["busy_timeout"]
+
+    Returns:
+        the connection. A writable connection puts the database in WAL mode.
+    """
+    if timeout is None:
+        timeout = float(cs.WIZ_WTR["busy_timeout"])
+    if readonly:
+        _uri = f"file:{urllib.parse.quote(os.path.abspath(database))}?mode=ro"
+        return s3.connect(_uri, uri=True, timeout=timeout)
+    con = s3.connect(database, timeout=timeout)
+    for _pragma in PRAGMAS:
+        con.execute(_pragma)
+    return con
+
+
+def _identity(database: str) -> tuple[int, int] | None:
+    try:
+        _stat = os.stat(database)
+    except OSError:
+        return None
+    return _stat.st_dev, _stat.st_ino
+
+
+def shared(database: str, readonly: bool = False) -> s3.Connection:
+    """Return this thread's connection to the database; it is opened on first use.
+
+    The connection is opened again when the database file was replaced (e.g.
+    restored from a backup) since it was opened.
+
+    Args:
+        database (str): path to the database file
+        readonly (bool): open the database read-only
+    """
+    _connections: dict = _LOCAL.__dict__.setdefault("connections", {})
+    _key = (database, readonly)
+    _identity_now = _identity(database)
+    if _key in _connections:
+        con, _opened = _connections[_key]
+        if _opened == _identity_now:
+            return con
+        LOGGER.info(f"{database} was replaced; reconnecting")
+        con.close()
+    con = connect(database, readonly)
+    # a new database file only exists now
+    _connections[_key] = (con, _identity_now or _identity(database))
+    return con
+
+
+def close() -> None:
+    """Close this thread's shared connections."""
+    _connections: dict = _LOCAL.__dict__.setdefault("connections", {})
+    for con, _ in _connections.values():
+        con.close()
+    _connections.clear()
+
+
+def checkpoint(database: str) -> None:
+    """Move the contents of the `-wal` file into the database file.
+
+    Args:
+        database (str): path to the database file
+    """
+    con = connect(database)
+    try:
+        con.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    # e.g. before the database is copied to the cloud
+    print(f"Checkpointing {cs.WIZ_WTR['database']}")
+    checkpoint(cs.WIZ_WTR["database"])
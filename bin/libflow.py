@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Detect and store water usage events from the instantaneous flow.
+
+Consecutive samples with a non-zero `active_liter_lpm` are run-length encoded
+into a single event: its start, duration, volume and peak flow. The volume is
+the increase of the meter reading from the last idle sample before the event
+to the first idle sample after it, so no usage is lost between samples.
+
+The events are kept in their own table for a limited time.
+"""
+
+import collections
+import sqlite3 as s3
+import time
+
+import constants as cs
+
+TABLE_EVENTS: str = "flow_events"
+METER: str = cs.WIZ_WTR["meter"]
+
+
+class FlowDetector:
+    """Run-length encode the flow reported by consecutive samples into events."""
+
+    def __init__(self, meter: str = METER) -> None:
+        """Initialise the detector.
+
+        Args:
+            meter (str): id of the meter whose samples are processed
+        """
+        self.meter: str = meter
+        # last idle sample: (epoch, water)
+        self._base: tuple[int, int] | None = None
+        # current event: [start_epoch, peak_lpm] or None when idle
+        self._event: list | None = None
+        # completed events awaiting storage; a deque is safe to use across threads
+        self.completed: collections.deque = collections.deque()
+
+    def update(self, epoch: int, water: int, flow: float) -> None:
+        """Process a sample.
+
+        Args:
+            epoch (int): time of the sample in seconds since the epoch
+            water (int): meter reading in liters
+            flow (float): flow in L/min
+        """
+        if flow > 0:
+            if self._event is None:
+                self._event = [epoch, flow]
+            else:
+                self._event[1] = max(self._event[1], flow)
+            return
+        if self._event is not None and self._base is not None:
+            _start, _peak = self._event
+            _local = time.localtime(_start)
+            self.completed.append(
+                {
+                    "meter": self.meter,
+                    "start_epoch": _start,
+                    "start_time": time.strftime(cs.DT_FORMAT, _local),
+                    "duration": epoch - _start,
+                    "liters": water - self._base[1],
+                    "peak_lpm": _peak,
+                }
+            )
+        # an event that was already running when we started has no base; it is skipped
+        self._event = None
+        self._base = (epoch, water)
+
+    def take(self) -> list:
+        """Remove and return the completed events."""
+        events = []
+        while self.completed:
+            events.append(self.completed.popleft())
+        return events
+
+
+def create_table(con: s3.Connection) -> None:
+    """Create the events table if it doesn't exist yet.
+
+    Args:
+        con: connection to the database
+    """
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_EVENTS} ("
+        f"meter text NOT NULL, "
+        f"start_epoch integer NOT NULL, "
+        f"start_time datetime, "
+        f"duration integer, "
+        f"liters integer, "
+        f"peak_lpm real, "
+        f"PRIMARY KEY (meter, start_epoch)"
+        f") WITHOUT ROWID;"
+    )
+
+
+def store(con: s3.Connection, events: list, retention: int) -> None:
+    """Store the events and discard the events that have expired.
+
+    Args:
+        con: connection to the database
+        events (list): list of dicts as produced by FlowDetector
+        retention (int): number of days the events are kept
+    """
+    create_table(con)
+    with con:
+        con.executemany(
+            f"INSERT OR REPLACE INTO {TABLE_EVENTS} "  # nosec B608
+            f"(meter, start_epoch, start_time, duration, liters, peak_lpm) "
+            f"VALUES (:meter, :start_epoch, :start_time, :duration, :liters, :peak_lpm);",
+            events,
+        )
+        con.execute(
+            f"DELETE FROM {TABLE_EVENTS} WHERE start_epoch < ?;",  # nosec B608
+            (int(time.time()) - retention * 86400,),
+        )
+
+
+def top_events(
+    con: s3.Connection, start_epoch: int, end_epoch: int, limit: int = 10, meter: str = METER
+) -> list:
+    """Return the largest events of the meter that started in the given period.
+
+    Args:
+        con: connection to the database
+        start_epoch (int): start of the period
+        end_epoch (int): end of the period (exclusive)
+        limit (int): maximum number of events
+        meter (str): id of the meter
+
+    Returns:
+        list of (start_epoch, start_time, duration, liters, peak_lpm) tuples,
+        largest volume first.
+    """
+    try:
+        return con.execute(
+            f"SELECT start_epoch, start_time, duration, liters, peak_lpm "  # nosec B608
+            f"FROM {TABLE_EVENTS} WHERE meter = ? AND start_epoch >= ? AND start_epoch < ? "
+            f"ORDER BY liters DESC, start_epoch LIMIT ?;",
+            (meter, start_epoch, end_epoch, limit),
+        ).fetchall()
+    except s3.OperationalError:
+        # no such table
+        return []
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Find the gaps in `mains` and spread the usage over them.
+
+`mains` holds one sample per WIZ_WTR["report_interval"] (a step). While the
+daemon is down or the meter is unreachable, samples are missing. The first
+sample after such a gap carries the usage of the whole gap. Plotted as is, all
+that usage would end up in a single bar.
+
+The gap index (table `gaps`) holds the sample before and after each gap and
+the usage in between. It is maintained together with the rollups (see
+`librollup.update`), so the rollups can be corrected without scanning `mains`.
+`spread()` divides the usage over the missing steps evenly, in whole liters.
+"""
+
+import sqlite3 as s3
+
+import constants as cs
+import numpy as np
+
+TABLE_MAINS: str = cs.WIZ_WTR["sql_table"]
+TABLE_GAPS: str = "gaps"
+METER: str = cs.WIZ_WTR["meter"]
+# time between two samples [s]
+STEP: int = int(cs.WIZ_WTR["report_interval"])
+
+
+def create_table(con: s3.Connection) -> None:
+    """Create the gap index if it doesn't exist yet.
+
+    Args:
+        con: connection to the database
+    """
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_GAPS} ("
+        f"meter text NOT NULL, "
+        f"start_epoch integer NOT NULL, "
+        f"end_epoch integer NOT NULL, "
+        f"water integer, "
+        f"PRIMARY KEY (meter, start_epoch)"
+        f") WITHOUT ROWID;"
+    )
+
+
+def update(con: s3.Connection, meter: str, hwm: int, new_hwm: int) -> None:
+    """Add the gaps that end at or after `hwm` and at or before `new_hwm` to the index.
+
+    Only the samples in that period (plus the one sample before it) are read.
+    The gap that ends at `hwm` is looked up again, because the sample at `hwm`
+    may have been replaced since (see `librollup.update`). The caller commits.
+
+    Args:
+        con: connection to the database
+        meter (str): id of the meter
+        hwm (int): epoch upto which the index is complete; -1 for none
+        new_hwm (int): epoch upto which the index must be completed
+    """
+    con.execute(
+        f"WITH src AS ("  # nosec B608
+        f" SELECT sample_epoch,"
+        f"  LAG(sample_epoch) OVER (ORDER BY sample_epoch) AS prev_epoch,"
+        f"  water - LAG(water) OVER (ORDER BY sample_epoch) AS delta"
+        f" FROM {TABLE_MAINS}"
+        f" WHERE meter = :meter"
+        f"  AND sample_epoch >= (SELECT IFNULL(MAX(sample_epoch), -1) FROM {TABLE_MAINS}"
+        f"                       WHERE meter = :meter AND sample_epoch < :hwm)"
+        f"  AND sample_epoch <= :new_hwm"
+        f") "
+        f"INSERT OR REPLACE INTO {TABLE_GAPS} (meter, start_epoch, end_epoch, water) "
+        f"SELECT :meter, prev_epoch, sample_epoch, delta FROM src"
+        f" WHERE sample_epoch >= :hwm AND sample_epoch - prev_epoch > :step"
+        f"  AND delta IS NOT NULL;",
+        {"meter": meter, "hwm": hwm, "new_hwm": new_hwm, "step": STEP},
+    )
+
+
+def fetch(con: s3.Connection, start_epoch: int, end_epoch: int, meter: str = METER) -> np.ndarray:
+    """Return the gaps of the meter that end in the given period.
+
+    Args:
+        con: connection to the database
+        start_epoch (int): start of the period
+        end_epoch (int): end of the period (inclusive)
+        meter (str): id of the meter
+
+    Returns:
+        (n, 3) int array of start_epoch, end_epoch, water ordered by start_epoch;
+        empty if there is no gap index.
+    """
+    try:
+        rows = con.execute(
+            f"SELECT start_epoch, end_epoch, water FROM {TABLE_GAPS}"  # nosec B608
+            f" WHERE meter = ? AND end_epoch >= ? AND end_epoch <= ? ORDER BY start_epoch;",
+            (meter, start_epoch, end_epoch),
+        ).fetchall()
+    except s3.OperationalError:
+        # no such table
+        rows = []
+    return np.array(rows, dtype=np.int64).reshape(-1, 3)
+
+
+def spread(
+    epochs: np.ndarray, prev_epochs: np.ndarray, deltas: np.ndarray, step: int = STEP
+) -> tuple[np.ndarray, np.ndarray]:
+    """Spread each difference evenly over the steps since the previous sample.
+
+    A difference that spans n steps is replaced by n differences, at the
+    epoch of the sample and the n - 1 steps before it. Whole liters are
+    spread as whole liters; the parts always add up to the difference.
+
+    Args:
+        epochs (np.ndarray): epochs of the samples
+        prev_epochs (np.ndarray): epochs of the samples before them
+        deltas (np.ndarray): usage since the sample before
+        step (int): time between two samples [s]
+
+    Returns:
+        epochs (int64) and differences (float64) with one element per step
+    """
+    epochs = np.asarray(epochs, dtype=np.int64)
+    deltas = np.asarray(deltas, dtype=np.float64)
+    counts = np.maximum(-((np.asarray(prev_epochs, dtype=np.int64) - epochs) // step), 1)
+    if np.all(counts == 1):
+        return epochs, deltas
+    _starts = np.cumsum(counts) - counts
+    # number of the step within its gap (1 .. n) and the number of steps of its gap
+    _n = np.repeat(counts, counts)
+    _k = np.arange(int(_starts[-1] + counts[-1])) - np.repeat(_starts, counts) + 1
+    _delta = np.repeat(deltas, counts)
+    # the part upto and including step k is rounded down, so the last step gets the rest
+    _upto = np.where(_k == _n, _delta, np.floor(_delta * _k / _n))
+    _before = np.floor(_delta * (_k - 1) / _n)
+    return np.repeat(epochs, counts) - (_n - _k) * step, _upto - _before
+
+
+def corrections(gaps: np.ndarray, step: int = STEP) -> tuple[np.ndarray, np.ndarray]:
+    """Return the changes that spread the usage of the gaps over their steps.
+
+    The rollups hold the usage of a gap in the bucket of the sample after it.
+    Adding these changes moves it to the buckets of the missing steps.
+
+    Args:
+        gaps (np.ndarray): (n, 3) array as returned by `fetch`
+        step (int): time between two samples [s]
+
+    Returns:
+        epochs (int64) and changes (float64) of the usage
+    """
+    _epochs, _parts = spread(gaps[:, 1], gaps[:, 0], gaps[:, 2], step)
+    return (
+        np.concatenate((_epochs, gaps[:, 1])),
+        np.concatenate((_parts, -gaps[:, 2].astype(np.float64))),
+    )
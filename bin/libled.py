@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Status LEDs shown on the website.
+
+Each device has a LED image in the website directory. The image is only
+replaced when the colour of the LED changes, and it is replaced atomically so
+the web server never serves a partially written image. Optionally the state of
+all LEDs is also written to a small JSON file for the web page.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+def _replace_atomically(file_name: str, write) -> None:
+    """Write a file via a temporary file in the same directory and rename it into place.
+
+    Args:
+        file_name (str): the file to (re)place
+        write: function that writes the content to the temporary file name it is given
+    """
+    _tmp = f"{os.path.dirname(file_name) or '.'}/.{os.path.basename(file_name)}.tmp"
+    try:
+        write(_tmp)
+        os.replace(_tmp, file_name)
+    except BaseException:
+        if os.path.exists(_tmp):
+            os.remove(_tmp)
+        raise
+
+
+class StatusLeds:
+    """State machine of the status LEDs; files are only written on transitions."""
+
+    def __init__(self, source_dir: str, target_dir: str, status_file: str | None = None) -> None:
+        """Initialise the LEDs. Their state is unknown until they are first set.
+
+        Args:
+            source_dir (str): directory containing the images `<colour>.png`
+            target_dir (str): directory where the images `<device>.png` are placed
+            status_file (str): JSON file receiving the state of all LEDs; None to disable
+        """
+        self.source_dir: str = source_dir
+        self.target_dir: str = target_dir
+        self.status_file: str | None = status_file
+        # device -> (colour, epoch of the last transition)
+        self.state: dict[str, tuple[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def colour(self, dev: str) -> str | None:
+        """Return the current colour of the device's LED or None if it was never set."""
+        _state = self.state.get(dev)
+        return None if _state is None else _state[0]
+
+    def set(self, dev: str, colour: str) -> bool:
+        """Set the colour of the device's LED.
+
+        Args:
+            dev (str): name of the device
+            colour (str): new colour of the LED
+
+        Returns:
+            (bool): True if the LED changed colour and the files were rewritten.
+        """
+        with self._lock:
+            if self.colour(dev) == colour:
+                return False
+            LOGGER.debug(f"{dev} is {colour}")
+            _in_file = f"{self.source_dir}/{colour}.png"
+            _replace_atomically(
+                f"{self.target_dir}/{dev}.png", lambda _tmp: shutil.copyfile(_in_file, _tmp)
+            )
+            # only record the new state once the image is in place
+            self.state[dev] = (colour, int(time.time()))
+            if self.status_file:
+                self._write_status()
+            return True
+
+    def _write_status(self) -> None:
+        _status = {
+            _dev: {"colour": _colour, "since": _since}
+            for _dev, (_colour, _since) in sorted(self.state.items())
+        }
+
+        def _write(file_name: str) -> None:
+            with open(file_name, "w", encoding="utf-8") as _fp:
+                json.dump(_status, _fp)
+
+        try:
+            _replace_atomically(self.status_file, _write)  # type: ignore[arg-type]
+        except OSError as her:
+            # the status file is a convenience; the image is what counts
+            LOGGER.warning(f"Could not write {self.status_file}: {her}")
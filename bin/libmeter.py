@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Sources of meter telegrams and the clocks that drive the collector.
+
+A meter backend has a single method `get_measurement()` that returns a
+telegram with (at least) the attributes `total_liter_m3` and
+`active_liter_lpm`, like the HomeWizard API does. It raises on failure.
+
+`HomeWizardMeter` talks to the real device. `SimulatedMeter` produces
+telegrams from a synthetic household consumption profile, with configurable
+latency, jitter and failures. Combined with a `SimulatedClock` the collector
+runs in virtual time, so a year of operation takes minutes.
+
+The config file (WIZ_WTR["config"]) holds the `serial` and `token` of the
+meter WIZ_WTR["meter"]. More meters are listed by id under `meters`:
+    {"serial": "...", "token": "...",
+     "meters": {"garden": {"serial": "...", "token": "...", "offset": 0.0}}}
+An additional meter may have its own `offset` [m3] and `calibration`, like
+those in WIZ_WTR that apply to the configured meter.
+"""
+
+import json
+import math
+import random
+import re
+import threading
+import time
+import types
+
+import constants as cs
+
+# fmt: off
+# kind -> (flow [L/min], mean duration [s], relative frequency)
+EVENTS: dict[str, tuple[float, float, float]] = {
+    "tap": (5.0, 30.0, 10.0),
+    "toilet": (9.0, 40.0, 6.0),
+    "shower": (8.0, 480.0, 1.0),
+    "kitchen": (6.0, 90.0, 3.0),
+    "appliance": (4.0, 120.0, 1.0),
+}
+# expected number of events per hour of the (local) day
+HOURLY_RATE: tuple[float, ...] = (
+    0.1, 0.1, 0.1, 0.1, 0.1, 0.3,    # 00 - 05
+    2.0, 4.0, 3.0, 1.5, 1.0, 1.0,    # 06 - 11
+    1.5, 1.0, 1.0, 1.0, 1.5, 2.5,    # 12 - 17
+    3.0, 2.0, 2.0, 2.5, 1.5, 0.5,    # 18 - 23
+)
+# fmt: on
+# the meter id is used in file names (see `archive.py` and `trend.py`)
+METER_ID = re.compile(r"[A-Za-z0-9_-]+")
+
+
+class SystemClock:
+    """The real clock."""
+
+    # the collector loop wakes up at least this often [s] to check whether it must stop
+    poll: float = 1.0
+
+    @staticmethod
+    def time() -> float:
+        """Return the current time in seconds since the epoch."""
+        return time.time()
+
+    @staticmethod
+    def sleep(seconds: float) -> None:
+        """Sleep for the given number of seconds."""
+        time.sleep(seconds)
+
+
+class SimulatedClock:
+    """Virtual clock; sleeping advances the clock instead of waiting.
+
+    With `speed` the clock also sleeps for real, `speed` times faster than
+    virtual time. Without it the simulation runs as fast as possible.
+    """
+
+    poll: float = math.inf
+    # minimal step [s] so that sleeping until a deadline always passes it
+    resolution: float = 0.001
+
+    def __init__(self, start: float | None = None, speed: float | None = None) -> None:
+        """Start the clock.
+
+        Args:
+            start (float): initial time in seconds since the epoch; default: now
+            speed (float): acceleration w.r.t. real time; None for as fast as possible
+        """
+        self._now: float = time.time() if start is None else start
+        self.speed: float | None = speed
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        """Return the virtual time in seconds since the epoch."""
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        """Advance the virtual time by (at least) the given number of seconds."""
+        seconds = max(seconds, self.resolution)
+        if self.speed:
+            time.sleep(seconds / self.speed)
+        with self._lock:
+            self._now += seconds
+
+
+class HomeWizardMeter:
+    """The HomeWizard watermeter, found through zeroconf."""
+
+    def __init__(self, serial: str, token: str, debug: bool = False) -> None:
+        """Connect to the device.
+
+        Args:
+            serial (str): serial number of the device
+            token (str): API token of the device
+            debug (bool): debug the communication
+        """
+        # imported here, so the simulator does not need the library (and zeroconf)
+        from mausy5043_common import funhomewizard as hwz  # pylint: disable=C0415
+
+        self.serial: str = serial
+        self.token: str = token
+        self.hwe = hwz.MyHomeWizard(serial=self.serial, token=self.token, debug=debug)
+        self.hwe.connect()
+
+    def get_measurement(self):
+        """Return the current telegram of the device."""
+        return self.hwe.get_measurement()
+
+
+class SimulatedMeter:
+    """Simulated watermeter fed by a synthetic household consumption profile.
+
+    Water is used in events (tap, toilet, shower, ...) that start at random
+    moments; their rate follows the hour of the day.
+    """
+
+    def __init__(
+        self,
+        clock=None,
+        latency: float = 0.2,
+        jitter: float = 0.1,
+        failures: float = 0.0,
+        total: float = 900.0,
+        seed: int | None = None,
+    ) -> None:
+        """Initialise the meter.
+
+        Args:
+            clock: clock that determines the time of the telegrams; default: the system clock
+            latency (float): mean time to answer a request [s]
+            jitter (float): standard deviation of the time to answer [s]
+            failures (float): probability that a request fails
+            total (float): initial meter reading [m3]
+            seed (int): seed of the random generator, for reproducible runs
+        """
+        self.clock = clock or SystemClock()
+        self.latency: float = latency
+        self.jitter: float = jitter
+        self.failures: float = failures
+        self.total: float = total * 1000  # L
+        self.rng = random.Random(seed)  # nosec B311
+        self._time: float = self.clock.time()
+        self._flow: float = 0.0
+        self._event_end: float | None = None
+        self._next_start: float = self._schedule(self._time)
+
+    @staticmethod
+    def _rate(epoch: float) -> float:
+        """Return the expected number of events per second at the given moment."""
+        return HOURLY_RATE[time.localtime(epoch).tm_hour] / 3600
+
+    def _schedule(self, epoch: float) -> float:
+        """Return the start of the next event after `epoch` (Poisson process, by thinning)."""
+        _max_rate = max(HOURLY_RATE) / 3600
+        while True:
+            epoch += self.rng.expovariate(_max_rate)
+            if self.rng.random() * _max_rate <= self._rate(epoch):
+                return epoch
+
+    def _advance(self, now: float) -> None:
+        """Let the water flow until `now`."""
+        while self._time < now:
+            if self._event_end is None:
+                if now < self._next_start:
+                    self._time = now
+                    break
+                self._time = self._next_start
+                _kinds = list(EVENTS)
+                _kind = self.rng.choices(_kinds, weights=[EVENTS[_k][2] for _k in _kinds])[0]
+                _flow, _duration, _ = EVENTS[_kind]
+                self._flow = _flow * self.rng.uniform(0.7, 1.3)
+                self._event_end = self._time + self.rng.expovariate(1 / _duration)
+            else:
+                _until = min(now, self._event_end)
+                self.total += self._flow * (_until - self._time) / 60
+                self._time = _until
+                if _until == self._event_end:
+                    self._flow = 0.0
+                    self._event_end = None
+                    self._next_start = self._schedule(self._time)
+
+    def get_measurement(self):
+        """Return the telegram at the current (clock) time."""
+        self.clock.sleep(max(0.0, self.rng.gauss(self.latency, self.jitter)))
+        if self.rng.random() < self.failures:
+            raise ConnectionError("simulated failure to reach the meter")
+        self._advance(self.clock.time())
+        return types.SimpleNamespace(
+            # the meter reports whole liters
+            total_liter_m3=math.floor(self.total) / 1000,
+            active_liter_lpm=round(self._flow, 1),
+        )
+
+
+def read_config(config: str) -> dict[str, dict]:
+    """Return the settings of the configured meters by meter id.
+
+    Args:
+        config (str): JSON file containing the `serial` and `token` of the device(s)
+
+    Returns:
+        (dict): meter id -> dict with (at least) `serial` and `token`; the
+        configured meter (WIZ_WTR["meter"]) comes first.
+    """
+    with open(config, encoding="utf-8") as _json_file:
+        _cfg = json.load(_json_file)
+    settings = {}
+    if "serial" in _cfg:
+        settings[cs.WIZ_WTR["meter"]] = {"serial": _cfg["serial"], "token": _cfg["token"]}
+    for meter, _entry in _cfg.get("meters", {}).items():
+        if not METER_ID.fullmatch(meter) or meter in settings:
+            raise ValueError(f"{config}: invalid or duplicate meter id {meter!r}")
+        settings[meter] = _entry
+    if not settings:
+        raise ValueError(f"{config}: no meters configured")
+    return settings
+
+
+def open_meters(
+    simulate: bool = False, clock=None, debug: bool = False, settings: dict | None = None
+) -> dict:
+    """Return the configured meter backends by meter id.
+
+    Args:
+        simulate (bool): use the simulated meters configured in `constants.WIZ_WTR`
+        clock: clock for the simulator
+        debug (bool): debug the communication with the devices
+        settings (dict): settings of the meters as returned by `read_config`; default: read them
+    """
+    if simulate:
+        _seed = cs.WIZ_WTR["simulator"]["seed"]
+        return {
+            meter: SimulatedMeter(
+                clock=clock,
+                # each meter gets its own (reproducible) consumption
+                **{**cs.WIZ_WTR["simulator"], "seed": None if _seed is None else _seed + _idx},
+            )
+            for _idx, meter in enumerate(cs.WIZ_WTR["simulated_meters"])
+        }
+    if settings is None:
+        settings = read_config(cs.WIZ_WTR["config"])
+    return {
+        meter: HomeWizardMeter(_entry["serial"], _entry["token"], debug=debug)
+        for meter, _entry in settings.items()
+    }
+
+
+def open_meter(simulate: bool = False, clock=None, debug: bool = False):
+    """Return the backend of the configured meter (WIZ_WTR["meter"]).
+
+    Args:
+        simulate (bool): use the simulator configured in `constants.WIZ_WTR["simulator"]`
+        clock: clock for the simulator
+        debug (bool): debug the communication with the device
+    """
+    if simulate:
+        return SimulatedMeter(clock=clock, **cs.WIZ_WTR["simulator"])
+    _entry = read_config(cs.WIZ_WTR["config"])[cs.WIZ_WTR["meter"]]
+    return HomeWizardMeter(_entry["serial"], _entry["token"], debug=debug)
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Instrumentation of the collector daemon.
+
+Collects per-phase timings (as histograms), counters and gauges and exports
+them in the Prometheus text exposition format, e.g. for the textfile
+collector of node_exporter. Optionally profiles the process with cProfile.
+"""
+
+import bisect
+import contextlib
+import cProfile
+import os
+import resource
+import threading
+import time
+
+# fmt: off
+# upper bounds [s] of the histogram buckets
+BUCKETS: tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+HELP: dict[str, str] = {
+    "phase_seconds": "Time spent per phase of the collector loop.",
+    "samples_total": "Number of samples taken from the device.",
+    "failures_total": "Number of failed operations per phase.",
+    "retries_total": "Number of retried attempts to store the spooled data.",
+    "deadlines_missed_total": "Number of sample or report deadlines that were missed.",
+    "led_transitions_total": "Number of colour changes of the status LEDs.",
+    "buffered_samples": "Number of samples awaiting compaction.",
+    "dropped_samples": "Number of samples lost because the sample buffer was full.",
+    "spooled_rows": "Number of rows in the spool awaiting storage.",
+    "rss_bytes": "Resident set size of the process.",
+    "max_rss_bytes": "Peak resident set size of the process.",
+    "sample_interval_seconds": "Current interval between samples (adaptive sampling).",
+    "uptime_seconds": "Time since the metrics were initialised.",
+}
+# fmt: on
+
+
+class Metrics:
+    """Registry of the metrics of one process."""
+
+    def __init__(self, prefix: str = "wizwtr") -> None:
+        self.prefix: str = prefix
+        self.started: float = time.time()
+        self._lock = threading.Lock()
+        # (name, label) -> value
+        self._counters: dict[tuple[str, str], float] = {}
+        self._gauges: dict[tuple[str, str], float] = {}
+        # phase -> [bucket counts..., +Inf count, sum]
+        self._histograms: dict[str, list[float]] = {}
+
+    @staticmethod
+    def _label(labels: dict | None) -> str:
+        if not labels:
+            return ""
+        return "{" + ",".join(f'{_k}="{_v}"' for _k, _v in sorted(labels.items())) + "}"
+
+    def inc(self, name: str, amount: float = 1, labels: dict | None = None) -> None:
+        """Increase a counter."""
+        _key = (name, self._label(labels))
+        with self._lock:
+            self._counters[_key] = self._counters.get(_key, 0) + amount
+
+    def set(self, name: str, value: float, labels: dict | None = None) -> None:
+        """Set a gauge."""
+        with self._lock:
+            self._gauges[(name, self._label(labels))] = value
+
+    def get(self, name: str, labels: dict | None = None) -> float:
+        """Return the value of a counter or gauge; 0 if it was never set."""
+        _key = (name, self._label(labels))
+        with self._lock:
+            return self._counters.get(_key, self._gauges.get(_key, 0))
+
+    def observe(self, phase: str, seconds: float) -> None:
+        """Add a duration to the histogram of the phase."""
+        with self._lock:
+            _hist = self._histograms.setdefault(phase, [0.0] * (len(BUCKETS) + 2))
+            _hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+            _hist[-1] += seconds
+
+    @contextlib.contextmanager
+    def timer(self, phase: str):
+        """Time the enclosed block as `phase`; failures are counted too."""
+        _start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc("failures_total", labels={"phase": phase})
+            raise
+        finally:
+            self.observe(phase, time.perf_counter() - _start)
+
+    def update_memory(self) -> None:
+        """Refresh the memory gauges."""
+        _max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        self.set("max_rss_bytes", _max_rss)
+        try:
+            with open("/proc/self/statm", encoding="utf-8") as _statm:
+                self.set("rss_bytes", int(_statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE"))
+        except OSError:
+            self.set("rss_bytes", _max_rss)
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text exposition format."""
+        self.update_memory()
+        self.set("uptime_seconds", time.time() - self.started)
+        lines: list[str] = []
+
+        def _header(name: str, kind: str) -> None:
+            lines.append(f"# HELP {self.prefix}_{name} {HELP.get(name, name)}")
+            lines.append(f"# TYPE {self.prefix}_{name} {kind}")
+
+        with self._lock:
+            for kind, values in (("counter", self._counters), ("gauge", self._gauges)):
+                for name in sorted({_name for _name, _ in values}):
+                    _header(name, kind)
+                    for (_name, _label), _value in sorted(values.items()):
+                        if _name == name:
+                            lines.append(f"{self.prefix}_{name}{_label} {_value:.15g}")
+            if self._histograms:
+                _header("phase_seconds", "histogram")
+            for phase, _hist in sorted(self._histograms.items()):
+                _cumulative = 0.0
+                for _bound, _count in zip((*BUCKETS, "+Inf"), _hist[:-1], strict=True):
+                    _cumulative += _count
+                    lines.append(
+                        f'{self.prefix}_phase_seconds_bucket{{phase="{phase}",le="{_bound}"}}'
+                        f" {_cumulative:.15g}"
+                    )
+                lines.append(
+                    f'{self.prefix}_phase_seconds_sum{{phase="{phase}"}} {_hist[-1]:.6f}'
+                )
+                lines.append(
+                    f'{self.prefix}_phase_seconds_count{{phase="{phase}"}} {_cumulative:.15g}'
+                )
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_name: str) -> None:
+        """Write the metrics to a file atomically, so readers never see a partial file."""
+        _tmp = f"{file_name}.tmp"
+        with open(_tmp, "w", encoding="utf-8") as _fp:
+            _fp.write(self.render())
+        os.replace(_tmp, file_name)
+
+
+class Profiler:
+    """Profile the process with cProfile and dump the statistics periodically."""
+
+    def __init__(self, file_name: str, interval: float = 900.0) -> None:
+        """Start profiling.
+
+        Args:
+            file_name (str): location of the statistics (readable with `pstats`)
+            interval (float): minimum time between dumps [s]
+        """
+        self.file_name: str = file_name
+        self.interval: float = interval
+        self._next: float = time.monotonic()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+
+    def dump(self, force: bool = False) -> None:
+        """Dump the statistics if the interval has passed since the previous dump."""
+        if not force and time.monotonic() < self._next:
+            return
+        self._next = time.monotonic() + self.interval
+        self._profile.dump_stats(self.file_name)
+
+
+METRICS = Metrics()
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Maintain persisted rollups of the water usage per hour, day, month and year.
+
+The rollup tables hold the first-order differences of the `mains` totaliser,
+summed per meter and bucket. The buckets are keyed on `sample_epoch`, which
+holds the local time, so they are local hours, days, months and years. This
+is the same data that `trend.fetch_data` would otherwise have to compute from
+all the raw 15-minute samples.
+
+The gap index (see `libgaps.py`) is maintained along with the rollups.
+"""
+
+import logging
+import sqlite3 as s3
+
+import constants as cs
+import libdb
+import libgaps
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+TABLE_MAINS: str = cs.WIZ_WTR["sql_table"]
+TABLE_STATE: str = "rollup_state"
+METER: str = cs.WIZ_WTR["meter"]
+
+# pandas resample rule -> (table, SQL expression for the start of the bucket containing {epoch})
+# fmt: off
+ROLLUPS: dict[str, tuple[str, str]] = {
+    "h": ("rollup_hour", "(({epoch}) / 3600) * 3600"),
+    "D": ("rollup_day", "(({epoch}) / 86400) * 86400"),
+    "ME": ("rollup_month",
+           "CAST(strftime('%s', {epoch}, 'unixepoch', 'start of month') AS INTEGER)"),
+    "YE": ("rollup_year",
+           "CAST(strftime('%s', {epoch}, 'unixepoch', 'start of year') AS INTEGER)"),
+}
+# fmt: on
+
+
+def create_tables(con: s3.Connection) -> None:
+    """Create the rollup tables if they don't exist yet.
+
+    Args:
+        con: connection to the database
+    """
+    for table, _ in ROLLUPS.values():
+        con.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            f"meter text NOT NULL, "
+            f"bucket_epoch integer NOT NULL, "
+            f"water integer, "
+            f"PRIMARY KEY (meter, bucket_epoch)"
+            f") WITHOUT ROWID;"
+        )
+    con.execute(
+        f"CREATE TABLE IF NOT EXISTS {TABLE_STATE} ("
+        f"name text NOT NULL PRIMARY KEY, "
+        f"value integer);"
+    )
+    libgaps.create_table(con)
+    con.commit()
+
+
+def high_water_mark(con: s3.Connection, meter: str = METER) -> int | None:
+    """Return the `sample_epoch` of the last sample of the meter processed into the rollups.
+
+    Args:
+        con: connection to the database
+        meter (str): id of the meter
+
+    Returns:
+        epoch of the last processed sample or None if the rollups were never built.
+    """
+    return _state(con, f"hwm:{meter}")
+
+
+def _state(con: s3.Connection, name: str) -> int | None:
+    try:
+        row = con.execute(
+            f"SELECT value FROM {TABLE_STATE} WHERE name = ?;",  # nosec B608
+            (name,),
+        ).fetchone()
+    except s3.OperationalError:
+        # no such table
+        return None
+    return None if row is None else int(row[0])
+
+
+def _water_at(con: s3.Connection, meter: str, epoch: int) -> int | None:
+    row = con.execute(
+        f"SELECT water FROM {TABLE_MAINS} WHERE meter = ? AND sample_epoch = ?;",  # nosec B608
+        (meter, epoch),
+    ).fetchone()
+    return None if row is None or row[0] is None else int(row[0])
+
+
+def meters(con: s3.Connection) -> list[str]:
+    """Return the ids of all meters in `mains`.
+
+    Args:
+        con: connection to the database
+    """
+    s3_query = f"SELECT DISTINCT meter FROM {TABLE_MAINS} ORDER BY meter;"  # nosec B608
+    return [_row[0] for _row in con.execute(s3_query)]
+
+
+def update(con: s3.Connection, meter_ids: list[str] | None = None) -> int:
+    """Add the samples stored since the previous update to the rollups.
+
+    For each meter only the rows newer than its high-water mark (plus the one
+    row before it, needed as the base for the first difference) are read.
+
+    The daemon stores the last, unfinished 15-minute bucket of a report and
+    replaces it at the next report. So the sample at the high-water mark may
+    have grown since it was rolled up; that growth is added to its bucket.
+
+    Args:
+        con: connection to the database
+        meter_ids (list): meters to update; None for all meters in `mains`
+
+    Returns:
+        number of new samples processed.
+    """
+    create_tables(con)
+    if meter_ids is None:
+        meter_ids = meters(con)
+    total = 0
+    for meter in meter_ids:
+        hwm = high_water_mark(con, meter)
+        if hwm is None:
+            hwm = -1
+        new_hwm, count = con.execute(
+            f"SELECT MAX(sample_epoch), COUNT(*) FROM {TABLE_MAINS}"  # nosec B608
+            f" WHERE meter = ? AND sample_epoch > ?;",
+            (meter, hwm),
+        ).fetchone()
+        # the usage added to the sample at the high-water mark after it was rolled up
+        _water = _water_at(con, meter, hwm)
+        _rolled = _state(con, f"hwm_water:{meter}")
+        growth = 0 if _water is None or _rolled is None else _water - _rolled
+        if not count and not growth and _rolled is not None:
+            continue
+        if not count:
+            new_hwm = hwm
+        params = {"meter": meter, "hwm": hwm, "new_hwm": new_hwm, "growth": growth}
+        for table, bucket in ROLLUPS.values():
+            # the `WHERE` clause is required to disambiguate the upsert
+            con.execute(
+                f"WITH src AS ("  # nosec B608
+                f" SELECT sample_epoch,"
+                f"  water - LAG(water) OVER (ORDER BY sample_epoch) AS delta"
+                f" FROM {TABLE_MAINS}"
+                f" WHERE meter = :meter"
+                f"  AND sample_epoch >= (SELECT IFNULL(MAX(sample_epoch), -1) FROM {TABLE_MAINS}"
+                f"                       WHERE meter = :meter AND sample_epoch <= :hwm)"
+                f"  AND sample_epoch <= :new_hwm"
+                f"), deltas AS ("
+                f" SELECT sample_epoch, delta FROM src WHERE sample_epoch > :hwm"
+                f" UNION ALL SELECT :hwm, :growth WHERE :growth <> 0"
+                f") "
+                f"INSERT INTO {table} (meter, bucket_epoch, water) "
+                f"SELECT :meter, {bucket.format(epoch='sample_epoch')} AS bucket, SUM(delta)"
+                f" FROM deltas WHERE delta IS NOT NULL"
+                f" GROUP BY bucket "
+                f"ON CONFLICT(meter, bucket_epoch) DO UPDATE SET water = water + excluded.water;",
+                params,
+            )
+        libgaps.update(con, meter, hwm, new_hwm)
+        con.executemany(
+            f"INSERT OR REPLACE INTO {TABLE_STATE} (name, value) VALUES (?, ?);",  # nosec B608
+            [(f"hwm:{meter}", new_hwm), (f"hwm_water:{meter}", _water_at(con, meter, new_hwm))],
+        )
+        con.commit()
+        LOGGER.debug(f"Rolled up {count} samples of {meter} upto {new_hwm}")
+        total += count
+    return int(total)
+
+
+def rebuild(con: s3.Connection) -> int:
+    """Discard the rollups and recreate them from all samples in `mains`.
+
+    Args:
+        con: connection to the database
+
+    Returns:
+        number of samples processed.
+    """
+    create_tables(con)
+    for table, _ in ROLLUPS.values():
+        con.execute(f"DELETE FROM {table};")  # nosec B608
+    con.execute(f"DELETE FROM {libgaps.TABLE_GAPS};")  # nosec B608
+    con.execute(f"DELETE FROM {TABLE_STATE} WHERE name LIKE 'hwm%';")  # nosec B608
+    con.commit()
+    return update(con)
+
+
+def fetch(
+    con: s3.Connection, aggregation: str, start_epoch: int, end_epoch: int, meter: str = METER
+) -> list:
+    """Return the rolled up usage for all buckets that overlap the given period.
+
+    Args:
+        con: connection to the database
+        aggregation (str): pandas resample rule; one of the keys of ROLLUPS
+        start_epoch (int): start of the period
+        end_epoch (int): end of the period
+        meter (str): id of the meter
+
+    Returns:
+        list of (bucket_epoch, water) tuples ordered by bucket_epoch.
+    """
+    table, bucket = ROLLUPS[aggregation]
+    s3_query = (
+        f"SELECT bucket_epoch, water FROM {table} "  # nosec B608
+        f"WHERE meter = :meter "
+        f"AND bucket_epoch >= {bucket.format(epoch=':start')} "
+        f"AND bucket_epoch <= :end "
+        f"ORDER BY bucket_epoch;"
+    )
+    return con.execute(
+        s3_query, {"meter": meter, "start": start_epoch, "end": end_epoch}
+    ).fetchall()
+
+
+def update_database(database: str, meter_ids: list[str] | None = None) -> int:
+    """Update the rollups in the given database file.
+
+    The shared connection of the calling thread is used (see `libdb.shared`).
+
+    Args:
+        database (str): path to the database file
+        meter_ids (list): meters to update; None for all meters
+
+    Returns:
+        number of new samples processed.
+    """
+    with libdb.shared(database) as con:
+        return update(con, meter_ids)
+
+
+if __name__ == "__main__":
+    print(f"Rebuilding rollups in {cs.WIZ_WTR['database']}")
+    with libdb.connect(cs.WIZ_WTR["database"]) as _con:
+        print(f"{rebuild(_con)} samples processed")
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Adaptive sampling of the meter driven by the water flow.
+
+While water is flowing the meter is polled every `active` seconds. When the
+flow stops the interval is doubled after every sample until it reaches `idle`
+seconds.
+
+Regardless of the flow, a sample is always taken in the last slot of the fixed
+sampling grid of each report interval, i.e. where the fixed-rate sampler takes
+its last sample of the bucket. The meter reading only ever increases, so the
+maximum of a bucket is at least the reading of that last sample. Hence every
+bucket is still compacted, with the same value as with fixed-rate sampling
+unless water was flowing after that slot. In that case the value is closer to
+the actual reading at the end of the bucket.
+"""
+
+
+class AdaptiveSchedule:
+    """Determine the moment of the next sample from the current flow."""
+
+    def __init__(
+        self, report_interval: float, sample_interval: float, active: float, idle: float
+    ) -> None:
+        """Initialise the schedule.
+
+        Args:
+            report_interval (float): size of the buckets [s]
+            sample_interval (float): interval of the fixed sampling grid [s]
+            active (float): interval while water is flowing [s]
+            idle (float): maximum interval while no water is flowing [s]
+        """
+        self.report_interval: float = report_interval
+        self.sample_interval: float = sample_interval
+        self.active: float = min(active, idle)
+        self.idle: float = idle
+        self.interval: float = self.active
+
+    def _anchor(self, epoch: float) -> float:
+        """Return the last slot of the fixed grid in the bucket that contains `epoch`."""
+        _bucket = epoch - (epoch % self.report_interval)
+        return _bucket + self.report_interval - self.sample_interval
+
+    def next_sample(self, epoch: float, flow: float | None) -> float:
+        """Return the moment of the sample following the one taken at `epoch`.
+
+        Args:
+            epoch (float): moment of the current sample [s since the epoch]
+            flow (float): flow [L/min] reported by the current sample (None if unknown)
+
+        Returns:
+            (float): moment of the next sample [s since the epoch]
+        """
+        if flow:
+            self.interval = self.active
+        else:
+            # back off gradually; a flow may just have paused
+            self.interval = min(self.interval * 2, self.idle)
+        _anchor = self._anchor(epoch)
+        if epoch >= _anchor:
+            # the last slot of this bucket has been sampled; move to the next bucket
+            _anchor += self.report_interval
+        return min(epoch + self.interval, _anchor)
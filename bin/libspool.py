@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Local append-only spool for compacted data awaiting storage in the database.
+
+Records are appended to the spool file as tab-separated lines:
+    meter <TAB> sample_time <TAB> sample_epoch <TAB> water
+
+Lines without the meter (spooled by earlier versions) belong to the
+configured meter.
+
+When draining, the spool file is first moved aside so that new records can be
+appended while the moved file is being stored. The moved file is only removed
+after all its records were stored successfully. Storing is idempotent
+(`INSERT OR REPLACE`), so replaying a partially stored file is harmless.
+"""
+
+import logging
+import os
+import threading
+
+import constants as cs
+
+LOGGER: logging.Logger = logging.getLogger(__name__)
+
+
+class Spool:
+    """Write-ahead spool for compacted records."""
+
+    def __init__(self, path: str) -> None:
+        """Initialise the spool.
+
+        Args:
+            path (str): location of the spool file
+        """
+        self.path: str = path
+        self.draining: str = f"{path}.draining"
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def append(self, records: list) -> None:
+        """Append records to the spool and make sure they are on disk.
+
+        Args:
+            records (list): list of dicts containing compacted 15-minute data
+        """
+        if not records:
+            return
+        _lines = "".join(
+            f"{_r['meter']}\t{_r['sample_time']}\t{int(_r['sample_epoch'])}\t{int(_r['water'])}\n"
+            for _r in records
+        )
+        with self._lock, open(self.path, "a", encoding="utf-8") as _spool:
+            _spool.write(_lines)
+            _spool.flush()
+            os.fsync(_spool.fileno())
+
+    @staticmethod
+    def _read(path: str) -> list:
+        records = []
+        try:
+            with open(path, encoding="utf-8") as _spool:
+                for _line in _spool:
+                    _fields = _line.rstrip("\n").split("\t")
+                    if len(_fields) == 3:
+                        _fields.insert(0, cs.WIZ_WTR["meter"])
+                    if not _line.endswith("\n") or len(_fields) != 4:
+                        # incomplete line left by a crash while appending
+                        LOGGER.warning(f"Skipping corrupt spool line: {_line!r}")
+                        continue
+                    records.append(
+                        {
+                            "meter": _fields[0],
+                            "sample_time": _fields[1],
+                            "sample_epoch": int(_fields[2]),
+                            "water": int(_fields[3]),
+                        }
+                    )
+        except FileNotFoundError:
+            pass
+        return records
+
+    def pending(self) -> int:
+        """Return the number of records waiting to be stored."""
+        with self._lock:
+            return len(self._read(self.draining)) + len(self._read(self.path))
+
+    def drain(self, store, batch_size: int = 1000) -> int:
+        """Store all spooled records using `store`.
+
+        A file left over by a previous, failed drain is stored first.
+
+        Args:
+            store: callable that stores a list of records; it must raise on failure
+            batch_size (int): maximum number of records passed to `store` at once
+
+        Returns:
+            (int): number of records stored.
+        """
+        with self._lock:
+            if not os.path.isfile(self.draining):
+                if not os.path.isfile(self.path):
+                    return 0
+                os.replace(self.path, self.draining)
+        records = self._read(self.draining)
+        for _idx in range(0, len(records), batch_size):
+            store(records[_idx : _idx + batch_size])
+        os.remove(self.draining)
+        LOGGER.debug(f"Drained {len(records)} records from {self.path}")
+        return len(records)
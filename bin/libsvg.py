@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Lightweight SVG renderer for single-series bar charts.
+
+Draws the same chart as `trend.plot_graph` does with matplotlib (title, axis
+labels, legend, dashed horizontal grid, sparse rotated tick labels and
+optional values in the bars) as SVG text, without importing matplotlib.
+"""
+
+import math
+import os
+from xml.sax.saxutils import escape  # nosec B406
+
+# same geometry as the matplotlib figure: 20 x 7.5 inch at 100 dpi
+WIDTH: int = 2000
+HEIGHT: int = 750
+FONT_SIZE: int = 13
+# margins [px] around the plot area: left, right, top, bottom
+MARGINS: tuple[int, int, int, int] = (90, 20, 45, 120)
+BAR_COLOUR: str = "skyblue"
+BAR_WIDTH: float = 0.9  # fraction of the slot
+
+
+def nice_ticks(low: float, high: float, count: int = 8) -> list[float]:
+    """Return evenly spaced 'round' tick values covering [low, high].
+
+    Args:
+        low (float): lowest value to cover
+        high (float): highest value to cover
+        count (int): approximate maximum number of ticks
+
+    Returns:
+        (list): tick values
+    """
+    if high <= low:
+        high = low + 1.0
+    _raw = (high - low) / max(count - 1, 1)
+    _magnitude = 10 ** math.floor(math.log10(_raw))
+    step = next(_m * _magnitude for _m in (1, 2, 2.5, 5, 10) if _m * _magnitude >= _raw)
+    first = math.floor(low / step) * step
+    last = math.ceil(high / step) * step
+    return [first + _i * step for _i in range(int(round((last - first) / step)) + 1)]
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.10g}"
+
+
+def bar_chart(
+    values: list,
+    ticklabels: list[str],
+    title: str,
+    ylabel: str,
+    legend: str,
+    show_data: bool = False,
+    value_format: str = "+.0f",
+) -> str:
+    """Return the SVG document of a bar chart.
+
+    Args:
+        values (list): height of each bar; NaN is drawn as an empty slot
+        ticklabels (list): label of each bar; empty labels are not drawn
+        title (str): text above the plot
+        ylabel (str): label of the y-axis
+        legend (str): name of the series
+        show_data (bool): whether to show the value in each bar
+        value_format (str): format specification of the values shown in the bars
+
+    Returns:
+        (str): SVG document
+    """
+    _left, _right, _top, _bottom = MARGINS
+    plot_w = WIDTH - _left - _right
+    plot_h = HEIGHT - _top - _bottom
+    _finite = [_v for _v in values if not math.isnan(_v)]
+    ticks = nice_ticks(min(0.0, *_finite), max(0.0, *_finite)) if _finite else [0.0, 1.0]
+    y_low, y_high = ticks[0], ticks[-1]
+
+    def _y(value: float) -> float:
+        return _top + plot_h * (y_high - value) / (y_high - y_low)
+
+    slot = plot_w / max(len(values), 1)
+    out = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+        f'viewBox="0 0 {WIDTH} {HEIGHT}" font-family="DejaVu Sans, sans-serif" '
+        f'font-size="{FONT_SIZE}">',
+        f'<rect width="{WIDTH}" height="{HEIGHT}" fill="white"/>',
+        f'<text x="{_left + plot_w / 2:.1f}" y="{_top - 12}" text-anchor="middle" '
+        f'font-size="{FONT_SIZE + 2}">{escape(title)}</text>',
+    ]
+    # horizontal grid and y-axis labels
+    for _tick in ticks:
+        _ty = _y(_tick)
+        out.append(
+            f'<line x1="{_left}" y1="{_ty:.1f}" x2="{_left + plot_w}" y2="{_ty:.1f}" '
+            f'stroke="black" stroke-width="0.5" stroke-dasharray="4,2"/>'
+        )
+        out.append(
+            f'<text x="{_left - 6}" y="{_ty + 4:.1f}" text-anchor="end">{_fmt(_tick)}</text>'
+        )
+    # bars, values and x-axis labels
+    _zero = _y(0.0)
+    for _idx, (_value, _label) in enumerate(zip(values, ticklabels, strict=True)):
+        _x = _left + _idx * slot
+        _xc = _x + slot / 2
+        if not math.isnan(_value):
+            _vy = _y(_value)
+            out.append(
+                f'<rect x="{_x + slot * (1 - BAR_WIDTH) / 2:.1f}" y="{min(_vy, _zero):.1f}" '
+                f'width="{slot * BAR_WIDTH:.1f}" height="{abs(_zero - _vy):.1f}" '
+                f'fill="{BAR_COLOUR}"/>'
+            )
+            if show_data:
+                _my = (_vy + _zero) / 2
+                out.append(
+                    f'<text x="{_xc:.1f}" y="{_my:.1f}" text-anchor="middle" '
+                    f'transform="rotate(-30 {_xc:.1f} {_my:.1f})">'
+                    f"{_value:{value_format}}</text>"
+                )
+        if _label:
+            _ly = _top + plot_h + 8
+            out.append(
+                f'<line x1="{_xc:.1f}" y1="{_top + plot_h}" x2="{_xc:.1f}" y2="{_ly - 4}" '
+                f'stroke="black"/>'
+            )
+            out.append(
+                f'<text x="{_xc:.1f}" y="{_ly + 8}" text-anchor="end" '
+                f'transform="rotate(-30 {_xc:.1f} {_ly + 8})">{escape(_label)}</text>'
+            )
+    # frame, axis labels and legend
+    out.extend(
+        [
+            f'<rect x="{_left}" y="{_top}" width="{plot_w}" height="{plot_h}" '
+            f'fill="none" stroke="black"/>',
+            f'<text x="{_left + plot_w / 2:.1f}" y="{HEIGHT - 12}" '
+            f'text-anchor="middle">Datetime</text>',
+            f'<text x="20" y="{_top + plot_h / 2:.1f}" text-anchor="middle" '
+            f'transform="rotate(-90 20 {_top + plot_h / 2:.1f})">{escape(ylabel)}</text>',
+            f'<rect x="{_left + 10}" y="{_top + 10}" width="28" height="12" '
+            f'fill="{BAR_COLOUR}"/>',
+            f'<text x="{_left + 46}" y="{_top + 21}">{escape(legend)}</text>',
+            "</svg>",
+        ]
+    )
+    return "\n".join(out) + "\n"
+
+
+def write(file_name: str, document: str) -> None:
+    """Write the document atomically, so the web server never serves a partial file.
+
+    Args:
+        file_name (str): location of the file
+        document (str): content of the file
+    """
+    _tmp = f"{file_name}.tmp"
+    with open(_tmp, "w", encoding="utf-8") as _fp:
+        _fp.write(document)
+    os.replace(_tmp, file_name)
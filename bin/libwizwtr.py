@@ -6,15 +6,19 @@
 
 """Common functions for use with the HomeWizard watermeter"""
 
+import calendar
 import datetime as dt
-import json
 import logging
 import sys
+import time
 
 import constants as cs
+import libbuffer as lb
+import libcalibration as lc
+import libflow as lf
+import libmeter as lm
+import libmetrics as mt
 import numpy as np
-import pandas as pd
-from mausy5043_common import funhomewizard as hwz
 
 LOGGER: logging.Logger = logging.getLogger(__name__)
 
@@ -22,27 +26,51 @@ LOGGER: logging.Logger = logging.getLogger(__name__)
 class WizWTR:
     """Class to interact with the HomeWizard watermeter."""
 
-    def __init__(self, debug: bool = False) -> None:
-        """Initialize the class."""
+    def __init__(
+        self,
+        debug: bool = False,
+        meter=None,
+        clock=None,
+        meter_id: str = cs.WIZ_WTR["meter"],
+        calibration: lc.Calibration | None = None,
+    ) -> None:
+        """Initialize the class.
+
+        Args:
+            debug (bool): debugging mode
+            meter: source of the telegrams (see `libmeter`); default: the HomeWizard device
+            clock: clock that timestamps the samples; default: the system clock
+            meter_id (str): id of the meter in the database
+            calibration: calibration of the meter; default: as configured for `meter_id`
+        """
         self.debug: bool = debug
+        self.meter_id: str = meter_id
+        self.clock = clock or lm.SystemClock()
         self.dt_format = cs.DT_FORMAT
         # starting values
         self.water: float = 0.0
-        self.list_data: list = []
+        self.flow: float = 0.0  # L/min
+        self.calibration = calibration or lc.Calibration.for_meter(meter_id)
+        self.samples = lb.SampleBuffer(
+            capacity=int(cs.WIZ_WTR["buffer_size"]),
+            overflow=cs.WIZ_WTR["buffer_overflow"],
+            dt_format=self.dt_format,
+        )
+        self.flow_events = lf.FlowDetector(meter_id)
+        # the latest sample: (epoch, water, flow)
+        self.latest: tuple[int, int, float] | None = None
         # set-up logging
         if self.debug:
             if len(LOGGER.handlers) == 0:
                 LOGGER.addHandler(logging.StreamHandler(sys.stdout))
             LOGGER.level = logging.DEBUG
             LOGGER.debug("Debugging on.")
-        # process config file
-        with open(cs.WIZ_WTR["config"], encoding="utf-8") as _json_file:
-            _cfg = json.load(_json_file)
-        self.serial: str = _cfg["serial"]
-        self.token: str = _cfg["token"]
+        self.meter = meter or lm.open_meter(debug=self.debug)
 
-        self.hwe = hwz.MyHomeWizard(serial=self.serial, token=self.token, debug=self.debug)
-        self.hwe.connect()
+    @property
+    def list_data(self) -> list:
+        """Samples that have not been compacted yet as a list of dicts."""
+        return self.samples.records()
 
     def get_telegram(self) -> None:
         """Fetch data from the device.
@@ -50,11 +78,56 @@ class WizWTR:
         Returns:
             Nothing
         """
-        _wiz_data = self.hwe.get_measurement()
+        with mt.METRICS.timer("fetch"):
+            _wiz_data = self.meter.get_measurement()
+        with mt.METRICS.timer("translate"):
+            _epoch, _water, _flow = self._sample_telegram(_wiz_data)
+        self.record(_epoch, _water, _flow)
+        mt.METRICS.inc("samples_total")
+        if self.debug:
+            LOGGER.debug(self.list_data)
+            LOGGER.debug("*-*")
+
+    def read_water(self) -> tuple[int, float]:
+        """Fetch the current meter reading and flow from the device.
+
+        Returns:
+            (int): meter reading in liters
+            (float): flow in L/min
+        """
+        with mt.METRICS.timer("fetch"):
+            _wiz_data = self.meter.get_measurement()
+        with mt.METRICS.timer("translate"):
+            _, _water, _flow = self._sample_telegram(_wiz_data)
+        mt.METRICS.inc("samples_total")
+        return _water, _flow
 
-        self.list_data.append(self._translate_telegram(_wiz_data))
-        LOGGER.debug(self.list_data)
-        LOGGER.debug("*-*")
+    def record(self, epoch: int, water: int, flow: float) -> None:
+        """Add a sample to the buffer and to the flow event detection.
+
+        Samples must be recorded in chronological order.
+
+        Args:
+            epoch (int): time of the sample in seconds since the epoch
+            water (int): meter reading in liters
+            flow (float): flow in L/min
+        """
+        self.samples.append(epoch, water)
+        self.flow_events.update(epoch, water, flow)
+        self.latest = (epoch, water, flow)
+
+    def live(self) -> dict | None:
+        """Return the latest sample as a dict or None if there is none yet."""
+        _latest = self.latest
+        if _latest is None:
+            return None
+        return {
+            "meter": self.meter_id,
+            "sample_epoch": _latest[0],
+            "sample_time": dt.datetime.fromtimestamp(_latest[0]).strftime(self.dt_format),
+            "water": _latest[1],
+            "flow": _latest[2],
+        }
 
     def _translate_telegram(self, telegram) -> dict:
         """Translate the telegram to a dict.
@@ -92,36 +165,148 @@ class WizWTR:
         #      active_liter_lpm=0, total_liter_m3=0.016,
         #      external_devices=None)
 
-        self.water = self._calc_new_total(telegram.total_liter_m3) * 1000  # in liters
-
-        idx_dt: dt.datetime = dt.datetime.now()
-        epoch = int(idx_dt.timestamp())
+        epoch, water, _ = self._sample_telegram(telegram)
 
         return {
-            "sample_time": idx_dt.strftime(self.dt_format),
+            "meter": self.meter_id,
+            "sample_time": dt.datetime.fromtimestamp(epoch).strftime(self.dt_format),
             "sample_epoch": epoch,
-            "water": int(self.water),
+            "water": water,
         }
 
-    @staticmethod
-    def _calc_new_total(metered_volume: float) -> float:
-        new_volume: float = metered_volume + cs.WIZ_WTR["offset"]
-        for key, value in cs.WIZ_WTR["calibration"].items():
-            if pd.Timestamp(key) < pd.Timestamp.now():
-                new_volume += value
-        return new_volume
+    def _sample_telegram(self, telegram) -> tuple[int, int, float]:
+        """Extract the sample from the telegram.
+
+        The current flow is also kept in `self.flow`.
+
+        Returns:
+            (int): time of the sample in seconds since the epoch
+            (int): meter reading in liters
+            (float): flow in L/min
+        """
+        _epoch = int(self.clock.time())
+        # the calibration that applied at the moment of the sample, also in virtual time
+        self.water = self._calc_new_total(telegram.total_liter_m3, _epoch) * 1000  # in liters
+        _flow = float(telegram.active_liter_lpm or 0.0)
+        self.flow = _flow
+        return _epoch, int(self.water), _flow
+
+    def _calc_new_total(self, metered_volume: float, epoch: float | None = None) -> float:
+        return self.calibration.correct(metered_volume, epoch)
+
+    def reload_calibration(self) -> None:
+        """Rebuild the calibration table from the (modified) configuration."""
+        self.calibration.reload(cs.WIZ_WTR["offset"], cs.WIZ_WTR["calibration"])
 
     @staticmethod
-    def compact_data(data) -> tuple:
+    def compact_data(data, meter: str = cs.WIZ_WTR["meter"]) -> tuple:
         """
         Compact the data into 15-minute data
 
+        Samples are bucketed on their integer `sample_epoch`. Each bucket is
+        labelled with its right edge and holds the maximum `water` value of
+        the samples in it.
+
+        Args:
+            data (list): list of dicts containing data from the water meter
+            meter (str): id of the meter the data belongs to
+
+        Returns:
+            (list): list of dicts containing compacted 15-minute data
+            (list): list of dicts containing the samples that were not compacted
+        """
+        if not data:
+            return [], []
+        _count = len(data)
+        result_data = WizWTR.compact_arrays(
+            np.fromiter((d["sample_epoch"] for d in data), dtype=np.int64, count=_count),
+            np.fromiter((d["water"] for d in data), dtype=np.int64, count=_count),
+            meter,
+        )
+        _last = result_data[-1]["sample_epoch"]
+        remain_data = [d for d in data if d["sample_epoch"] > _last]
+        LOGGER.debug(f"Result: {result_data}")
+        LOGGER.debug(f"Remain: {remain_data}\n")
+        return result_data, remain_data
+
+    def compact_samples(self) -> list:
+        """
+        Compact the buffered samples into 15-minute data
+
+        The compacted samples are removed from the buffer.
+
+        Returns:
+            (list): list of dicts containing compacted 15-minute data
+        """
+        if not len(self.samples):
+            return []
+        with mt.METRICS.timer("compact"):
+            result_data = self.compact_arrays(
+                self.samples.epochs(), self.samples.water(), self.meter_id
+            )
+            self.samples.discard_upto(result_data[-1]["sample_epoch"])
+        LOGGER.debug(f"Result: {result_data}")
+        LOGGER.debug(f"Remain: {len(self.samples)} samples\n")
+        return result_data
+
+    @staticmethod
+    def compact_arrays(
+        epochs: np.ndarray, water: np.ndarray, meter: str = cs.WIZ_WTR["meter"]
+    ) -> list:
+        """
+        Bucket the samples into 15-minute data
+
+        This is the compaction used by `compact_data()`, `compact_samples()`
+        and `backfill.py`.
+
+        Args:
+            epochs (np.ndarray): times of the samples in seconds since the epoch
+            water (np.ndarray): meter readings in liters
+            meter (str): id of the meter the samples belong to
+
+        Returns:
+            (list): list of dicts containing compacted 15-minute data
+        """
+        bucket_size: int = int(cs.WIZ_WTR["report_interval"])
+        buckets = epochs // bucket_size
+        order = np.argsort(buckets, kind="stable")
+        buckets = buckets[order]
+        labels, starts = np.unique(buckets, return_index=True)
+        maxima = np.maximum.reduceat(water[order], starts)
+
+        result_data = []
+        for label, value in zip(labels.tolist(), maxima.tolist(), strict=True):
+            # label the bucket with its right edge expressed in local time
+            _local = time.localtime((label + 1) * bucket_size)
+            # NB: `sample_epoch` of the compacted data is the local time expressed as
+            #     seconds since the epoch, like the data already stored in the database.
+            result_data.append(
+                {
+                    "meter": meter,
+                    "sample_epoch": calendar.timegm(_local),
+                    "water": value,
+                    "sample_time": time.strftime(cs.DT_FORMAT, _local),
+                }
+            )
+        return result_data
+
+    @staticmethod
+    def compact_data_pandas(data, meter: str = cs.WIZ_WTR["meter"]) -> tuple:
+        """
+        Compact the data into 15-minute data using pandas
+
+        This is the original implementation of `compact_data()`. It is kept as
+        a reference for benchmarking and verification.
+
         Args:
             data (list): list of dicts containing data from the water meter
+            meter (str): id of the meter the data belongs to
 
         Returns:
             (list): list of dicts containing compacted 15-minute data
         """
+        # pandas is only needed here; importing it would slow down the start of the daemon
+        import pandas as pd  # pylint: disable=C0415
 
         def _convert_time_to_epoch(date_to_convert) -> int:
             return int(pd.Timestamp(date_to_convert).timestamp())
@@ -143,6 +328,7 @@ class WizWTR:
 
         # recalculate 'sample_epoch'
         df_out["sample_epoch"] = df_out["sample_time"].apply(_convert_time_to_epoch)
+        df_out["meter"] = meter
         result_data = df_out.to_dict("records")  # list of dicts
 
         df = df[df["sample_epoch"] > np.max(df_out["sample_epoch"])]  # pylint: disable=E1136
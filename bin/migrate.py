@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Migrate an existing database to the current schema in-place.
+
+The schema version is kept in `PRAGMA user_version`. Each migration is applied
+in a single transaction, so an interrupted migration leaves the database as it
+was.
+"""
+
+import argparse
+import sqlite3 as s3
+
+import constants as cs
+import libdb
+import libflow as lf
+import libgaps
+import librollup as rollup
+
+TABLE_MAINS: str = cs.WIZ_WTR["sql_table"]
+TABLE_EVENTS: str = lf.TABLE_EVENTS
+
+
+def _epoch_key(con: s3.Connection) -> None:
+    """Make the integer `sample_epoch` the primary key of a WITHOUT ROWID table."""
+    con.execute(
+        f"CREATE TABLE {TABLE_MAINS}_new ("
+        f" sample_epoch  integer NOT NULL PRIMARY KEY,"
+        f" sample_time   datetime,"
+        f" water         integer"
+        f") WITHOUT ROWID;"
+    )
+    # rows with the same epoch were duplicates anyway; the last one wins
+    con.execute(
+        f"INSERT OR REPLACE INTO {TABLE_MAINS}_new (sample_epoch, sample_time, water)"  # nosec B608
+        f" SELECT sample_epoch, sample_time, water FROM {TABLE_MAINS}"
+        f" WHERE sample_epoch IS NOT NULL ORDER BY sample_epoch, sample_time;"
+    )
+    # also drops the index on `sample_epoch` that is no longer needed
+    con.execute(f"DROP TABLE {TABLE_MAINS};")
+    con.execute(f"ALTER TABLE {TABLE_MAINS}_new RENAME TO {TABLE_MAINS};")
+
+
+def _meter_key(con: s3.Connection) -> None:
+    """Add the `meter` column; the existing data belongs to the configured meter."""
+    meter = cs.WIZ_WTR["meter"]
+    con.execute(
+        f"CREATE TABLE {TABLE_MAINS}_new ("
+        f" meter         text NOT NULL,"
+        f" sample_epoch  integer NOT NULL,"
+        f" sample_time   datetime,"
+        f" water         integer,"
+        f" PRIMARY KEY (meter, sample_epoch)"
+        f") WITHOUT ROWID;"
+    )
+    con.execute(
+        f"INSERT INTO {TABLE_MAINS}_new (meter, sample_epoch, sample_time, water)"  # nosec B608
+        f" SELECT ?, sample_epoch, sample_time, water FROM {TABLE_MAINS};",
+        (meter,),
+    )
+    con.execute(f"DROP TABLE {TABLE_MAINS};")
+    con.execute(f"ALTER TABLE {TABLE_MAINS}_new RENAME TO {TABLE_MAINS};")
+    if con.execute(
+        f"SELECT name FROM sqlite_master WHERE type = 'table' AND name = '{TABLE_EVENTS}';"
+    ).fetchone():
+        con.execute(f"ALTER TABLE {TABLE_EVENTS} RENAME TO {TABLE_EVENTS}_old;")
+        lf.create_table(con)
+        con.execute(
+            f"INSERT INTO {TABLE_EVENTS}"  # nosec B608
+            f" (meter, start_epoch, start_time, duration, liters, peak_lpm)"
+            f" SELECT ?, start_epoch, start_time, duration, liters, peak_lpm"
+            f" FROM {TABLE_EVENTS}_old;",
+            (meter,),
+        )
+        con.execute(f"DROP TABLE {TABLE_EVENTS}_old;")
+    # the rollups are derived data; they are rebuilt per meter after the migration
+    for table, _ in rollup.ROLLUPS.values():
+        con.execute(f"DROP TABLE IF EXISTS {table};")
+    con.execute(f"DROP TABLE IF EXISTS {rollup.TABLE_STATE};")
+
+
+def _gap_index(con: s3.Connection) -> None:
+    """Add the gap index; the gaps in the data that is already rolled up are looked up."""
+    libgaps.create_table(con)
+    for meter in rollup.meters(con):
+        hwm = rollup.high_water_mark(con, meter)
+        if hwm is not None:
+            libgaps.update(con, meter, -1, hwm)
+
+
+# migrations in order; migration N brings the database to `user_version` N
+MIGRATIONS: list = [
+    _epoch_key,
+    _meter_key,
+    _gap_index,
+]
+SCHEMA_VERSION: int = len(MIGRATIONS)
+
+
+def schema_version(con: s3.Connection) -> int:
+    """Return the schema version of the database."""
+    return int(con.execute("PRAGMA user_version;").fetchone()[0])
+
+
+def migrate(con: s3.Connection, verbose: bool = False) -> int:
+    """Apply all migrations that the database has not seen yet.
+
+    Args:
+        con: connection to the database
+        verbose (bool): report each migration
+
+    Returns:
+        (int): number of migrations applied.
+    """
+    applied = 0
+    for version in range(schema_version(con), SCHEMA_VERSION):
+        migration = MIGRATIONS[version]
+        if verbose:
+            print(f"Migrating to version {version + 1}: {migration.__doc__}")
+        con.execute("BEGIN;")
+        try:
+            migration(con)
+            con.execute(f"PRAGMA user_version = {version + 1};")
+            con.execute("COMMIT;")
+        except Exception:
+            con.execute("ROLLBACK;")
+            raise
+        applied += 1
+    return applied
+
+
+def migrate_database(database: str, verbose: bool = False) -> int:
+    """Migrate the given database file, rebuild the rollups and reclaim the freed space.
+
+    Args:
+        database (str): path to the database file
+        verbose (bool): report each migration
+
+    Returns:
+        (int): number of migrations applied.
+    """
+    con = libdb.connect(database)
+    # the migrations manage their own transactions
+    con.isolation_level = None
+    try:
+        applied = migrate(con, verbose=verbose)
+        if applied:
+            if rollup.high_water_mark(con) is None:
+                rollup.update(con)
+            con.execute("VACUUM;")
+    finally:
+        con.close()
+    return applied
+
+
+if __name__ == "__main__":
+    # fmt: off
+    parser = argparse.ArgumentParser(description="Migrate the database to the current schema")
+    parser.add_argument("--database",
+                        type=str,
+                        default=cs.WIZ_WTR["database"],
+                        help="database to migrate (default: the configured database)"
+                        )
+    OPTION = parser.parse_args()
+    # fmt: on
+    print(f"Migrating {OPTION.database}")
+    print(f"{migrate_database(OPTION.database, verbose=True)} migration(s) applied")
@@ -3,5 +3,5 @@
 HERE=$(cd "$(dirname "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)
 
 pushd "${HERE}" >/dev/null || exit 1
-    ./trend.py --hours 0
+    ./trendclient.py --hours 0 --events 0 || ./trend.py --hours 0 --events 0
 popd >/dev/null || exit
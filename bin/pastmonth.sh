@@ -41,6 +41,8 @@ if [ "${MAINTENANCE}" == "-" ]; then
     echo -n "${db_full_path} integrity check:   "
     execute_sql "${db_full_path}" "PRAGMA integrity_check;"
     if [ "${flag_sql_succes=1}" == 0 ]; then
+        # move the latest commits from the WAL file into the database file
+        execute_sql "${db_full_path}" "PRAGMA wal_checkpoint(TRUNCATE);"
         echo "${db_full_path} copying to backup... "
         # copy to backup
         if command -v rclone &> /dev/null; then
@@ -58,16 +60,22 @@ if [ "${MAINTENANCE}" == "-" ]; then
     else
         echo "Database integrity check failed. Skipping backup and vacuuming." >&2
     fi
+    # archive the closed months; only new or changed months are written
+    ./archive.py
     # sync the database into the cloud
     if command -v rclone &> /dev/null; then
         echo "${db_full_path} syncing... "
+        execute_sql "${db_full_path}" "PRAGMA wal_checkpoint(TRUNCATE);"
         # shellcheck disable=SC2154
         rclone copyto -v \
                "${database_local_root}/${app_name}/${database_filename}" \
                "${database_remote_root}/${app_name}/${database_filename}"
+        rclone sync -v \
+               "${database_local_root}/${app_name}/archive" \
+               "${database_remote_root}/${app_name}/archive"
     fi
 fi
 
-./trend.py --days 0
+./trendclient.py --days 0 || ./trend.py --days 0
 
 popd >/dev/null || exit
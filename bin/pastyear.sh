@@ -5,5 +5,5 @@
 HERE=$(cd "$(dirname "${BASH_SOURCE[0]}")" >/dev/null 2>&1 && pwd)
 
 pushd "${HERE}" >/dev/null || exit 1
-    ./trend.py --months 0 --years 0
+    ./trendclient.py --months 0 --years 0 || ./trend.py --months 0 --years 0
 popd >/dev/null || exit
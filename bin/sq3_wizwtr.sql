@@ -3,16 +3,92 @@
 -- create a table `mains` for HomeWizard smart water meter readings
 
 DROP TABLE IF EXISTS mains;
+DROP TABLE IF EXISTS rollup_hour;
+DROP TABLE IF EXISTS rollup_day;
+DROP TABLE IF EXISTS rollup_month;
+DROP TABLE IF EXISTS rollup_year;
+DROP TABLE IF EXISTS rollup_state;
+DROP TABLE IF EXISTS flow_events;
+DROP TABLE IF EXISTS gaps;
 
 
+-- `meter` identifies the meter (see WIZ_WTR["meter"]),
+-- `sample_epoch` is the local time expressed as seconds since the epoch
+-- and `sample_time` is the same moment as text.
 CREATE TABLE mains (
-  sample_time   datetime NOT NULL PRIMARY KEY,
-  sample_epoch  integer,
-  water         integer
+  meter         text NOT NULL,
+  sample_epoch  integer NOT NULL,
+  sample_time   datetime,
+  water         integer,
+  PRIMARY KEY (meter, sample_epoch)
+  ) WITHOUT ROWID;
+
+-- The rows of each meter are stored in `sample_epoch` order, so all queries
+-- on epoch ranges of a meter are served by the primary key. No index needed.
+-- Existing databases are converted by `migrate.py`.
+
+-- Water usage (first-order differences of `mains.water`) per meter and UTC bucket.
+-- Maintained by the daemon (see `librollup.py`); `bucket_epoch` is the start of the bucket.
+CREATE TABLE rollup_hour (
+  meter         text NOT NULL,
+  bucket_epoch  integer NOT NULL,
+  water         integer,
+  PRIMARY KEY (meter, bucket_epoch)
+  ) WITHOUT ROWID;
+
+CREATE TABLE rollup_day (
+  meter         text NOT NULL,
+  bucket_epoch  integer NOT NULL,
+  water         integer,
+  PRIMARY KEY (meter, bucket_epoch)
+  ) WITHOUT ROWID;
+
+CREATE TABLE rollup_month (
+  meter         text NOT NULL,
+  bucket_epoch  integer NOT NULL,
+  water         integer,
+  PRIMARY KEY (meter, bucket_epoch)
+  ) WITHOUT ROWID;
+
+CREATE TABLE rollup_year (
+  meter         text NOT NULL,
+  bucket_epoch  integer NOT NULL,
+  water         integer,
+  PRIMARY KEY (meter, bucket_epoch)
+  ) WITHOUT ROWID;
+
+-- `hwm:<meter>`: sample_epoch of the last sample of the meter processed into the rollups
+-- `hwm_water:<meter>`: water of that sample when it was processed
+CREATE TABLE rollup_state (
+  name          text NOT NULL PRIMARY KEY,
+  value         integer
   );
 
--- SQLite3 automatically creates a UNIQUE INDEX on the PRIMARY KEY in the background.
--- So, no index needed.
+-- Gaps in `mains`: the samples before and after each gap and the usage in between.
+-- Maintained along with the rollups (see `libgaps.py`).
+CREATE TABLE gaps (
+  meter         text NOT NULL,
+  start_epoch   integer NOT NULL,
+  end_epoch     integer NOT NULL,
+  water         integer,
+  PRIMARY KEY (meter, start_epoch)
+  ) WITHOUT ROWID;
+
+-- Water usage events detected from the flow (see `libflow.py`).
+-- `start_epoch` is UTC; `start_time` is the same moment as local time text.
+-- Events older than WIZ_WTR["flow_retention"] days are removed by the daemon.
+CREATE TABLE flow_events (
+  meter         text NOT NULL,
+  start_epoch   integer NOT NULL,
+  start_time    datetime,
+  duration      integer,
+  liters        integer,
+  peak_lpm      real,
+  PRIMARY KEY (meter, start_epoch)
+  ) WITHOUT ROWID;
+
+INSERT INTO mains (meter, sample_time, sample_epoch, water)
+       VALUES ('mains', '2024-12-25 11:00:00', 1735120800, 891719);
 
-INSERT INTO mains (sample_time, sample_epoch, water)
-       VALUES ('2024-12-25 11:00:00', 1735120800, 891719);
+-- schema version; see `migrate.py`
+PRAGMA user_version = 3;
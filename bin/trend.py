@@ -9,20 +9,40 @@ Using HomeWizard watermeter data
 """
 
 import argparse
-import random
+import concurrent.futures
+import contextlib
+import hashlib
+import multiprocessing
+import os
+import shlex
+import signal
+import socketserver
 import sqlite3 as s3
 import sys
 import time
 from datetime import datetime as dt
 
+import archive
 import constants
-import matplotlib.pyplot as plt
-import matplotlib.ticker as mticker
+import libdb
+import libflow as lf
+import libgaps
+import librollup as rollup
+import libsvg
+import numpy as np
 import pandas as pd
 
-DATABASE = constants.TREND["database"]
 TABLE_MAINS = constants.WIZ_WTR["sql_table"]
 
+
+def _edate(value: str) -> str:
+    """Return the value of --edate as 'yyyy-mm-dd HH:MM:SS'; it ends up in the SQL queries"""
+    for _format in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        with contextlib.suppress(ValueError):
+            return dt.strptime(value, _format).strftime("%Y-%m-%d %H:%M:%S")
+    raise argparse.ArgumentTypeError(f"invalid date {value!r}; use yyyy-mm-dd [HH:MM[:SS]]")
+
+
 # fmt: off
 parser = argparse.ArgumentParser(description="Create a trendgraph")
 parser.add_argument("--hours", "-hr",
@@ -41,25 +61,61 @@ parser.add_argument("--years", "-y",
                     type=int,
                     help="number of months of data to use for the graph",
                     )
+parser.add_argument("--events", "-ev",
+                    type=int,
+                    help="show the <EVENTS> largest flow events of the day",
+                    )
 parser.add_argument("--edate", "-e",
-                    type=str,
+                    type=_edate,
                     help="date of last day of the graph (default: now)",
                     )
+parser.add_argument("--all", "-a",
+                    action="store_true",
+                    help="create all trends (default periods unless given) in parallel"
+                    )
+parser.add_argument("--meter",
+                    type=str,
+                    default=constants.WIZ_WTR["meter"],
+                    help="id of the meter to show (default: the configured meter)",
+                    )
 parser_group = parser.add_mutually_exclusive_group(required=False)
 parser_group.add_argument("--debug",
                           action="store_true",
                           help="start in debugging mode"
                           )
+parser.add_argument("--svg",
+                    action="store_true",
+                    help="draw the graphs as SVG without matplotlib"
+                    )
+parser.add_argument("--serve",
+                    action="store_true",
+                    help="keep running and create the trends requested through the socket"
+                    )
 OPTION = parser.parse_args()
 # fmt: on
 
 DEBUG = False
 EDATETIME = "'now'"
+# the meter shown; also the name of the series, so it ends up in the file names of the graphs
+METER = constants.WIZ_WTR["meter"]
+
+# option -> (output, hours per unit, aggregation, title, show_data, locatorformat)
+# fmt: off
+GRAPHS: dict = {
+    "hours": ("hour_graph", 1, "h", "trend afgelopen uren", False, ["hour", "%d-%m %Hh"]),
+    "days": ("day_graph", 24, "D", "trend afgelopen dagen", False, ["day", "%Y-%m-%d"]),
+    "months": ("month_graph", 31 * 24, "ME", "trend afgelopen maanden", False, ["month", "%Y-%m"]),
+    "years": ("year_graph", 366 * 24, "YE", "trend afgelopen jaren", True, ["year", "%Y"]),
+}
+# fmt: on
 
 
 def fetch_data(hours_to_fetch=48, aggregation="W") -> dict:
     """Query the database to fetch the requested data
 
+    The data is taken from the rollup tables if they are available for the
+    requested aggregation. Otherwise the raw totaliser data is used.
+
     Args:
         hours_to_fetch (int): hours of data to retrieve
         aggregation (str): pandas resample rule
@@ -67,81 +123,428 @@ def fetch_data(hours_to_fetch=48, aggregation="W") -> dict:
     Returns:
         dict with dataframes containing mains and production data
     """
-    df = pd.DataFrame()
+    return fetch_many([(hours_to_fetch, aggregation)])[0]
+
+
+def fetch_many(periods: list[tuple[int, str]]) -> list[dict]:
+    """Query the database to fetch the data for several graphs
+
+    The raw totaliser data is only read once, for the widest period that
+    is not available from the rollup tables.
+
+    Args:
+        periods (list): list of (hours_to_fetch, aggregation) tuples
+
+    Returns:
+        list of dicts with dataframes containing mains data; one for each period
+    """
+    frames: list = [None] * len(periods)
+    for idx, (hours_to_fetch, aggregation) in enumerate(periods):
+        if aggregation in rollup.ROLLUPS:
+            frames[idx] = fetch_rollup(hours_to_fetch, aggregation)
+    missing = [idx for idx, df in enumerate(frames) if df is None]
+    if missing:
+        for idx, df in zip(missing, fetch_mains([periods[idx] for idx in missing]), strict=True):
+            frames[idx] = df
+
+    data_dicts = []
+    for df in frames:
+        df_wtr = df.sort_index(axis=1)
+        if DEBUG:
+            print("\no  database totaliser data pre-processed")
+            print("   ** for plotting  **")
+            print(df_wtr.to_markdown(floatfmt=".3f"))  # requires `tabulate` package
+
+        data_dict = {}
+        data_dict[METER] = df_wtr
+        data_dicts.append(data_dict)
+    return data_dicts
+
+
+def fetch_rollup(hours_to_fetch: int, aggregation: str) -> pd.DataFrame | None:
+    """Fetch the usage per bucket from the rollup tables
+
+    Args:
+        hours_to_fetch (int): hours of data to retrieve
+        aggregation (str): pandas resample rule; one of the keys of librollup.ROLLUPS
+
+    Returns:
+        dataframe with the usage per bucket or None if the rollups are not available.
+    """
+    if DEBUG:
+        print(f"\nRequest {hours_to_fetch} hours of rolled up data")
+        print("\n*** fetching rollup data ***")
+    epoch_query = (
+        f"SELECT {_epoch_sql(f'-{hours_to_fetch + 1} hours')}, {_epoch_sql('+2 hours')};"
+    )
+
+    def _query(con):
+        if rollup.high_water_mark(con, METER) is None:
+            return None
+        start_epoch, end_epoch = con.execute(epoch_query).fetchone()
+        _rows = rollup.fetch(con, aggregation, start_epoch, end_epoch, METER)
+        _first = _rows[0][0] if _rows else start_epoch
+        return _rows, libgaps.fetch(con, _first, end_epoch, METER)
+
+    result = _with_connection(_query)
+    if result is None:
+        if DEBUG:
+            print("Rollups not available.")
+        return None
+
+    rows, gaps = result
+    df = pd.DataFrame(rows, columns=["sample_epoch", "water"]).set_index("sample_epoch")
+    if len(gaps) and len(df):
+        # move the usage of each gap from the bucket after the gap to the buckets of the gap
+        _epochs, _changes = libgaps.corrections(gaps)
+        _keep = _epochs >= df.index[0]
+        df = pd.concat([df, pd.DataFrame({"water": _changes[_keep]}, index=_epochs[_keep])])
+        if DEBUG:
+            print(f"{len(gaps)} gap(s) spread")
+    df.index = pd.to_datetime(df.index, unit="s")  # noqa
+    # resample to monotonic timeline; this also fills empty buckets
+    df = df.resample(f"{aggregation}").sum()
+    # drop first row like `fetch_mains` does
+    if aggregation == "h":
+        df = df.iloc[1:, :]
+    return df
+
+
+def fetch_mains(periods: list[tuple[int, str]]) -> list[pd.DataFrame]:
+    """Fetch the raw totaliser data and convert it to usage per bucket
+
+    The data for the widest period is fetched and converted to first-order
+    differences once. The usage for each period is derived from that.
+
+    Args:
+        periods (list): list of (hours_to_fetch, aggregation) tuples
+
+    Returns:
+        list of dataframes with the usage per bucket; one for each period.
+    """
+    hours_to_fetch = max(hours for hours, _ in periods)
     if DEBUG:
         print(f"\nRequest {hours_to_fetch} hours of mains data")
         print("\n*** fetching mains data ***")
 
-    where_condition = (
-        f" ( sample_time >= datetime({EDATETIME}, '-{hours_to_fetch + 1} hours')"
-        f" AND sample_time <= datetime({EDATETIME}, '+2 hours') )"
+    # start of each period, using the same arithmetic as the query for the data
+    start_query: str = "SELECT " + ", ".join(
+        f"datetime({EDATETIME}, '-{hours + 1} hours')" for hours, _ in periods
     )
-    group_condition = ""
-    # if aggregation == 'H':
-    #     group_condition = "GROUP BY strftime('%d %H', sample_time)"
-    s3_query: str = (
-        f"SELECT * "  # nosec B608
-        f"FROM {TABLE_MAINS} "
-        f"WHERE {where_condition} {group_condition};"
+    if EDATETIME == "'now'":
+        df, starts = fetch_diffs_cached(hours_to_fetch, start_query)
+    else:
+        df, starts = fetch_diffs(hours_to_fetch, start_query)
+
+    frames = []
+    for (_, aggregation), start in zip(periods, starts, strict=True):
+        # resample to monotonic timeline
+        df_period = df[df.index >= pd.Timestamp(start)].resample(f"{aggregation}").sum()
+
+        # drop first row as it will usually not contain valid or complete data
+        if aggregation == "h":
+            df_period = df_period.iloc[1:, :]
+        frames.append(df_period)
+    return frames
+
+
+def fetch_diffs(hours_to_fetch: int, start_query: str) -> tuple[pd.DataFrame, tuple]:
+    """Fetch the raw totaliser data and convert it to first-order differences
+
+    Args:
+        hours_to_fetch (int): hours of data to retrieve
+        start_query (str): query returning the start of each period
+
+    Returns:
+        dataframe with the first-order differences and the result of start_query
+    """
+    # `sample_epoch` is the local time in seconds, so it compares like `sample_time`
+    epoch_query = (
+        f"SELECT {_epoch_sql(f'-{hours_to_fetch + 1} hours')}, {_epoch_sql('+2 hours')};"
     )
-    if DEBUG:
-        print(s3_query)
     # Get the data
-    success = False
-    retries = 5
-    while not success and retries > 0:
-        try:
-            with s3.connect(DATABASE) as con:
-                df = pd.read_sql_query(
-                    s3_query, con, parse_dates=["sample_time"], index_col="sample_epoch"
-                )
-                success = True
-        except (s3.OperationalError, pd.errors.DatabaseError) as exc:
-            if DEBUG:
-                print("Database may be locked. Waiting...")
-            retries -= 1
-            time.sleep(random.randint(30, 60))  # nosec bandit B311
-            if retries == 0:
-                raise TimeoutError("Database seems locked.") from exc
+    data, starts = _with_connection(
+        lambda con: (
+            read_mains(con, *con.execute(epoch_query).fetchone()),
+            con.execute(start_query).fetchone(),
+        )
+    )
+    df = pd.DataFrame({"water": data[:, 1]}, index=data[:, 0].astype(np.int64))
+    df.index.name = "sample_epoch"
 
     if DEBUG:
         print("\no  database totaliser data")
         print(df.to_markdown(floatfmt=".3f"))  # requires `tabulate` package
 
-    # Pre-processing
-    # drop sample_time separately!
-    df.drop("sample_time", axis=1, inplace=True, errors="ignore")
-
-    for c in df.columns:
-        if c not in ["sample_time"]:
-            df[c] = pd.to_numeric(df[c], errors="coerce")
+    # Convert totalizers to first-order differences; the usage over a gap is spread over it
+    epochs, deltas = libgaps.spread(data[1:, 0], data[:-1, 0], np.diff(data[:, 1]))
+    _keep = ~np.isnan(deltas)
+    df = pd.DataFrame({"water": deltas[_keep]}, index=epochs[_keep])
+    df.index.name = "sample_epoch"
     # df.index = pd.to_datetime(df.index, unit='s')
     #              .tz_localize("UTC")
     #              .tz_convert("Europe/Amsterdam")
     df.index = pd.to_datetime(df.index, unit="s")  # noqa
-
-    # Convert totalizers to first-order differences
-    df = df.diff().dropna()
     if DEBUG:
         print("\no  database 1st order data")
         print(df.to_markdown(floatfmt=".3f"))  # requires `tabulate` package
 
-    # resample to monotonic timeline
-    df = df.resample(f"{aggregation}").sum()
+    return df, starts
 
-    # drop first row as it will usually not contain valid or complete data
-    if aggregation == "h":
-        df = df.iloc[1:, :]
 
-    df_wtr = df.sort_index(axis=1)
+def read_mains(con: s3.Connection, start_epoch: int, end_epoch: int | None = None) -> np.ndarray:
+    """Read the totaliser data of the selected meter in the given period
+
+    Closed months are read from the archive (see `archive.py`); only the data
+    after the archive is queried from the database.
+
+    Args:
+        con: connection to the database
+        start_epoch (int): start of the period
+        end_epoch (int): end of the period (inclusive); None for all data
+
+    Returns:
+        (n, 2) float array of sample_epoch, water ordered by sample_epoch; missing readings are NaN
+    """
+    _archive = archive.Archive(constants.TREND["archive"], METER)
+    _end = end_epoch if end_epoch is not None else 2**62
+    archived = _archive.read(start_epoch, _end + 1)
+    s3_query = (
+        f"SELECT sample_epoch, water FROM {TABLE_MAINS} "  # nosec B608
+        f"WHERE meter = ? AND sample_epoch >= ? AND sample_epoch <= ? ORDER BY sample_epoch;"
+    )
     if DEBUG:
-        print("\no  database totaliser data pre-processed")
-        print("   ** for plotting  **")
-        print(df_wtr.to_markdown(floatfmt=".3f"))  # requires `tabulate` package
+        print(f"{len(archived)} rows from the archive; {s3_query}")
+    rows = con.execute(s3_query, (METER, max(start_epoch, _archive.upto), _end)).fetchall()
+    return np.concatenate((archived, np.array(rows, dtype=np.float64).reshape(-1, 2)))
 
-    data_dict = {}
-    data_dict["mains"] = df_wtr
-    return data_dict
+
+def cache_fingerprint() -> str:
+    """Return a fingerprint of everything that invalidates the cached differences
+
+    That is: the identity of the database file (an rclone restore replaces
+    the file), the meter, the calibration of the meter and the step over
+    which the usage of gaps is spread.
+    """
+    try:
+        _stat = os.stat(constants.TREND["database"])
+        _db_id = f"{_stat.st_dev}:{_stat.st_ino}"
+    except OSError:
+        _db_id = ""
+    _calibration = sorted(constants.WIZ_WTR["calibration"].items())
+    return hashlib.sha1(  # nosec B324
+        f"{_db_id}|{TABLE_MAINS}|{METER}|{constants.WIZ_WTR['offset']}|{_calibration}"
+        f"|{libgaps.STEP}".encode()
+    ).hexdigest()
+
+
+def load_cache(cache_file: str) -> dict | None:
+    """Load the cached differences
+
+    Args:
+        cache_file (str): location of the cache
+
+    Returns:
+        dict with the cached data or None if there is no (usable) cache.
+    """
+    try:
+        with np.load(cache_file, allow_pickle=False) as _npz:
+            return {
+                "fingerprint": str(_npz["fingerprint"]),
+                "start_epoch": int(_npz["meta"][0]),
+                "anchor_epoch": int(_npz["meta"][1]),
+                "anchor_water": float(_npz["meta"][2]),
+                "span_hours": int(_npz["meta"][3]),
+                "epochs": _npz["epochs"],
+                "deltas": _npz["deltas"],
+            }
+    except (OSError, KeyError, ValueError, IndexError) as her:
+        if DEBUG:
+            print(f"Cache not used: {her}")
+        return None
+
+
+def save_cache(cache_file: str, cache: dict) -> None:
+    """Store the cached differences (atomically)
+
+    Args:
+        cache_file (str): location of the cache
+        cache (dict): data to store
+    """
+    os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+    _tmp = f"{cache_file}.tmp"
+    with open(_tmp, "wb") as _fp:
+        np.savez(
+            _fp,
+            fingerprint=np.array(cache["fingerprint"]),
+            meta=np.array(
+                [
+                    cache["start_epoch"],
+                    cache["anchor_epoch"],
+                    cache["anchor_water"],
+                    cache["span_hours"],
+                ],
+                dtype=np.float64,
+            ),
+            epochs=cache["epochs"],
+            deltas=cache["deltas"],
+        )
+    os.replace(_tmp, cache_file)
+
+
+def fetch_diffs_cached(hours_to_fetch: int, start_query: str) -> tuple[pd.DataFrame, tuple]:
+    """Fetch the first-order differences, using the differences cached by the previous run
+
+    The cache is anchored on the sample before the last one. The daemon
+    replaces the last, unfinished sample at the next report, so only the
+    anchor must still be in the database unaltered. The samples after the
+    anchor are read from the database again and the cached differences of
+    the last sample are dropped. The cache covers the widest period
+    requested so far, so runs for shorter periods don't shrink it. It is
+    rebuilt if it is invalid or does not cover the requested period.
+
+    Args:
+        hours_to_fetch (int): hours of data to retrieve
+        start_query (str): query returning the start of each period
+
+    Returns:
+        dataframe with the first-order differences and the result of start_query
+    """
+    cache_file = constants.TREND["cache"]
+    if constants.WIZ_WTR["meter"] != METER:
+        _root, _ext = os.path.splitext(cache_file)
+        cache_file = f"{_root}_{METER}{_ext}"
+    cache = load_cache(cache_file)
+    fingerprint = cache_fingerprint()
+    span_hours = hours_to_fetch
+    if cache is not None and cache["fingerprint"] == fingerprint:
+        span_hours = max(span_hours, cache["span_hours"])
+    window_query = f"SELECT {_epoch_sql(f'-{span_hours + 1} hours')};"
+
+    def _query(con):
+        window_epoch = con.execute(window_query).fetchone()[0]
+        valid = (
+            cache is not None
+            and cache["fingerprint"] == fingerprint
+            and cache["start_epoch"] <= window_epoch
+        )
+        if valid:
+            # the anchor must still be in the database unaltered
+            _row = con.execute(
+                f"SELECT water FROM {TABLE_MAINS}"  # nosec B608
+                f" WHERE meter = ? AND sample_epoch = ?;",
+                (METER, cache["anchor_epoch"]),
+            ).fetchone()
+            valid = _row is not None and _row[0] == cache["anchor_water"]
+        if DEBUG:
+            print(f"Cache {'valid' if valid else 'invalid'}")
+        return (
+            window_epoch,
+            valid,
+            read_mains(con, cache["anchor_epoch"] + 1 if valid else window_epoch),
+            con.execute(start_query).fetchone(),
+        )
+
+    window_epoch, valid, rows, starts = _with_connection(_query)
+    new_data = np.array(rows, dtype=np.float64).reshape(-1, 2)
+    if valid:
+        # the samples read follow the anchor; the cached differences after it are read again
+        new_data = np.concatenate(([[cache["anchor_epoch"], cache["anchor_water"]]], new_data))
+        _cached = cache["epochs"] <= cache["anchor_epoch"]
+        epochs, deltas = libgaps.spread(
+            new_data[1:, 0], new_data[:-1, 0], np.diff(new_data[:, 1])
+        )
+        epochs = np.concatenate((cache["epochs"][_cached], epochs))
+        deltas = np.concatenate((cache["deltas"][_cached], deltas))
+    else:
+        epochs, deltas = libgaps.spread(
+            new_data[1:, 0], new_data[:-1, 0], np.diff(new_data[:, 1])
+        )
+    # trim to the window and drop the differences that involve missing values
+    _keep = (epochs >= window_epoch) & ~np.isnan(deltas)
+    epochs = epochs[_keep]
+    deltas = deltas[_keep]
+
+    if len(new_data) > 1:
+        # the last sample may still be replaced, the one before it is the new anchor
+        save_cache(
+            cache_file,
+            {
+                "fingerprint": fingerprint,
+                "start_epoch": window_epoch,
+                "span_hours": span_hours,
+                "anchor_epoch": int(new_data[-2, 0]),
+                "anchor_water": float(new_data[-2, 1]),
+                "epochs": epochs,
+                "deltas": deltas,
+            },
+        )
+
+    df = pd.DataFrame({"water": deltas}, index=pd.to_datetime(epochs, unit="s"))
+    df.index.name = "sample_epoch"
+    if DEBUG:
+        print(f"\no  database 1st order data ({len(rows)} new samples)")
+        print(df.to_markdown(floatfmt=".3f"))  # requires `tabulate` package
+    return df, starts
+
+
+def fetch_events(limit: int) -> tuple[str, pd.DataFrame]:
+    """Fetch the largest flow events of the (local) day of EDATETIME
+
+    Args:
+        limit (int): maximum number of events
+
+    Returns:
+        the day (yyyy-mm-dd) and a dataframe with the volume of each event indexed by its start
+    """
+    # `'now'` is UTC; a given end date is already local time
+    _localtime = ", 'localtime'" if EDATETIME == "'now'" else ""
+
+    def _query(con):
+        day = con.execute(f"SELECT date({EDATETIME}{_localtime});").fetchone()[0]
+        _day = time.strptime(day, constants.D_FORMAT)
+        start_epoch = int(time.mktime(_day))
+        end_epoch = int(time.mktime((*_day[:2], _day[2] + 1, 0, 0, 0, 0, 0, -1)))
+        return day, lf.top_events(con, start_epoch, end_epoch, limit, METER)
+
+    day, rows = _with_connection(_query)
+    print(f"\nLargest flow events of {day}")
+    for _, start_time, duration, liters, peak_lpm in rows:
+        print(f"   {start_time}  {duration:>6}s  {liters:>5} L  {peak_lpm:>5.1f} L/min")
+    df = pd.DataFrame(
+        [(start_time, liters) for _, start_time, _, liters, _ in rows],
+        columns=["sample_time", "water"],
+    ).set_index("sample_time")
+    df.index = pd.to_datetime(df.index, format=constants.DT_FORMAT)
+    # show the events in chronological order
+    return day, df.sort_index()
+
+
+def _epoch_sql(modifier: str) -> str:
+    """Return an SQL expression for EDATETIME shifted by `modifier` in seconds since the epoch
+
+    Args:
+        modifier (str): SQLite date-time modifier, e.g. '-80 hours'
+
+    Returns:
+        SQL expression
+    """
+    return f"CAST(strftime('%s', {EDATETIME}, '{modifier}') AS INTEGER)"
+
+
+def _with_connection(query_func):
+    """Execute a query on the database
+
+    All queries of a run share one read-only connection. While the daemon
+    holds a lock, SQLite waits for it (see `libdb`).
+
+    Args:
+        query_func: callable that receives the connection and returns the result
+
+    Returns:
+        whatever query_func returns
+    """
+    return query_func(libdb.shared(constants.TREND["database"], readonly=True))
 
 
 def plot_graph(
@@ -150,17 +553,19 @@ def plot_graph(
     plot_title: str,
     show_data: bool = False,
     locatorformat: list | None = None,
+    svg: bool = False,
 ) -> None:
     """Plot the data in a chart.
 
     Args:
         output_file (str): path & filestub of the resulting plot.
                            The parametername will be appended as will the
-                           extension .png.
+                           extension .png or .svg.
         data_dict (dict): dict containing the datasets to be plotted
         plot_title (str): text for the title to be placed above the plot
         show_data (bool): whether to show numerical values in the plot.
         locatorformat (list): formatting information for xticks
+        svg (bool): draw the chart as SVG using `libsvg` instead of matplotlib
 
     Returns: nothing
     """
@@ -185,7 +590,28 @@ def plot_graph(
         if len(data_frame.index) == 0:
             if DEBUG:
                 print("No data.")
+        elif svg:
+            libsvg.write(
+                f"{output_file}_{parameter}.svg",
+                libsvg.bar_chart(
+                    data_frame.iloc[:, 0].astype(float).tolist(),
+                    ticklabels,
+                    f"{parameter} {plot_title}",
+                    ylabel=parameter,
+                    legend=str(data_frame.columns[0]),
+                    show_data=show_data,
+                    value_format=constants.FLOAT_FMT,
+                ),
+            )
+            # don't leave a stale chart of the other format behind (see `www/index.html`)
+            _remove(f"{output_file}_{parameter}.png")
+            if DEBUG:
+                print(f" --> {output_file}_{parameter}.svg\n")
         else:
+            # matplotlib is only imported when it is needed
+            import matplotlib.pyplot as plt  # pylint: disable=C0415
+            import matplotlib.ticker as mticker  # pylint: disable=C0415
+
             fig_x = 20
             fig_y = 7.5
             fig_fontsize = 13
@@ -221,63 +647,176 @@ def plot_graph(
             plt.gcf().autofmt_xdate()
             plt.title(f"{parameter} {plot_title}")
             plt.tight_layout()
-            plt.savefig(fname=f"{output_file}_{parameter}.png", format="png")
+            # write atomically, so the web server never serves a partial file
+            plt.savefig(fname=f"{output_file}_{parameter}.png.tmp", format="png")
+            os.replace(f"{output_file}_{parameter}.png.tmp", f"{output_file}_{parameter}.png")
+            plt.close()
+            _remove(f"{output_file}_{parameter}.svg")
             if DEBUG:
                 print(f" --> {output_file}_{parameter}.png\n")
 
 
+def _remove(file_name: str) -> None:
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(file_name)
+
+
 def main(opt) -> None:
     """
     This is the main loop
     """
-    if opt.hours:
-        plot_graph(
-            constants.TREND["hour_graph"],
-            fetch_data(hours_to_fetch=opt.hours, aggregation="h"),
-            f" trend afgelopen uren ({dt.now().strftime('%d-%m-%Y %H:%M:%S')})",
-            locatorformat=["hour", "%d-%m %Hh"],
-        )
-    if opt.days:
-        plot_graph(
-            constants.TREND["day_graph"],
-            fetch_data(hours_to_fetch=opt.days * 24, aggregation="D"),
-            f" trend afgelopen dagen ({dt.now().strftime('%d-%m-%Y %H:%M:%S')})",
-            locatorformat=["day", "%Y-%m-%d"],
-        )
-    if opt.months:
-        plot_graph(
-            constants.TREND["month_graph"],
-            fetch_data(hours_to_fetch=opt.months * 31 * 24, aggregation="ME"),
-            f" trend afgelopen maanden ({dt.now().strftime('%d-%m-%Y %H:%M:%S')})",
-            show_data=False,
-            locatorformat=["month", "%Y-%m"],
+    graphs = [graph for graph in GRAPHS if getattr(opt, graph)]
+    datasets = fetch_many(
+        [(getattr(opt, graph) * GRAPHS[graph][1], GRAPHS[graph][2]) for graph in graphs]
+    )
+    jobs = []
+    for graph, data_dict in zip(graphs, datasets, strict=True):
+        output, _, _, title, show_data, locatorformat = GRAPHS[graph]
+        jobs.append(
+            {
+                "output_file": constants.TREND[output],
+                "data_dict": data_dict,
+                "plot_title": f" {title} ({dt.now().strftime('%d-%m-%Y %H:%M:%S')})",
+                "show_data": show_data,
+                "locatorformat": locatorformat,
+                "svg": opt.svg,
+            }
         )
-    if opt.years:
-        plot_graph(
-            constants.TREND["year_graph"],
-            fetch_data(hours_to_fetch=opt.years * 366 * 24, aggregation="YE"),
-            f" trend afgelopen jaren ({dt.now().strftime('%d-%m-%Y %H:%M:%S')})",
-            show_data=True,
-            locatorformat=["year", "%Y"],
+    if opt.events:
+        day, df = fetch_events(opt.events)
+        jobs.append(
+            {
+                "output_file": constants.TREND["event_graph"],
+                "data_dict": {METER: df},
+                "plot_title": f" grootste tapbeurten van {day}"
+                f" ({dt.now().strftime('%d-%m-%Y %H:%M:%S')})",
+                "show_data": True,
+                "locatorformat": ["hour", "%H:%M"],
+                "svg": opt.svg,
+            }
         )
+    render(jobs, parallel=opt.all)
 
 
-if __name__ == "__main__":
-    print(f"Trending with Python {sys.version}")
-    if OPTION.hours == 0:
-        OPTION.hours = 80
-    if OPTION.days == 0:
-        OPTION.days = 80
-    if OPTION.months == 0:
-        OPTION.months = 6 * 12 + dt.now().month
-    if OPTION.years == 0:
-        OPTION.years = 10
-    if OPTION.edate:
+def render(jobs: list[dict], parallel: bool = False) -> None:
+    """Plot the graphs, one after another or in parallel
+
+    matplotlib is not thread-safe, so in parallel the graphs are plotted by a
+    pool of worker processes. The workers are forked, so they inherit the
+    options (DEBUG, METER) and the modules imported so far.
+
+    Args:
+        jobs (list): keyword arguments of `plot_graph` for each graph
+        parallel (bool): plot the graphs in parallel
+    """
+    _workers = min(len(jobs), os.cpu_count() or 1)
+    if not parallel or _workers <= 1:
+        for job in jobs:
+            plot_graph(**job)
+        return
+    if not jobs[0]["svg"]:
+        # imported once, before the workers are forked
+        import matplotlib.pyplot  # noqa: F401 # pylint: disable=C0415,W0611
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=_workers, mp_context=multiprocessing.get_context("fork")
+    ) as pool:
+        for _future in [pool.submit(plot_graph, **job) for job in jobs]:
+            # raise the errors of the workers
+            _future.result()
+
+
+def set_options(opt) -> None:
+    """Replace the zero-valued options by their defaults and apply the global options
+
+    Args:
+        opt: parsed commandline options
+    """
+    global DEBUG, EDATETIME, METER  # pylint: disable=W0603
+    if opt.all:
+        for _option in [*GRAPHS, "events"]:
+            if getattr(opt, _option) is None:
+                setattr(opt, _option, 0)
+    if opt.hours == 0:
+        opt.hours = 80
+    if opt.days == 0:
+        opt.days = 80
+    if opt.months == 0:
+        opt.months = 6 * 12 + dt.now().month
+    if opt.years == 0:
+        opt.years = 10
+    if opt.events == 0:
+        opt.events = 10
+    METER = opt.meter
+    EDATETIME = "'now'"
+    if opt.edate:
         print("NOT NOW")
-        EDATETIME = f"'{OPTION.edate}'"
+        EDATETIME = f"'{opt.edate}'"
 
-    if OPTION.debug:
-        print(OPTION)
-        DEBUG = True
+    # the server applies the options of every request, so nothing may stick
+    DEBUG = opt.debug
+    if DEBUG:
+        print(opt)
         print("DEBUG-mode started")
-    main(OPTION)
+
+
+class TrendRequestHandler(socketserver.StreamRequestHandler):
+    """Handle a request for trends received on the socket.
+
+    The request is a single line containing the commandline options of
+    `trend.py`, e.g. `--months 0 --years 0`. The reply is a single line
+    starting with `OK` or `ERROR`.
+    """
+
+    def handle(self) -> None:
+        request = self.rfile.readline().decode("utf-8").strip()
+        _start = time.time()
+        try:
+            opt = parser.parse_args(shlex.split(request))
+        except SystemExit:
+            self.wfile.write(f"ERROR invalid request: {request}\n".encode())
+            return
+        try:
+            set_options(opt)
+            main(opt)
+        except Exception as her:  # noqa
+            print(f"Request {request!r} failed: {her}")
+            self.wfile.write(f"ERROR {her}\n".encode())
+            return
+        print(f"Request {request!r} handled in {time.time() - _start:.2f}s")
+        self.wfile.write(f"OK {time.time() - _start:.2f}s\n".encode())
+
+
+def serve(socket_path: str) -> None:
+    """Create trends on request until terminated.
+
+    Requests are handled one at a time, because matplotlib is not thread-safe.
+
+    Args:
+        socket_path (str): location of the Unix socket to listen on
+    """
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+    # let systemd's SIGTERM unwind through the `finally` below
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    # only our own user may request trends, also when the socket is in /tmp
+    _umask = os.umask(0o177)
+    try:
+        server = socketserver.UnixStreamServer(socket_path, TrendRequestHandler)
+    finally:
+        os.umask(_umask)
+    with server:
+        print(f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(socket_path)
+
+
+if __name__ == "__main__":
+    print(f"Trending with Python {sys.version}")
+    if OPTION.serve:
+        serve(constants.TREND["socket"])
+    else:
+        set_options(OPTION)
+        main(OPTION)
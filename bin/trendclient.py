@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+
+# wizwtr
+# Copyright (C) 2025  Maurice (mausy5043) Hendrix
+# AGPL-3.0-or-later  - see LICENSE
+
+"""Ask the trend server (`trend.py --serve`) to create trendbargraphs.
+
+Takes the same options as `trend.py`. Only uses the standard library, so it
+starts quickly. Exits with 2 if the server is not available, in which case
+the caller may run `trend.py` itself.
+"""
+
+import os
+import shlex
+import socket
+import sys
+
+# must match `constants.TREND["socket"]`
+SOCKET: str = "/run/wizwtr/trend.sock"
+if not os.path.isdir(os.path.dirname(SOCKET)):
+    SOCKET = "/tmp/wizwtr.trend.sock"  # nosec B108
+TIMEOUT: float = 300.0
+
+
+def request(args: list) -> int:
+    """Send the request to the server and wait for the reply
+
+    Args:
+        args (list): commandline options for `trend.py`
+
+    Returns:
+        exit code: 0 on success, 1 if the server reported an error, 2 if the server is unavailable
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(TIMEOUT)
+            sock.connect(SOCKET)
+            sock.sendall(f"{shlex.join(args)}\n".encode())
+            reply = sock.makefile("r", encoding="utf-8").readline().strip()
+    except OSError as her:
+        print(f"Trend server not available: {her}")
+        return 2
+    print(reply)
+    return 0 if reply.startswith("OK") else 1
+
+
+if __name__ == "__main__":
+    sys.exit(request(sys.argv[1:]))
@@ -10,16 +10,29 @@ Store the data in a SQLite3 database.
 """
 
 import argparse
+import asyncio
+import concurrent.futures
 import logging.handlers
+import math
 import os
-import shutil
 import sys
 import syslog
+import threading
 import time
 import traceback
 
 import constants as cs
 import GracefulKiller as gk  # type: ignore[import-untyped]
+import libapi as la
+import libcalibration as lc
+import libdb
+import libflow as lf
+import libled as ld
+import libmeter as lm
+import libmetrics as mt
+import librollup as rollup
+import libsampling as ls
+import libspool as sp
 import libwizwtr as wtr
 import mausy5043_common.libsqlite3 as m3
 
@@ -47,7 +60,42 @@ parser_group.add_argument("--debug",
                           action="store_true",
                           help="start the daemon in debugging mode"
                           )
+parser.add_argument("--asyncio",
+                    action="store_true",
+                    help="run the collector as concurrent asyncio tasks"
+                    )
+parser.add_argument("--adaptive",
+                    action="store_true",
+                    help="sample more often while water is flowing and less often when idle"
+                    )
+parser.add_argument("--api",
+                    action="store_true",
+                    help="serve the live and historic data as JSON over HTTP"
+                    )
+parser.add_argument("--simulate",
+                    action="store_true",
+                    help="use a simulated meter instead of the device (see WIZ_WTR['simulator']);"
+                         " it runs in real time unless --speed is given"
+                    )
+parser.add_argument("--speed",
+                    type=float,
+                    help="with --simulate: run the collector in virtual time, SPEED times faster"
+                         " than real time; 0 for as fast as possible (not with --asyncio)"
+                    )
+parser.add_argument("--since",
+                    type=float,
+                    help="with --speed: start the virtual time SINCE days ago and stop when"
+                         " it reaches the present"
+                    )
+parser.add_argument("--profile",
+                    action="store_true",
+                    help="profile the daemon and dump the statistics after each report"
+                    )
 OPTION = parser.parse_args()
+if OPTION.speed is not None and (not OPTION.simulate or OPTION.asyncio):
+    parser.error("--speed requires --simulate and is not supported with --asyncio")
+if OPTION.since is not None and OPTION.speed is None:
+    parser.error("--since requires --speed")
 
 # constants
 DEBUG = False
@@ -59,83 +107,548 @@ MYROOT = "/".join(HERE[0:-3])  # /home/pi
 APPROOT = "/".join(HERE[0:-2])  # /home/pi/lektrix
 NODE = os.uname()[1]  # rbelec
 # fmt: on
+# the clock driving the collector loop; a `libmeter.SimulatedClock` runs it in virtual time
+if OPTION.speed is None:
+    CLOCK = lm.SystemClock()
+else:
+    CLOCK = lm.SimulatedClock(
+        start=time.time() - (OPTION.since or 0.0) * 86400, speed=OPTION.speed or None
+    )
+# the collector loop stops when CLOCK reaches this moment
+STOP_AT: float = time.time() if OPTION.since else math.inf
+LEDS = ld.StatusLeds(f"{APPROOT}/www", cs.TREND["website"], cs.WIZ_WTR["led_status"])
+# meter id -> whether the meter answered its latest request (see `show_status`)
+REACHABLE: dict[str, bool] = {}
 
 
 def main() -> None:
     """Execute main loop until killed."""
     LOGGER.info(f"Running on Python {sys.version}")
+    # resolve the location of the database here, before the threads need it
+    LOGGER.info(f"Database: {cs.WIZ_WTR['database']}")
     set_led("mains", "orange")
     killer = gk.GracefulKiller()
-    API_wtr = wtr.WizWTR(debug=DEBUG)
-
-    sql_db = m3.SqlDatabase(
-        database=cs.WIZ_WTR["database"],
-        table=cs.WIZ_WTR["sql_table"],
-        insert=cs.WIZ_WTR["sql_command"],
-        debug=DEBUG,
-    )
+    meters = connect(CLOCK)
+    spool = sp.Spool(cs.WIZ_WTR["spool"])
+    api = start_api(meters) if OPTION.api else None
 
     report_interval = int(cs.WIZ_WTR["report_interval"])
     sample_interval = report_interval / int(cs.WIZ_WTR["samplespercycle"])
+    profiler = mt.Profiler(cs.WIZ_WTR["profile"], report_interval) if OPTION.profile else None
+    schedules = (
+        {meter: new_schedule(report_interval, sample_interval) for meter in meters}
+        if OPTION.adaptive
+        else None
+    )
+    # the meters are interrogated concurrently
+    pool = concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(meters), thread_name_prefix="meter"
+    )
+
+    # the database is written to by a separate thread; it also replays the spool on start-up.
+    wake_drainer = threading.Event()
+    stop_drainer = threading.Event()
+    drainer = threading.Thread(
+        target=drain_spool_forever,
+        args=(spool, meters, wake_drainer, stop_drainer, report_interval),
+        name="drainer",
+        daemon=True,
+    )
+    drainer.start()
 
-    next_time = time.time()
-    rprt_time = time.time() + (report_interval - (time.time() % report_interval))
-    while not killer.kill_now:
-        if time.time() > next_time:
-            start_time = time.time()
-            try:
-                LOGGER.debug("\n...requesting telegram")
-                API_wtr.get_telegram()
-                set_led("mains", "green")
-            except Exception:  # noqa
-                set_led("mains", "red")
-                LOGGER.critical("Unexpected error while trying to do some work!")
-                LOGGER.error(traceback.format_exc())
-                raise
+    next_time = dict.fromkeys(meters, CLOCK.time())
+    rprt_time = CLOCK.time() + (report_interval - (CLOCK.time() % report_interval))
+    while not killer.kill_now and CLOCK.time() < STOP_AT:
+        due = [meter for meter, _time in next_time.items() if CLOCK.time() > _time]
+        if due:
+            start_time = CLOCK.time()
+            LOGGER.debug("\n...requesting telegrams")
+            sample_meters([meters[meter] for meter in due], pool)
             # check if we already need to report the result data
-            if time.time() > rprt_time:
+            if CLOCK.time() > rprt_time:
                 LOGGER.debug("\n...reporting")
-                LOGGER.debug(f"Result   : {API_wtr.list_data}")
                 # resample to 15m entries
-                data, API_wtr.list_data = API_wtr.compact_data(API_wtr.list_data)
-                try:
-                    LOGGER.debug("\n...queueing")
-                    for element in data:
-                        LOGGER.debug(f"{element}")  # is already logged by sql_db.queue()
-                        sql_db.queue(element)
-                except Exception:  # noqa
-                    set_led("mains", "red")
-                    LOGGER.critical("Unexpected error while trying to queue the data")
-                    LOGGER.error(traceback.format_exc())
-                    raise  # may be changed to pass if errors can be corrected.
-                try:
-                    LOGGER.debug("\n...inserting data")
-                    sql_db.insert(method="replace")
-                except Exception:  # noqa
-                    set_led("mains", "red")
-                    LOGGER.critical(
-                        "Unexpected error while trying to commit the data to the database"
+                data = compact_samples(meters)
+                with mt.METRICS.timer("spool"):
+                    spool.append(data)
+                wake_drainer.set()
+                report_metrics(meters, spool, profiler)
+
+            # determine moment of next sample and report
+            for meter in due:
+                if schedules is None:
+                    _next = sample_interval + start_time - (start_time % sample_interval)
+                else:
+                    _next = schedules[meter].next_sample(start_time, meters[meter].flow)
+                    mt.METRICS.set(
+                        "sample_interval_seconds", _next - start_time, labels={"meter": meter}
                     )
-                    LOGGER.error(traceback.format_exc())
-                    raise  # may be changed to pass if errors can be corrected.
-
-            # determine moment of next report
-            next_time = sample_interval + start_time - (start_time % sample_interval)
-            rprt_time = time.time() + (report_interval - (time.time() % report_interval))
-            LOGGER.debug(f"Spent          {time.time() - start_time:.1f}s getting data")
-            LOGGER.debug(f"Report in      {rprt_time - time.time():.0f}s")
-            LOGGER.debug(f"Next sample in {next_time - time.time():.0f}s")
+                next_time[meter] = _next
+            rprt_time = CLOCK.time() + (report_interval - (CLOCK.time() % report_interval))
+            LOGGER.debug(f"Spent          {CLOCK.time() - start_time:.1f}s getting data")
+            LOGGER.debug(f"Report in      {rprt_time - CLOCK.time():.0f}s")
+            LOGGER.debug(f"Next sample in {min(next_time.values()) - CLOCK.time():.0f}s")
             LOGGER.debug("................................")
         else:
-            time.sleep(1.0)  # 1s resolution is enough
+            # 1s resolution is enough
+            CLOCK.sleep(min(CLOCK.poll, max(0.0, min(next_time.values()) - CLOCK.time())))
 
+    stop_drainer.set()
+    wake_drainer.set()
+    # wait until everything that was spooled is stored
+    drainer.join()
+    pool.shutdown(wait=True)
+    if api is not None:
+        api.stop()
 
-def set_led(dev, colour) -> None:
-    LOGGER.debug(f"{dev} is {colour}")
 
-    in_dirfile = f"{APPROOT}/www/{colour}.png"
-    out_dirfile = f'{cs.TREND["website"]}/{dev}.png'
-    shutil.copy(f"{in_dirfile}", out_dirfile)
+def connect(clock=None) -> dict[str, wtr.WizWTR]:
+    """Return the meter objects by meter id, connected to the devices or to the simulator.
+
+    Args:
+        clock: clock that drives the collector; default: the system clock
+    """
+    settings = {} if OPTION.simulate else lm.read_config(cs.WIZ_WTR["config"])
+    return {
+        meter: wtr.WizWTR(
+            debug=DEBUG,
+            meter=backend,
+            clock=clock,
+            meter_id=meter,
+            calibration=lc.Calibration.for_meter(meter, settings.get(meter)),
+        )
+        for meter, backend in lm.open_meters(OPTION.simulate, clock, DEBUG, settings).items()
+    }
+
+
+def sample_meters(meters: list[wtr.WizWTR], pool: concurrent.futures.Executor) -> None:
+    """Take a sample of each of the meters concurrently.
+
+    A meter that can not be reached is skipped.
+
+    Args:
+        meters (list): the meter objects to sample
+        pool: executor that interrogates the devices
+    """
+    # a single request is not worth the hand-over to another thread
+    calls = (
+        [API_wtr.get_telegram for API_wtr in meters]
+        if len(meters) == 1
+        else [pool.submit(API_wtr.get_telegram).result for API_wtr in meters]
+    )
+    for API_wtr, call in zip(meters, calls, strict=True):
+        try:
+            call()
+            show_status(API_wtr.meter_id, True)
+        except OSError as her:
+            # the device or the network is (temporarily) unavailable; skip this sample
+            show_status(API_wtr.meter_id, False)
+            LOGGER.warning(f"No telegram received from {API_wtr.meter_id}: {her}")
+        except Exception:  # noqa
+            set_led("mains", "red")
+            LOGGER.critical("Unexpected error while trying to do some work!")
+            LOGGER.error(traceback.format_exc())
+            raise
+
+
+def compact_samples(meters: dict[str, wtr.WizWTR]) -> list:
+    """Compact the buffered samples of all meters into a single batch of 15-minute data.
+
+    Args:
+        meters (dict): the meter objects by meter id
+
+    Returns:
+        (list): list of dicts containing compacted 15-minute data
+    """
+    data = []
+    for API_wtr in meters.values():
+        if DEBUG:
+            LOGGER.debug(f"Result {API_wtr.meter_id}: {API_wtr.list_data}")
+        data.extend(API_wtr.compact_samples())
+    return data
+
+
+def open_database() -> m3.SqlDatabase:
+    """Return the database object used to store the compacted data.
+
+    Call this on the thread that stores the data. It also opens the shared
+    connection of that thread (used for the rollups and the flow events), which
+    puts the database in WAL mode (see `libdb`).
+    """
+    libdb.shared(cs.WIZ_WTR["database"])
+    return m3.SqlDatabase(
+        database=cs.WIZ_WTR["database"],
+        table=cs.WIZ_WTR["sql_table"],
+        insert=cs.WIZ_WTR["sql_command"],
+        debug=DEBUG,
+    )
+
+
+def store_data(sql_db: m3.SqlDatabase, data: list) -> None:
+    """Store the compacted data of all meters in the database and update the rollups.
+
+    Args:
+        sql_db: database object to use
+        data (list): list of dicts containing compacted 15-minute data
+    """
+    try:
+        LOGGER.debug("\n...queueing")
+        with mt.METRICS.timer("queue"):
+            for element in data:
+                LOGGER.debug(f"{element}")  # is already logged by sql_db.queue()
+                sql_db.queue(element)
+    except Exception:  # noqa
+        set_led("mains", "red")
+        LOGGER.critical("Unexpected error while trying to queue the data")
+        LOGGER.error(traceback.format_exc())
+        raise  # may be changed to pass if errors can be corrected.
+    try:
+        LOGGER.debug("\n...inserting data")
+        with mt.METRICS.timer("insert"):
+            sql_db.insert(method="replace")
+    except Exception:  # noqa
+        set_led("mains", "red")
+        LOGGER.critical("Unexpected error while trying to commit the data to the database")
+        LOGGER.error(traceback.format_exc())
+        raise  # may be changed to pass if errors can be corrected.
+    try:
+        LOGGER.debug("\n...updating rollups")
+        with mt.METRICS.timer("rollup"):
+            rollup.update_database(
+                cs.WIZ_WTR["database"], sorted({_row["meter"] for _row in data})
+            )
+    except Exception:  # noqa
+        # not fatal: the trends fall back to the raw data and
+        # the rollups will catch up on the next report.
+        LOGGER.error("Error while trying to update the rollups")
+        LOGGER.error(traceback.format_exc())
+
+
+def drain_spool(spool: sp.Spool, sql_db: m3.SqlDatabase) -> bool:
+    """Store the spooled data in the database.
+
+    Failures are logged but not raised. The data stays in the spool and
+    will be stored on the next attempt.
+
+    Args:
+        spool: spool containing the data to be stored
+        sql_db: database object to use
+
+    Returns:
+        (bool): True if the spool was drained completely.
+    """
+    try:
+        spool.drain(lambda batch: store_data(sql_db, batch), batch_size=cs.WIZ_WTR["spool_batch"])
+    except Exception:  # noqa
+        mt.METRICS.inc("retries_total")
+        set_led("mains", "red")
+        LOGGER.error("Spooled data could not be stored. Will retry later.")
+        LOGGER.error(traceback.format_exc())
+        return False
+    return True
+
+
+def store_events(meters: dict[str, wtr.WizWTR]) -> None:
+    """Store the completed flow events of all meters.
+
+    The events are a secondary store; failures are logged and the events are dropped.
+
+    Args:
+        meters (dict): the meter objects by meter id
+    """
+    events = [_event for API_wtr in meters.values() for _event in API_wtr.flow_events.take()]
+    retention = int(cs.WIZ_WTR["flow_retention"])
+    if not events or retention <= 0:
+        return
+    try:
+        with mt.METRICS.timer("events"):
+            lf.store(libdb.shared(cs.WIZ_WTR["database"]), events, retention)
+        LOGGER.debug(f"Stored {len(events)} flow events")
+    except Exception:  # noqa
+        LOGGER.error(f"{len(events)} flow events could not be stored")
+        LOGGER.error(traceback.format_exc())
+
+
+def drain_spool_forever(
+    spool: sp.Spool,
+    meters: dict[str, wtr.WizWTR],
+    wake: threading.Event,
+    stop: threading.Event,
+    interval: float,
+) -> None:
+    """Drain the spool whenever woken up or every `interval` seconds until stopped.
+
+    Args:
+        spool: spool containing the data to be stored
+        meters (dict): the meter objects holding the flow events to be stored
+        wake: event that is set when new data was spooled
+        stop: event that is set when the thread should finish
+        interval (float): maximum time between attempts
+    """
+    sql_db = open_database()
+    while not stop.is_set():
+        drain_spool(spool, sql_db)
+        store_events(meters)
+        wake.wait(timeout=interval)
+        wake.clear()
+    flush_spool(spool, sql_db, meters)
+
+
+def flush_spool(spool: sp.Spool, sql_db: m3.SqlDatabase, meters: dict[str, wtr.WizWTR]) -> None:
+    """Store everything left in the spool and close the shared connection of this thread.
+
+    Call this when the collector has stopped appending to the spool. It only
+    gives up when storing fails; the data then stays in the spool for the next start.
+
+    Args:
+        spool: spool containing the data to be stored
+        sql_db: database object to use
+        meters (dict): the meter objects holding the flow events to be stored
+    """
+    while spool.pending() and drain_spool(spool, sql_db):
+        pass
+    store_events(meters)
+    libdb.close()
+
+
+class Deadlines:
+    """Drift-free series of deadlines on the monotonic clock.
+
+    The deadlines are aligned to wall-clock multiples of the interval once, at
+    the start. After that they are advanced by exactly one interval, so the
+    time spent on the work never shifts the phase.
+    """
+
+    def __init__(self, interval: float, name: str = "") -> None:
+        self.interval: float = interval
+        self.name: str = name
+        self.next: float = time.monotonic() + (interval - (time.time() % interval))
+        self.missed: int = 0
+
+    def delay(self) -> float:
+        """Return the number of seconds until the next deadline."""
+        return max(0.0, self.next - time.monotonic())
+
+    def advance(self) -> float:
+        """Move to the next deadline. Deadlines that have already passed are skipped.
+
+        Returns:
+            (float): lateness in seconds w.r.t. the deadline that was just met.
+        """
+        _now = time.monotonic()
+        _late = _now - self.next
+        self.next += self.interval
+        if self.next <= _now:
+            _skipped = int((_now - self.next) // self.interval) + 1
+            LOGGER.warning(f"Missed {_skipped} deadline(s); running {_late:.1f}s late")
+            self.missed += _skipped
+            mt.METRICS.inc("deadlines_missed_total", _skipped, labels={"task": self.name})
+            self.next += _skipped * self.interval
+        return _late
+
+
+async def main_async() -> None:
+    """Execute the collector as concurrent tasks until killed.
+
+    Sampling (one task per meter), reporting (compaction) and storing the
+    data are separate tasks. The devices are interrogated in worker threads.
+    The compacted data is written to the spool and all database access is
+    done on a single dedicated thread, so a slow device or a slow commit does
+    not hold up the other tasks.
+    """
+    LOGGER.info(f"Running on Python {sys.version} (asyncio)")
+    # resolve the location of the database here, before the threads need it
+    LOGGER.info(f"Database: {cs.WIZ_WTR['database']}")
+    set_led("mains", "orange")
+    killer = gk.GracefulKiller()
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    meters = await asyncio.to_thread(connect)
+    db_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="db")
+    sql_db = await loop.run_in_executor(db_executor, open_database)
+    spool = sp.Spool(cs.WIZ_WTR["spool"])
+    spooled = asyncio.Event()
+    api = start_api(meters) if OPTION.api else None
+
+    report_interval = int(cs.WIZ_WTR["report_interval"])
+    sample_interval = report_interval / int(cs.WIZ_WTR["samplespercycle"])
+    profiler = mt.Profiler(cs.WIZ_WTR["profile"], report_interval) if OPTION.profile else None
+    # maximum number of concurrent requests to each device
+    fetch_slots = {meter: asyncio.Semaphore(2) for meter in meters}
+    last_sample: dict[str, asyncio.Task] = {}
+
+    async def _wait(delay: float) -> bool:
+        """Wait for `delay` seconds. Return False when we need to stop."""
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=delay)
+        except TimeoutError:
+            return True
+        return False
+
+    async def _watch_killer() -> None:
+        while not killer.kill_now:
+            await asyncio.sleep(1.0)  # 1s resolution is enough
+        stop.set()
+
+    async def _sample(API_wtr: wtr.WizWTR, epoch: int, previous: asyncio.Task | None) -> None:
+        try:
+            LOGGER.debug(f"\n...requesting telegram from {API_wtr.meter_id}")
+            _start = time.monotonic()
+            async with fetch_slots[API_wtr.meter_id]:
+                water, flow = await asyncio.to_thread(API_wtr.read_water)
+            LOGGER.debug(f"Spent          {time.monotonic() - _start:.1f}s getting data")
+        except OSError as her:
+            # the device or the network is (temporarily) unavailable; skip this sample
+            show_status(API_wtr.meter_id, False)
+            LOGGER.warning(f"No telegram received from {API_wtr.meter_id}: {her}")
+            return
+        except Exception:  # noqa
+            set_led("mains", "red")
+            LOGGER.critical("Unexpected error while trying to do some work!")
+            LOGGER.error(traceback.format_exc())
+            raise
+        if previous is not None:
+            # keep the samples in chronological order
+            await asyncio.wait([previous])
+        API_wtr.record(epoch, water, flow)
+        show_status(API_wtr.meter_id, True)
+
+    async def _sampler(tg: asyncio.TaskGroup, API_wtr: wtr.WizWTR) -> None:
+        meter = API_wtr.meter_id
+        if OPTION.adaptive:
+            await _adaptive_sampler(tg, API_wtr)
+            return
+        deadlines = Deadlines(sample_interval, name="sample")
+        # take the first sample right away
+        last_sample[meter] = tg.create_task(_sample(API_wtr, int(time.time()), None))
+        while await _wait(deadlines.delay()):
+            if fetch_slots[meter].locked():
+                LOGGER.warning(f"Device {meter} is not responding in time")
+            # the sample is stamped with the moment it was scheduled
+            _epoch = int(time.time() - (time.monotonic() - deadlines.next))
+            last_sample[meter] = tg.create_task(_sample(API_wtr, _epoch, last_sample[meter]))
+            deadlines.advance()
+
+    async def _adaptive_sampler(tg: asyncio.TaskGroup, API_wtr: wtr.WizWTR) -> None:
+        # the moment of each sample depends on the flow reported by the previous one
+        meter = API_wtr.meter_id
+        schedule = new_schedule(report_interval, sample_interval)
+        _epoch = time.time()
+        while True:
+            last_sample[meter] = _task = tg.create_task(_sample(API_wtr, int(_epoch), None))
+            await asyncio.wait([_task])
+            if _task.cancelled() or _task.exception() is not None:
+                # the task group is shutting down
+                return
+            _next = schedule.next_sample(_epoch, API_wtr.flow)
+            mt.METRICS.set("sample_interval_seconds", _next - _epoch, labels={"meter": meter})
+            if not await _wait(max(0.0, _next - time.time())):
+                return
+            _epoch = _next
+
+    async def _reporter() -> None:
+        deadlines = Deadlines(report_interval, name="report")
+        while await _wait(deadlines.delay()):
+            deadlines.advance()
+            LOGGER.debug("\n...reporting")
+            if last_sample:
+                # allow the samples that are still in flight to be included
+                await asyncio.wait(list(last_sample.values()), timeout=sample_interval)
+            data = compact_samples(meters)
+            with mt.METRICS.timer("spool"):
+                await asyncio.to_thread(spool.append, data)
+            spooled.set()
+            await asyncio.to_thread(report_metrics, meters, spool, profiler)
+
+    async def _writer() -> None:
+        # the first pass replays whatever was left in the spool; after `stop`
+        # one more pass stores whatever was spooled last
+        while True:
+            _start = time.monotonic()
+            await loop.run_in_executor(db_executor, drain_spool, spool, sql_db)
+            await loop.run_in_executor(db_executor, store_events, meters)
+            LOGGER.debug(f"Spent          {time.monotonic() - _start:.1f}s storing data")
+            if stop.is_set():
+                break
+            _wakers = [asyncio.create_task(spooled.wait()), asyncio.create_task(stop.wait())]
+            await asyncio.wait(
+                _wakers, timeout=report_interval, return_when=asyncio.FIRST_COMPLETED
+            )
+            for _waker in _wakers:
+                _waker.cancel()
+            spooled.clear()
+
+    try:
+        async with asyncio.TaskGroup() as tg:
+            tg.create_task(_watch_killer())
+            for API_wtr in meters.values():
+                tg.create_task(_sampler(tg, API_wtr))
+            tg.create_task(_reporter())
+            tg.create_task(_writer())
+    finally:
+        db_executor.submit(flush_spool, spool, sql_db, meters)
+        db_executor.shutdown(wait=True)
+        if api is not None:
+            api.stop()
+
+
+def start_api(meters: dict[str, wtr.WizWTR]) -> la.ApiServer:
+    """Start serving the live and historic data in a background thread."""
+    api = la.ApiServer(
+        lambda meter: meters[meter].live(), cs.WIZ_WTR["database"], cs.WIZ_WTR["api"]
+    )
+    api.start()
+    return api
+
+
+def new_schedule(report_interval: float, sample_interval: float) -> ls.AdaptiveSchedule:
+    """Return the schedule for adaptive sampling as configured."""
+    return ls.AdaptiveSchedule(
+        report_interval,
+        sample_interval,
+        active=cs.WIZ_WTR["adaptive"]["active"],
+        idle=cs.WIZ_WTR["adaptive"]["idle"],
+    )
+
+
+def report_metrics(
+    meters: dict[str, wtr.WizWTR], spool: sp.Spool, profiler: mt.Profiler | None
+) -> None:
+    """Export the instrumentation and, if requested, the profile.
+
+    Args:
+        meters (dict): the meter objects by meter id
+        spool: the spool
+        profiler: the profiler or None if not profiling
+    """
+    for meter, API_wtr in meters.items():
+        mt.METRICS.set("buffered_samples", len(API_wtr.samples), labels={"meter": meter})
+        mt.METRICS.set("dropped_samples", API_wtr.samples.dropped, labels={"meter": meter})
+    mt.METRICS.set("spooled_rows", spool.pending())
+    try:
+        mt.METRICS.write(cs.WIZ_WTR["metrics"])
+        if profiler is not None:
+            profiler.dump()
+    except OSError as her:
+        LOGGER.warning(f"Could not export the metrics: {her}")
+
+
+def show_status(meter: str, reachable: bool) -> None:
+    """Show on the LED whether all meters answered their latest request.
+
+    Args:
+        meter (str): id of the meter
+        reachable (bool): whether the meter answered
+    """
+    REACHABLE[meter] = reachable
+    set_led("mains", "green" if all(REACHABLE.values()) else "red")
+
+
+def set_led(dev, colour) -> None:
+    """Show the colour of the device's LED on the website. Only changes are written."""
+    with mt.METRICS.timer("set_led"):
+        if LEDS.set(dev, colour):
+            mt.METRICS.inc("led_transitions_total", labels={"led": dev})
 
 
 if __name__ == "__main__":
@@ -156,6 +669,9 @@ if __name__ == "__main__":
         print("Use <Ctrl>+C to stop.")
 
     # OPTION.start only executes this next line, we don't need to test for it.
-    main()
+    if OPTION.asyncio:
+        asyncio.run(main_async())
+    else:
+        main()
 
     LOGGER.info("And it's goodnight from him")